@@ -1,10 +1,14 @@
 import os
+import io
+import json
+import time
+import sqlite3
+import hashlib
 import numpy as np
-import joblib
-import pickle
-import onnxruntime as ort
 from PIL import Image
 from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 import base64
 import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend
@@ -14,8 +18,22 @@ from datetime import datetime, timedelta
 import random
 import google.generativeai as genai
 from dotenv import load_dotenv
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import (Flask, render_template, request, jsonify, redirect, url_for, Response, stream_with_context,
+                   abort, send_from_directory)
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.exc import IntegrityError
+import crop_service
+import fertilizer_service
+import disease_service
+import model_store
+from batching import MicroBatcher, stack_rows
+from prediction_cache import QuantizedLRUCache
+from inference_pool import InferencePool, InferenceQueueFull, PooledModel, limit_native_threads, pin_model_threads
+import job_queue
+import crop_grid as crop_grid_service
+import upload_store
+import disease_catalog as disease_catalog_service
+import fertilizer_table as fertilizer_table_service
 
 # Load environment variables
 load_dotenv()
@@ -27,41 +45,263 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key'
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///agriculture.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['CROP_BATCH_CHUNK_SIZE'] = crop_service.DEFAULT_CHUNK_SIZE
+# Micro-batching window for concurrent single-record predictions
+app.config['BATCH_MAX_SIZE'] = int(os.getenv('BATCH_MAX_SIZE', 32))
+app.config['BATCH_MAX_WAIT_MS'] = float(os.getenv('BATCH_MAX_WAIT_MS', 2.0))
+# Seconds a request waits for its micro-batched result before failing
+app.config['BATCH_TIMEOUT'] = float(os.getenv('BATCH_TIMEOUT', 30.0))
+# Prediction cache: entries per model and grid step of every input feature
+# (0 keeps a feature exact). With the cache on, inputs are snapped to this grid
+# before scoring, which changes outputs near cell boundaries; size 0 turns both off.
+app.config['PREDICTION_CACHE_SIZE'] = int(os.getenv('PREDICTION_CACHE_SIZE', 4096))
+# N, P, K, temperature, humidity, ph, rainfall
+app.config['CROP_CACHE_RESOLUTIONS'] = [1, 1, 1, 0.1, 0.1, 0.01, 0.1]
+# N, P, K, temperature, humidity, moisture, soil type, crop type
+app.config['FERTILIZER_CACHE_RESOLUTIONS'] = [1, 1, 1, 1, 1, 1, 0, 0]
+# Fertilizer decision table (see FERTILIZER_TABLE_PATH): off by default
+app.config['FERTILIZER_TABLE'] = os.getenv('FERTILIZER_TABLE', '0') == '1'
+app.config['FERTILIZER_TABLE_MIN_AGREEMENT'] = float(os.getenv('FERTILIZER_TABLE_MIN_AGREEMENT',
+                                                               fertilizer_table_service.DEFAULT_MIN_AGREEMENT))
+
+# Inference pool: threads running model calls, extra requests allowed to
+# wait (beyond that requests get 503) and threads each model call may use
+app.config['INFERENCE_WORKERS'] = int(os.getenv('INFERENCE_WORKERS', os.cpu_count() or 4))
+app.config['INFERENCE_QUEUE_SIZE'] = int(os.getenv('INFERENCE_QUEUE_SIZE', 64))
+app.config['MODEL_THREADS'] = int(os.getenv('MODEL_THREADS', 1))
+# ONNX Runtime session of the plant disease model, see
+# disease_service.session_options; benchmarks/ort_session_sweep.py prints
+# the best values for a machine
+app.config['ORT_SESSION'] = {
+    'graph_optimization': os.getenv('ORT_GRAPH_OPTIMIZATION', 'all'),
+    'intra_op_threads': int(os.getenv('ORT_INTRA_OP_THREADS', app.config['MODEL_THREADS'])),
+    'inter_op_threads': int(os.getenv('ORT_INTER_OP_THREADS', 1)),
+    'execution_mode': os.getenv('ORT_EXECUTION_MODE', 'sequential'),
+    'cpu_mem_arena': os.getenv('ORT_CPU_MEM_ARENA', '1') == '1',
+    'mem_pattern': os.getenv('ORT_MEM_PATTERN', '1') == '1',
+    'io_binding': os.getenv('ORT_IO_BINDING', '1') == '1'
+}
+# Batch plant-disease inference: images per model call, images per request
+# and threads decoding images
+app.config['DISEASE_BATCH_SIZE'] = int(os.getenv('DISEASE_BATCH_SIZE', disease_service.DEFAULT_BATCH_SIZE))
+app.config['DISEASE_MAX_IMAGES'] = int(os.getenv('DISEASE_MAX_IMAGES', disease_service.DEFAULT_MAX_IMAGES))
+app.config['DECODE_WORKERS'] = int(os.getenv('DECODE_WORKERS', os.cpu_count() or 4))
+# JSON plant-disease API: classes returned per image, and whether the model
+# outputs 'logits', 'probabilities' or 'auto' (probabilities if rows sum to 1)
+app.config['DISEASE_TOP_K'] = int(os.getenv('DISEASE_TOP_K', 5))
+app.config['DISEASE_OUTPUT'] = os.getenv('DISEASE_OUTPUT', 'auto')
+# Default test-time augmentation views per image for the JSON API (1 = off,
+# up to 8 crops and mirror images scored in the same model call)
+app.config['DISEASE_TTA_VIEWS'] = int(os.getenv('DISEASE_TTA_VIEWS', 1))
+# Tiled inference of large field photos: default pixels between windows and
+# maximum windows per image
+app.config['DISEASE_TILE_STRIDE'] = int(os.getenv('DISEASE_TILE_STRIDE', disease_service.DEFAULT_TILE_STRIDE))
+app.config['DISEASE_MAX_TILES'] = int(os.getenv('DISEASE_MAX_TILES', disease_service.MAX_TILES))
+# Seconds clients may cache /api/diseases responses before revalidating
+app.config['DISEASE_CATALOG_MAX_AGE'] = int(os.getenv('DISEASE_CATALOG_MAX_AGE', 3600))
+# Async plant-disease jobs (async=1): concurrent jobs, jobs allowed to wait
+# (beyond that submissions get 503) and seconds a result is kept
+app.config['DISEASE_JOB_WORKERS'] = int(os.getenv('DISEASE_JOB_WORKERS', job_queue.DEFAULT_WORKERS))
+app.config['DISEASE_JOB_QUEUE_SIZE'] = int(os.getenv('DISEASE_JOB_QUEUE_SIZE', job_queue.DEFAULT_QUEUE_SIZE))
+app.config['DISEASE_JOB_RESULT_TTL'] = float(os.getenv('DISEASE_JOB_RESULT_TTL', job_queue.DEFAULT_RESULT_TTL))
+
+CROP_MODEL_PATH = 'models/crop_recommender_rf.joblib'
+FERTILIZER_MODEL_PATH = 'models/xgb_pipeline.pkl'
+CROP_GRID_PATH = 'models/crop_grid.npy'
+# Per-(soil, crop) fertilizer decision table, built offline with
+# `python fertilizer_table.py`. Off unless FERTILIZER_TABLE=1, and then used
+# only while it matches the model file and its measured agreement with the
+# model is at least FERTILIZER_TABLE_MIN_AGREEMENT
+FERTILIZER_TABLE_PATH = 'models/fertilizer_table.npy'
+# Class labels and advice of the plant disease model, in output order
+DISEASE_CATALOG_PATH = os.getenv('DISEASE_CATALOG', 'models/plant_disease_catalog.json')
+# Plant disease model: the float model or a variant from disease_model.py,
+# e.g. models/plant_disease_uint8.onnx (fold-scaling, takes uint8 pixels)
+# or models/plant_disease_int8.onnx (quantize)
+DISEASE_MODEL_PATH = os.getenv('DISEASE_MODEL', 'models/plant_disease_optimized.onnx')
+# Crop-suitability grid for the map view: axis -> (start, stop, step) and fixed soil values
+app.config['CROP_GRID_AXES'] = dict(crop_grid_service.DEFAULT_AXES)
+app.config['CROP_GRID_FIXED'] = dict(crop_grid_service.DEFAULT_FIXED)
+app.config['CROP_GRID_MAX_SLICE_CELLS'] = int(os.getenv('CROP_GRID_MAX_SLICE_CELLS', crop_grid_service.MAX_SLICE_CELLS))
 
 # Initialize database
 db = SQLAlchemy(app)
 
 # Ensure static directory exists for plant disease images
 os.makedirs('static/uploads', exist_ok=True)
+UPLOAD_DIR = os.path.join('static', 'uploads')
+# Uploaded plant images and their display thumbnails are written there in
+# the background and recorded in an index outside the served directory; the
+# sweeper keeps the store under the quota (MiB) and evicts uploads unused
+# for more than the maximum age (days), least recently used first. 0
+# disables either limit.
+app.config['UPLOAD_QUOTA_MB'] = float(os.getenv('UPLOAD_QUOTA_MB', 1024))
+app.config['UPLOAD_MAX_AGE_DAYS'] = float(os.getenv('UPLOAD_MAX_AGE_DAYS', 0))
+app.config['UPLOAD_SWEEP_INTERVAL'] = float(os.getenv('UPLOAD_SWEEP_INTERVAL', upload_store.DEFAULT_SWEEP_INTERVAL))
+upload_index = upload_store.UploadIndex(os.path.join(app.instance_path, 'upload_index.sqlite3'))
+upload_writer = disease_service.UploadWriter(UPLOAD_DIR, upload_index)
+upload_sweeper = upload_store.UploadSweeper(UPLOAD_DIR, upload_index, int(app.config['UPLOAD_QUOTA_MB'] * 2 ** 20),
+                                            app.config['UPLOAD_MAX_AGE_DAYS'] * 86400,
+                                            app.config['UPLOAD_SWEEP_INTERVAL'])
 
 # ===== Load Models =====
 
+# Keep OpenMP/BLAS pools from oversubscribing the cores next to the inference pool
+limit_native_threads(app.config['MODEL_THREADS'])
+
 # Load crop recommendation model
 try:
-    crop_model = joblib.load('models/crop_recommender_rf.joblib')
+    # CROP_ENGINE: 'sklearn' (default), 'flat' for the array-backed evaluator
+    # with much lower single-row latency, or 'mmap' to share its arrays
+    # between worker processes through memory-mapped files
+    crop_model = model_store.load_crop_model(CROP_MODEL_PATH, os.getenv('CROP_ENGINE', 'sklearn'))
+    # Index the class labels once so top-k lookups are plain array indexing
+    crop_classes = crop_service.class_index(crop_model)
+    pin_model_threads(crop_model, app.config['MODEL_THREADS'])
     print("Crop recommendation model loaded successfully")
 except Exception as e:
     print(f"Error loading crop recommendation model: {e}")
     crop_model = None
+    crop_classes = None
 
 # Load fertilizer recommendation model
 try:
-    fertilizer_model = pickle.load(open('models/xgb_pipeline.pkl', 'rb'))
+    # FERTILIZER_ENGINE: 'pipeline' (default) or 'native' to skip the sklearn
+    # wrappers and call the XGBoost booster directly on float32 input
+    fertilizer_model = model_store.load_fertilizer_model(FERTILIZER_MODEL_PATH, os.getenv('FERTILIZER_ENGINE', 'pipeline'))
+    pin_model_threads(fertilizer_model, app.config['MODEL_THREADS'])
     print("Fertilizer recommendation model loaded successfully")
 except Exception as e:
     print(f"Error loading fertilizer recommendation model: {e}")
     fertilizer_model = None
 
+def load_fertilizer_table(model):
+    """The fertilizer decision table if it is enabled and usable with model, else None"""
+    if not app.config['FERTILIZER_TABLE'] or model is None:
+        return None
+    return fertilizer_table_service.load_table(FERTILIZER_TABLE_PATH, FERTILIZER_MODEL_PATH, model,
+                                               app.config['FERTILIZER_TABLE_MIN_AGREEMENT'])
+
+try:
+    fertilizer_table = load_fertilizer_table(fertilizer_model)
+    if fertilizer_table is not None:
+        print(f"Fertilizer decision table loaded: {fertilizer_table.kind}, {fertilizer_table.meta['shape']} cells")
+except Exception as e:
+    print(f"Error loading fertilizer decision table: {e}")
+    fertilizer_table = None
+
+# Plant disease labels and advice, loaded once into arrays aligned with the model outputs
+disease_catalog = disease_catalog_service.load_catalog(DISEASE_CATALOG_PATH)
+# Indexes of the *___healthy classes for the healthy vs. diseased aggregate
+disease_healthy_classes = np.flatnonzero(disease_catalog.healthy)
+
 # Load plant disease detection model
 try:
     # Use absolute path for the model file
-    model_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "plant_disease_optimized.onnx")
-    ort_session = ort.InferenceSession(model_path)
+    model_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), DISEASE_MODEL_PATH)
+    ort_session = disease_service.create_session(model_path, app.config['ORT_SESSION'])
     input_name = ort_session.get_inputs()[0].name
+    # Scores a batch, through IOBinding with reused output buffers if enabled
+    disease_runner = disease_service.session_runner(ort_session, app.config['ORT_SESSION'])
+    disease_layout, disease_fixed_batch = disease_service.input_layout(ort_session)
+    # uint8 if the model scales the pixels itself, else float32
+    disease_input_dtype = disease_service.input_dtype(ort_session)
+    # Identifies the model version and its preprocessing (draft decoding,
+    # input dtype) in the persistent prediction cache
+    disease_model_checksum = hashlib.sha256(
+        f'{upload_store.file_hash(model_path)};{disease_service.preprocess_signature(disease_input_dtype)}'.encode()
+    ).hexdigest()
+    n_outputs = ort_session.get_outputs()[0].shape[1]
+    if isinstance(n_outputs, int) and n_outputs != len(disease_catalog):
+        print(f"Warning: the plant disease model has {n_outputs} classes, the catalog {len(disease_catalog)}")
     print(f"Plant disease detection model loaded successfully from {model_path}")
 except Exception as e:
     print(f"Error loading plant disease detection model: {e}")
     ort_session = None
+    disease_layout, disease_fixed_batch = 'NHWC', None
+    disease_input_dtype = np.float32
+    disease_model_checksum = None
+
+# Single bounded executor for every model call in the app
+inference_pool = InferencePool(app.config['INFERENCE_WORKERS'], app.config['INFERENCE_QUEUE_SIZE'])
+
+# Threads decoding images for batch plant-disease inference
+decode_pool = ThreadPoolExecutor(app.config['DECODE_WORKERS'], thread_name_prefix='decode')
+
+# Async plant-disease jobs, decoded and scored off the request threads
+disease_jobs = job_queue.JobQueue('disease-job', app.config['DISEASE_JOB_WORKERS'], app.config['DISEASE_JOB_QUEUE_SIZE'],
+                                  app.config['DISEASE_JOB_RESULT_TTL'])
+
+# Micro-batching dispatchers: concurrent requests arriving within the window
+# share a single model call on the inference pool. The models are looked up
+# at call time.
+crop_batcher = MicroBatcher('crop', stack_rows(lambda X: inference_pool.run(crop_model.predict_proba, X)),
+                            app.config['BATCH_MAX_SIZE'], app.config['BATCH_MAX_WAIT_MS'], app.config['BATCH_TIMEOUT'])
+fertilizer_batcher = MicroBatcher('fertilizer', stack_rows(lambda X: inference_pool.run(fertilizer_model.predict, X)),
+                                  app.config['BATCH_MAX_SIZE'], app.config['BATCH_MAX_WAIT_MS'],
+                                  app.config['BATCH_TIMEOUT'])
+
+def reload_crop_model():
+    """Reload the crop model after its file changed on disk"""
+    global crop_model, crop_classes
+    try:
+        model = model_store.load_crop_model(CROP_MODEL_PATH, os.getenv('CROP_ENGINE', 'sklearn'))
+        crop_classes = crop_service.class_index(model)
+        pin_model_threads(model, app.config['MODEL_THREADS'])
+        crop_model = model
+        print("Crop recommendation model reloaded")
+    except Exception as e:
+        print(f"Error reloading crop recommendation model: {e}")
+
+def reload_fertilizer_model():
+    """Reload the fertilizer model after its file changed on disk"""
+    global fertilizer_model, fertilizer_table
+    try:
+        model = model_store.load_fertilizer_model(FERTILIZER_MODEL_PATH, os.getenv('FERTILIZER_ENGINE', 'pipeline'))
+        pin_model_threads(model, app.config['MODEL_THREADS'])
+        fertilizer_model = model
+        fertilizer_table = load_fertilizer_table(model)
+        print("Fertilizer recommendation model reloaded")
+    except Exception as e:
+        print(f"Error reloading fertilizer recommendation model: {e}")
+
+# Quantized-input prediction caches in front of the batchers
+crop_cache = QuantizedLRUCache('crop', app.config['CROP_CACHE_RESOLUTIONS'],
+                               app.config['PREDICTION_CACHE_SIZE'], CROP_MODEL_PATH, reload_crop_model)
+fertilizer_cache = QuantizedLRUCache('fertilizer', app.config['FERTILIZER_CACHE_RESOLUTIONS'],
+                                     app.config['PREDICTION_CACHE_SIZE'], FERTILIZER_MODEL_PATH, reload_fertilizer_model)
+
+# Precomputed crop-suitability grid for the map view, rebuilt from the
+# model file whenever it changes
+crop_grid = crop_grid_service.GridManager(
+    CROP_GRID_PATH, CROP_MODEL_PATH,
+    lambda: model_store.load_crop_model(CROP_MODEL_PATH, os.getenv('CROP_ENGINE', 'sklearn')),
+    app.config['CROP_GRID_AXES'], app.config['CROP_GRID_FIXED'])
+
+def crop_probabilities(row):
+    """Crop class probabilities for one feature row, served from the cache when possible"""
+    return crop_cache.get_or_compute(row, crop_batcher)
+
+def current_fertilizer_table():
+    """The fertilizer decision table, or None if there is none or the model file changed since it was built"""
+    table = fertilizer_table
+    if table is not None and table.matches(FERTILIZER_MODEL_PATH):
+        return table
+    return None
+
+def fertilizer_class(row):
+    """Fertilizer class index for one feature row, from the decision table if it covers the row and otherwise from the cache when possible"""
+    table = current_fertilizer_table()
+    if table is not None:
+        return int(table.predict(row, lambda X: [fertilizer_cache.get_or_compute(X[0], fertilizer_batcher)])[0])
+    return fertilizer_cache.get_or_compute(row, fertilizer_batcher)
+
+def fertilizer_classes(X):
+    """Fertilizer class indices for a batch, with one model call for the rows the decision table does not cover"""
+    def predict(X):
+        return inference_pool.run(fertilizer_model.predict, X)
+    table = current_fertilizer_table()
+    return table.predict(X, predict) if table is not None else predict(X)
 
 # Configure the Gemini API for chatbot
 try:
@@ -165,6 +405,7 @@ class SoilRecord(db.Model):
     date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     notes = db.Column(db.Text)
     values = db.relationship('SoilValue', backref='soil_record', lazy=True, cascade="all, delete-orphan")
+    __table_args__ = (db.Index('ix_soil_record_farm_date', 'farm_id', 'date'),)
 
 class SoilValue(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -172,6 +413,7 @@ class SoilValue(db.Model):
     component_id = db.Column(db.Integer, db.ForeignKey('soil_component.id'), nullable=False)
     value = db.Column(db.Float, nullable=False)
     component = db.relationship('SoilComponent')
+    __table_args__ = (db.Index('ix_soil_value_record', 'soil_record_id'),)
 
 class Crop(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -190,6 +432,25 @@ class Harvest(db.Model):
     yield_amount = db.Column(db.Float)  # Yield in kg or tons
     notes = db.Column(db.Text)
 
+class FertilizerRecommendation(db.Model):
+    # Written in bulk by the fleet-wide planning job (plan_fertilizers.py)
+    id = db.Column(db.Integer, primary_key=True)
+    farm_id = db.Column(db.Integer, db.ForeignKey('farm.id'), nullable=False, index=True)
+    soil_record_id = db.Column(db.Integer, db.ForeignKey('soil_record.id'), nullable=False)
+    soil_type = db.Column(db.String(20), nullable=False)
+    crop_type = db.Column(db.String(20), nullable=False)
+    fertilizer = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class DiseasePrediction(db.Model):
+    # Persistent plant-disease prediction cache keyed by image content and model version
+    id = db.Column(db.Integer, primary_key=True)
+    image_hash = db.Column(db.String(64), nullable=False)  # SHA-256 of the uploaded file
+    model_checksum = db.Column(db.String(64), nullable=False)  # SHA-256 of the ONNX model and preprocessing
+    scores = db.Column(db.LargeBinary, nullable=False)  # float32 class scores
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    __table_args__ = (db.UniqueConstraint('image_hash', 'model_checksum', name='uq_disease_prediction'),)
+
 # ===== Helper Functions =====
 
 def create_initial_data():
@@ -871,16 +1132,23 @@ def crop_predict():
         ph = float(request.form['ph'])
         rainfall = float(request.form['rainfall'])
 
-        # Create input array for prediction
-        input_data = np.array([[nitrogen, phosphorus, potassium, temperature, humidity, ph, rainfall]])
+        # Number of ranked alternatives to show
+        top_k = crop_service.parse_top_k(request.form.get('top_k', crop_service.DEFAULT_TOP_K), len(crop_classes))
+
+        # Create input row for prediction
+        input_data = np.array([nitrogen, phosphorus, potassium, temperature, humidity, ph, rainfall])
 
         # Make prediction
-        prediction = crop_model.predict(input_data)[0]
+        with inference_pool.admit():
+            proba = crop_probabilities(input_data)[np.newaxis, :]
+        predictions, recommendations = crop_service.rank_proba(proba, top_k, crop_classes)
+        prediction = predictions[0]
 
         # Format prediction text
         prediction_text = f"The recommended crop for your soil and climate conditions is: {prediction.upper()}"
 
-        return render_template('crop_recommendation.html', prediction=prediction_text, input_data={
+        return render_template('crop_recommendation.html', prediction=prediction_text,
+                               recommendations=recommendations[0], input_data={
             'N': nitrogen,
             'P': phosphorus,
             'K': potassium,
@@ -889,6 +1157,8 @@ def crop_predict():
             'ph': ph,
             'rainfall': rainfall
         })
+    except InferenceQueueFull:
+        raise
     except Exception as e:
         return render_template('crop_recommendation.html', error=f"Error making prediction: {str(e)}")
 
@@ -907,13 +1177,20 @@ def api_crop_predict():
         ph = float(data.get('ph', 0))
         rainfall = float(data.get('rainfall', 0))
 
-        # Create input array for prediction
-        input_data = np.array([[nitrogen, phosphorus, potassium, temperature, humidity, ph, rainfall]])
+        # Optional number of ranked alternatives
+        top_k = crop_service.parse_top_k(data.get('top_k', request.args.get('top_k')), len(crop_classes))
 
-        # Make prediction
-        prediction = crop_model.predict(input_data)[0]
+        # Create input row for prediction
+        input_data = np.array([nitrogen, phosphorus, potassium, temperature, humidity, ph, rainfall])
 
-        return jsonify({
+        # Make prediction through the cache and micro-batcher; argmax of
+        # the probabilities is exactly what crop_model.predict returns
+        with inference_pool.admit():
+            proba = crop_probabilities(input_data)[np.newaxis, :]
+        predictions, recommendations = crop_service.rank_proba(proba, top_k or 1, crop_classes)
+        prediction = str(predictions[0])
+
+        response = {
             'status': 'success',
             'prediction': prediction,
             'input': {
@@ -925,63 +1202,231 @@ def api_crop_predict():
                 'ph': ph,
                 'rainfall': rainfall
             }
-        })
+        }
+        if top_k:
+            response['recommendations'] = recommendations[0]
+
+        return jsonify(response)
+    except InferenceQueueFull:
+        raise
     except Exception as e:
         return jsonify({
             'status': 'error',
             'message': str(e)
         }), 400
 
+def admit_stream():
+    """
+    Reserve an inference pool slot for a streamed response.
+
+    Raises InferenceQueueFull (503) before streaming starts when the pool is
+    full. The returned ExitStack releases the slot when closed; register its
+    close with response.call_on_close so it runs once the stream is done.
+    """
+    admission = ExitStack()
+    admission.enter_context(inference_pool.admit())
+    return admission
+
+@app.route('/api/crop-recommendation/predict-batch', methods=['POST'])
+def api_crop_predict_batch():
+    """
+    Score many crop records in one request.
+
+    Accepts a JSON array of records (or {"records": [...], "top_k": 3}) or an
+    NDJSON body (Content-Type: application/x-ndjson, top_k as a query
+    parameter) and streams one NDJSON result line per record back in input
+    order.
+    """
+    if crop_model is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Crop recommendation model is not available'
+        }), 503
+
+    top_k = request.args.get('top_k')
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        # Read the body line by line so large uploads are never held in memory
+        records = crop_service.iter_ndjson(request.stream)
+    else:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            top_k = data.get('top_k', top_k)
+            data = data.get('records')
+        if not isinstance(data, list):
+            return jsonify({
+                'status': 'error',
+                'message': 'Expected a JSON array of records or an NDJSON body'
+            }), 400
+        records = data
+
+    try:
+        top_k = crop_service.parse_top_k(top_k, len(crop_classes))
+    except (TypeError, ValueError):
+        return jsonify({
+            'status': 'error',
+            'message': 'top_k must be a positive integer'
+        }), 400
+
+    chunk_size = app.config['CROP_BATCH_CHUNK_SIZE']
+    admission = admit_stream()
+    model = PooledModel(inference_pool, crop_model)
+
+    def generate():
+        for result in crop_service.predict_batch(model, records, chunk_size, top_k, crop_classes):
+            yield json.dumps(result) + '\n'
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.call_on_close(admission.close)
+    return response
+
+@app.route('/crop-recommendation/bulk', methods=['POST'])
+def crop_bulk_predict():
+    """
+    Score an uploaded CSV of soil samples and stream back the annotated CSV.
+
+    Accepts a multipart upload in the 'file' field or a raw text/csv body.
+    """
+    if crop_model is None:
+        return render_template('crop_recommendation.html', error="Crop recommendation model is not available")
+
+    if 'file' in request.files and request.files['file'].filename:
+        upload = request.files['file']
+        # Take ownership of the spooled upload: Flask closes request files
+        # when the view returns, before the streamed response is consumed
+        stream, upload.stream = upload.stream, BytesIO()
+    elif request.mimetype == 'text/csv':
+        stream = io.BufferedReader(request.stream)
+    else:
+        return render_template('crop_recommendation.html', error="Please choose a CSV file to upload.")
+
+    admission = admit_stream()
+    stats = {}
+    # Lines are passed as bytes so that score_csv decodes each row on its own
+    scored = crop_service.score_csv(stream, PooledModel(inference_pool, crop_model),
+                                    app.config['CROP_BATCH_CHUNK_SIZE'], stats)
+    try:
+        # Read the header now so a bad file is reported before streaming starts
+        header = next(scored)
+    except (ValueError, UnicodeDecodeError) as e:
+        stream.close()
+        admission.close()
+        return render_template('crop_recommendation.html', error=f"Error reading CSV file: {str(e)}")
+
+    def generate():
+        try:
+            yield header
+            yield from scored
+        finally:
+            stream.close()
+        print(f"Bulk crop scoring: {stats['rows']} rows ({stats['errors']} malformed) in "
+              f"{stats['seconds']:.2f}s, {stats['rows_per_second']:.0f} rows/s")
+
+    response = Response(stream_with_context(generate()), mimetype='text/csv',
+                        headers={'Content-Disposition': 'attachment; filename=crop_recommendations.csv'})
+    response.call_on_close(admission.close)
+    return response
+
+@app.route('/api/crop-grid/lookup')
+def api_crop_grid_lookup():
+    """Recommended crop of the precomputed grid cell nearest to temperature/humidity/rainfall"""
+    try:
+        grid = crop_grid.get()
+        point = {name: float(request.args[name]) for name in crop_grid_service.GRID_AXES}
+        crop = grid.lookup(**point)
+        if crop is None:
+            return jsonify({'status': 'error', 'message': 'Point is outside the precomputed grid'}), 404
+        return jsonify({
+            'status': 'success',
+            'prediction': crop,
+            'input': point,
+            'fixed': grid.meta['fixed']
+        })
+    except (KeyError, ValueError, OverflowError) as e:
+        return jsonify({'status': 'error', 'message': f"Invalid query: {str(e)}"}), 400
+
+@app.route('/api/crop-grid/slice')
+def api_crop_grid_slice():
+    """
+    Slice of the precomputed crop grid for map rendering.
+
+    Each axis can be fixed (?rainfall=120), limited (?temperature_min=10&temperature_max=30)
+    or left out to span the whole grid. Cells hold indices into 'classes'.
+    Slices of more than CROP_GRID_MAX_SLICE_CELLS cells are refused.
+    """
+    try:
+        grid = crop_grid.get()
+        ranges = {}
+        for name in crop_grid_service.GRID_AXES:
+            if name in request.args:
+                ranges[name] = float(request.args[name])
+            elif f'{name}_min' in request.args or f'{name}_max' in request.args:
+                ranges[name] = (float(request.args.get(f'{name}_min', '-inf')),
+                                float(request.args.get(f'{name}_max', 'inf')))
+        coords, indices = grid.query(ranges, app.config['CROP_GRID_MAX_SLICE_CELLS'])
+        return jsonify({
+            'status': 'success',
+            'axes': {name: values.tolist() for name, values in coords.items()},
+            'fixed': dict(grid.meta['fixed'], **{k: v for k, v in ranges.items() if not isinstance(v, tuple)}),
+            'classes': grid.meta['classes'],
+            'grid': indices.tolist()
+        })
+    except (ValueError, OverflowError) as e:
+        return jsonify({'status': 'error', 'message': f"Invalid query: {str(e)}"}), 400
+
+@app.route('/api/metrics')
+def api_metrics():
+    """Report inference metrics: micro-batching, prediction cache, inference pool, decision table, upload writer and sweeper, and async job counters."""
+    return jsonify({
+        'batching': {
+            batcher.name: batcher.metrics.snapshot()
+            for batcher in (crop_batcher, fertilizer_batcher)
+        },
+        'cache': {
+            cache.name: cache.stats()
+            for cache in (crop_cache, fertilizer_cache)
+        },
+        'inference_pool': inference_pool.stats(),
+        'fertilizer_table': fertilizer_table.stats() if fertilizer_table is not None else None,
+        'upload_writer': upload_writer.stats(),
+        'upload_sweeper': upload_sweeper.stats(),
+        'disease_jobs': disease_jobs.stats()
+    })
+
+@app.errorhandler(InferenceQueueFull)
+@app.errorhandler(job_queue.JobQueueFull)
+def inference_queue_full(e):
+    """Shed load with 503 when the inference pool or the job queue is at capacity"""
+    if request.path.startswith('/api/'):
+        response = jsonify({'status': 'error', 'message': str(e)})
+    else:
+        response = Response(str(e), mimetype='text/plain')
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
 # ----- Fertilizer Recommendation Routes -----
 
 @app.route('/fertilizer-recommendation')
 def fertilizer_recommendation():
-    # Mapping dictionaries
-    soil_type_mapping = {0: 'Black', 1: 'Clayey', 2: 'Loamy', 3: 'Red', 4: 'Sandy'}
-    crop_type_mapping = {0: 'Barley', 1: 'Cotton', 2: 'Ground Nuts', 3: 'Maize',
-                        4: 'Millets', 5: 'Oil seeds', 6: 'Paddy', 7: 'Pulses',
-                        8: 'Sugarcane', 9: 'Tobacco', 10: 'Wheat'}
-
     return render_template('fertilizer_recommendation.html',
-                          soil_types=list(soil_type_mapping.values()),
-                          crop_types=list(crop_type_mapping.values()))
+                          soil_types=fertilizer_service.SOIL_TYPES.tolist(),
+                          crop_types=fertilizer_service.CROP_TYPES.tolist())
 
 @app.route('/fertilizer-recommendation/predict', methods=['POST'])
 def fertilizer_predict():
-    # Mapping dictionaries
-    soil_type_mapping = {0: 'Black', 1: 'Clayey', 2: 'Loamy', 3: 'Red', 4: 'Sandy'}
-    soil_type_reverse = {v: k for k, v in soil_type_mapping.items()}
-
-    crop_type_mapping = {0: 'Barley', 1: 'Cotton', 2: 'Ground Nuts', 3: 'Maize',
-                        4: 'Millets', 5: 'Oil seeds', 6: 'Paddy', 7: 'Pulses',
-                        8: 'Sugarcane', 9: 'Tobacco', 10: 'Wheat'}
-    crop_type_reverse = {v: k for k, v in crop_type_mapping.items()}
-
-    fertilizer_mapping = {0: '10-26-26', 1: '14-35-14', 2: '17-17-17', 3: '20-20',
-                         4: '28-28', 5: 'DAP', 6: 'Urea'}
-
     try:
-        # Get form data
-        n_content = float(request.form['n_content'])
-        p_content = float(request.form['p_content'])
-        k_content = float(request.form['k_content'])
-        temperature = float(request.form['temperature'])
-        humidity = float(request.form['humidity'])
-        moisture = float(request.form['moisture'])
+        # Validate and encode the form like a single API record
+        matrix, errors = fertilizer_service.records_to_matrix([request.form.to_dict()])
+        if errors:
+            raise ValueError(errors[0])
+        n_content, p_content, k_content, temperature, humidity, moisture = matrix[0, :6].tolist()
         soil_type = request.form['soil_type']
         crop_type = request.form['crop_type']
 
-        # Convert soil and crop types to numerical values
-        soil_type_num = soil_type_reverse[soil_type]
-        crop_type_num = crop_type_reverse[crop_type]
-
-        # Create input array for prediction
-        input_data = np.array([[n_content, p_content, k_content, temperature,
-                               humidity, moisture, soil_type_num, crop_type_num]])
-
-        # Make prediction
-        prediction = fertilizer_model.predict(input_data)[0]
-        fertilizer = fertilizer_mapping[prediction]
+        # Make prediction through the cache and micro-batcher
+        with inference_pool.admit():
+            prediction = fertilizer_class(matrix[0])
+        fertilizer = fertilizer_service.FERTILIZERS[prediction]
 
         return render_template('fertilizer_result.html',
                               fertilizer=fertilizer,
@@ -994,98 +1439,116 @@ def fertilizer_predict():
                               soil_type=soil_type,
                               crop_type=crop_type)
 
+    except InferenceQueueFull:
+        raise
     except Exception as e:
         return render_template('fertilizer_recommendation.html',
                               error=f"Error making prediction: {str(e)}",
-                              soil_types=list(soil_type_mapping.values()),
-                              crop_types=list(crop_type_mapping.values()))
+                              soil_types=fertilizer_service.SOIL_TYPES.tolist(),
+                              crop_types=fertilizer_service.CROP_TYPES.tolist())
+
+@app.route('/api/fertilizer-recommendation/predict', methods=['POST'])
+def api_fertilizer_predict():
+    """
+    Recommend fertilizers for one record or a batch of records.
+
+    Accepts a single JSON object, a JSON array of objects or {"records": [...]}
+    with n_content, p_content, k_content, temperature, humidity, moisture,
+    soil_type and crop_type. A batch is encoded column-wise and scored with at
+    most one model call (rows the decision table covers are looked up);
+    results come back in input order.
+    """
+    if fertilizer_model is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Fertilizer recommendation model is not available'
+        }), 503
+
+    data = request.get_json(silent=True)
+    single = isinstance(data, dict) and 'records' not in data
+    records = [data] if single else data.get('records') if isinstance(data, dict) else data
+    if not isinstance(records, list):
+        return jsonify({
+            'status': 'error',
+            'message': 'Expected a JSON object, an array of objects or {"records": [...]}'
+        }), 400
+
+    try:
+        with inference_pool.admit():
+            results = fertilizer_service.predict_records(fertilizer_classes, records)
+    except InferenceQueueFull:
+        raise
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+    if single:
+        result = results[0]
+        result.pop('index')
+        return jsonify(result), 200 if result['status'] == 'success' else 400
+
+    return jsonify({
+        'status': 'success',
+        'count': len(results),
+        'errors': sum(result['status'] == 'error' for result in results),
+        'results': results
+    })
 
 # ----- Plant Disease Detection Routes -----
 
+@app.route('/api/diseases')
+def api_diseases():
+    """
+    The plant disease catalog: label, crop, condition and advice of every
+    class, in model output order. Cacheable; clients revalidate with
+    If-None-Match and then only need class indexes from the predict APIs.
+    """
+    return catalog_response(disease_catalog.catalog_json, disease_catalog.etag)
+
+@app.route('/api/diseases/<key>')
+def api_disease(key):
+    """One class of the plant disease catalog, by class index or class name."""
+    index = disease_catalog.find(key)
+    if index is None:
+        return jsonify({'status': 'error', 'message': f"Unknown disease class '{key}'"}), 404
+    return catalog_response(disease_catalog.entry_json[index], f'{disease_catalog.etag}-{index}')
+
+def catalog_response(body, etag):
+    """JSON response with an ETag and Cache-Control, 304 if the client's copy is current"""
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = app.config['DISEASE_CATALOG_MAX_AGE']
+    return response.make_conditional(request)
+
 @app.route('/plant-disease')
 def plant_disease():
     return render_template('plant_disease.html')
 
+def cached_disease_scores(image_hash):
+    """Class scores (1, n_classes) stored for an image by the current plant disease model, or None"""
+    record = DiseasePrediction.query.filter_by(image_hash=image_hash, model_checksum=disease_model_checksum).first()
+    if record is None:
+        return None
+    return np.frombuffer(record.scores, dtype=np.float32)[np.newaxis, :]
+
+def store_disease_scores(image_hash, scores):
+    """Store the class scores of an image in the persistent prediction cache"""
+    db.session.add(DiseasePrediction(image_hash=image_hash, model_checksum=disease_model_checksum,
+                                     scores=np.asarray(scores[0], dtype=np.float32).tobytes()))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Stored concurrently by another request for the same image
+        db.session.rollback()
+
 @app.route('/plant-disease/predict', methods=['POST'])
 def plant_disease_predict():
     """
     Process plant disease detection from uploaded image using the ONNX model.
     """
-    # Complete disease database with all classes from the model
-    disease_db = {
-        "Apple___Apple_scab": {
-            "solution": "Apply fungicides containing myclobutanil or sulfur. Begin applications at bud break and continue at 7-10 day intervals during wet spring weather.",
-            "tips": [
-                "Prune infected branches during dormant season",
-                "Remove and destroy fallen leaves to reduce fungal spores",
-                "Plant resistant apple varieties like Liberty, Enterprise, or Williams Pride",
-                "Ensure good air circulation by proper tree spacing and pruning",
-                "Apply protective fungicides before rain events"
-            ]
-        },
-        "Apple___Black_rot": {
-            "solution": "Apply fungicides containing captan or thiophanate-methyl. Prune out infected branches and remove mummified fruits.",
-            "tips": [
-                "Remove all mummified fruits from the tree and ground",
-                "Prune out cankers and dead wood during dormant season",
-                "Maintain good sanitation in the orchard",
-                "Apply fungicides during the growing season",
-                "Ensure proper spacing for air circulation"
-            ]
-        },
-        "Apple___Cedar_apple_rust": {
-            "solution": "Apply fungicides containing mancozeb or myclobutanil. Remove nearby cedar trees if possible.",
-            "tips": [
-                "Remove nearby juniper or cedar trees (alternate hosts)",
-                "Apply protective fungicides in spring before infection",
-                "Plant resistant apple varieties",
-                "Maintain good air circulation",
-                "Remove infected leaves and fruit"
-            ]
-        },
-        "Apple___healthy": {
-            "solution": "Continue good orchard management practices to maintain tree health.",
-            "tips": [
-                "Maintain regular pruning schedule",
-                "Apply balanced fertilization based on soil tests",
-                "Monitor for early signs of pests or disease",
-                "Ensure adequate irrigation during dry periods",
-                "Practice good sanitation in the orchard"
-            ]
-        },
-        "Tomato___Late_blight": {
-            "solution": "Apply copper-based fungicides or approved fungicides containing chlorothalonil, mancozeb, or maneb. Begin applications before disease appears when conditions favor disease development.",
-            "tips": [
-                "Water at the base of plants to keep foliage dry",
-                "Improve air circulation by proper plant spacing and staking",
-                "Remove and destroy infected plants immediately",
-                "Rotate crops - don't plant tomatoes or potatoes in the same location for 3-4 years",
-                "Use resistant varieties when available",
-                "Mulch around plants to prevent soil splash onto leaves"
-            ]
-        },
-        "Tomato___Early_blight": {
-            "solution": "Apply fungicides containing chlorothalonil, mancozeb, or copper. Remove and destroy infected leaves.",
-            "tips": [
-                "Remove lower infected leaves promptly",
-                "Mulch around plants to prevent soil splash",
-                "Provide adequate spacing for air circulation",
-                "Rotate crops - avoid planting tomatoes in the same location for 3 years",
-                "Water at the base of plants to keep foliage dry"
-            ]
-        },
-        "Tomato___healthy": {
-            "solution": "Continue good gardening practices to maintain plant health.",
-            "tips": [
-                "Maintain consistent watering schedule",
-                "Provide support for growing plants",
-                "Apply balanced fertilizer according to soil test results",
-                "Monitor regularly for early signs of pests or disease",
-                "Maintain proper spacing for good air circulation"
-            ]
-        }
-    }
-
     # Check if file was uploaded
     if 'file' not in request.files:
         return render_template("plant_disease.html", error="No file was uploaded. Please select an image file.")
@@ -1102,103 +1565,65 @@ def plant_disease_predict():
         return render_template("plant_disease.html", error="Invalid file type. Please upload a PNG, JPG, JPEG, or GIF image.")
 
     try:
-        # Create a secure filename with UUID to prevent conflicts
-        import uuid
+        # Read the upload into memory; it is decoded from there and the
+        # original is persisted by the background writer under its SHA-256,
+        # so a photo submitted twice is stored once
+        image_data = file.read()
+        image_hash = upload_store.content_hash(image_data)
         file_extension = os.path.splitext(file.filename)[1].lower()
-        unique_filename = f"{str(uuid.uuid4())}{file_extension}"
-
-        # Ensure the uploads directory exists
-        upload_dir = os.path.join('static', 'uploads')
-        os.makedirs(upload_dir, exist_ok=True)
-
-        # Full path to save the file
-        filepath = os.path.join(upload_dir, unique_filename)
-
-        # Save the file
-        file.save(filepath)
-        print(f"Successfully saved image to {filepath}")
-
-        # Verify the file was saved correctly
-        if not os.path.exists(filepath):
-            raise Exception("Failed to save the uploaded file")
-
-        # Define the disease classes mapping
-        disease_classes = {
-            0: 'Apple___Apple_scab', 1: 'Apple___Black_rot', 2: 'Apple___Cedar_apple_rust',
-            3: 'Apple___healthy', 4: 'Blueberry___healthy',
-            5: 'Cherry_(including_sour)___Powdery_mildew', 6: 'Cherry_(including_sour)___healthy',
-            7: 'Corn_(maize)___Cercospora_leaf_spot Gray_leaf_spot', 8: 'Corn_(maize)___Common_rust_',
-            9: 'Corn_(maize)___Northern_Leaf_Blight', 10: 'Corn_(maize)___healthy',
-            11: 'Grape___Black_rot', 12: 'Grape___Esca_(Black_Measles)',
-            13: 'Grape___Leaf_blight_(Isariopsis_Leaf_Spot)', 14: 'Grape___healthy',
-            15: 'Orange___Haunglongbing_(Citrus_greening)', 16: 'Peach___Bacterial_spot',
-            17: 'Peach___healthy', 18: 'Pepper,_bell___Bacterial_spot', 19: 'Pepper,_bell___healthy',
-            20: 'Potato___Early_blight', 21: 'Potato___Late_blight', 22: 'Potato___healthy',
-            23: 'Raspberry___healthy', 24: 'Soybean___healthy', 25: 'Squash___Powdery_mildew',
-            26: 'Strawberry___Leaf_scorch', 27: 'Strawberry___healthy', 28: 'Tomato___Bacterial_spot',
-            29: 'Tomato___Early_blight', 30: 'Tomato___Late_blight', 31: 'Tomato___Leaf_Mold',
-            32: 'Tomato___Septoria_leaf_spot', 33: 'Tomato___Spider_mites Two-spotted_spider_mite',
-            34: 'Tomato___Target_Spot', 35: 'Tomato___Tomato_Yellow_Leaf_Curl_Virus',
-            36: 'Tomato___Tomato_mosaic_virus', 37: 'Tomato___healthy'
-        }
+        stored_filename = upload_store.content_name(image_hash, file_extension)
 
         # Check if the ONNX model is loaded
         if ort_session is None:
             raise Exception("Plant disease detection model is not available")
 
-        # Process the image for prediction
-        from PIL import Image
-        import numpy as np
-
-        # Load and preprocess the image
-        img = Image.open(filepath)
-        img = img.resize((224, 224))  # Resize to model input size
-        img_array = np.array(img).astype(np.float32)
-
-        # Normalize the image (0-255 to 0-1)
-        img_array = img_array / 255.0
-
-        # Add batch dimension and ensure correct channel order (RGB)
-        img_array = np.expand_dims(img_array, axis=0)
-
-        # Make prediction using the ONNX model
-        outputs = ort_session.run(None, {input_name: img_array})
+        # Repeat submissions are answered from the persistent cache
+        prediction = cached_disease_scores(image_hash)
+        if prediction is None:
+            # Decode and preprocess the image in memory: resize to the model
+            # input size and, unless the model does it, scale 0-255 to 0-1
+            # into a batch of one (NHWC)
+            img_array = np.empty((1, 224, 224, 3), dtype=disease_input_dtype)
+            disease_service.decode_image(image_data, out=img_array[0])
+
+            # Make prediction using the ONNX model
+            with inference_pool.admit():
+                prediction = inference_pool.run(disease_runner, img_array)
+            store_disease_scores(image_hash, prediction)
+
+        # Persist the original and a display thumbnail off the request path
+        thumbnail_filename = upload_store.thumbnail_name(image_hash)
+        upload_writer.save(image_data, stored_filename, thumbnail_filename)
+        upload_sweeper.ensure_started()
 
         # Get the predicted class
-        prediction = outputs[0]
         class_idx = np.argmax(prediction[0])
         confidence = prediction[0][class_idx]
 
         # Get the disease name
-        disease_name = disease_classes[class_idx]
+        disease_name = disease_catalog.names[class_idx]
 
         print(f"Predicted disease: {disease_name} with confidence {confidence*100:.1f}%")
 
         # Get advice for the predicted disease
-        advice = disease_db.get(disease_name, {
-            "solution": "Consult a local agricultural expert for proper diagnosis and treatment recommendations.",
-            "tips": [
-                "Isolate the affected plant to prevent potential spread",
-                "Check soil conditions and adjust if necessary",
-                "Monitor other plants for similar symptoms",
-                "Take multiple clear photos of symptoms for expert consultation"
-            ]
-        })
+        advice = disease_catalog.advice(class_idx)
 
-        # Use the URL path that will work in the template
-        image_url = f"/static/uploads/{unique_filename}"
+        # Show the thumbnail rather than the full-size original
+        image_url = url_for('upload_thumbnail', filename=thumbnail_filename)
 
         # Return the results
         return render_template(
             "plant_disease.html",
-            prediction=disease_name.replace("___", " - "),  # Format the disease name for display
+            prediction=disease_catalog.label(class_idx),  # Format the disease name for display
             confidence=f"{confidence*100:.1f}%",
             image_path=image_url,
             solution=advice["solution"],
             tips=advice["tips"],
-            is_healthy="healthy" in disease_name.lower()
+            is_healthy=bool(disease_catalog.healthy[class_idx])
         )
 
+    except InferenceQueueFull:
+        raise
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -1213,6 +1638,344 @@ def plant_disease_predict():
 
         return render_template("plant_disease.html", error=error_message)
 
+def disease_batch_items(eager=False):
+    """
+    Collect the images of a batch plant-disease request.
+
+    Args:
+        eager (bool): Read the uploads into memory so the items outlive the
+            request (async jobs); otherwise they are read while scoring
+
+    Returns:
+        tuple: ((name, loader) items, requested batch size)
+
+    Raises:
+        ValueError: If the upload or parameters are invalid
+    """
+    max_images = app.config['DISEASE_MAX_IMAGES']
+    items = []
+    if request.mimetype in ('application/zip', 'application/x-zip-compressed'):
+        items = disease_service.archive_items(BytesIO(request.get_data()), max_images)
+    for file in request.files.getlist('files') + request.files.getlist('file'):
+        if file.filename.lower().endswith('.zip'):
+            items += disease_service.archive_items(BytesIO(file.read()) if eager else file.stream, max_images)
+        elif disease_service.is_image_name(file.filename):
+            items.append((file.filename, (lambda data=file.read(): data) if eager else file.read))
+        else:
+            raise ValueError(f"Unsupported file type: {file.filename}")
+    batch_size = int(request.values.get('batch_size', app.config['DISEASE_BATCH_SIZE']))
+    if batch_size < 1:
+        raise ValueError("batch_size must be a positive integer")
+    return items, batch_size
+
+def run_disease_model(batch):
+    """Class scores of an input batch, computed on the inference pool"""
+    return inference_pool.run(disease_runner, batch)
+
+def score_disease_batch(items, batch_size):
+    """
+    Score (name, loader) items in fixed-size batches and attach the advice.
+
+    Returns:
+        dict: The batch response body (count, errors, throughput, results)
+    """
+    started = time.perf_counter()
+    results = list(disease_service.predict_images(run_disease_model, items, len(items), batch_size,
+                                                  disease_layout, decode_pool, disease_input_dtype,
+                                                  fixed_batch=bool(disease_fixed_batch)))
+    seconds = time.perf_counter() - started
+
+    for result in results:
+        if result['status'] == 'success':
+            class_idx = result['class_index']
+            result.update({
+                'disease': disease_catalog.names[class_idx],
+                'is_healthy': bool(disease_catalog.healthy[class_idx]),
+                **disease_catalog.advice(class_idx)
+            })
+
+    print(f"Batch plant disease prediction: {len(results)} images in {seconds:.2f}s "
+          f"({len(results) / seconds:.1f} images/s, batch size {batch_size})")
+    return {
+        'status': 'success',
+        'count': len(results),
+        'errors': sum(result['status'] == 'error' for result in results),
+        'batch_size': batch_size,
+        'images_per_second': round(len(results) / seconds, 2),
+        'results': results
+    }
+
+@app.route('/api/plant-disease/predict', methods=['POST'])
+def api_plant_disease_predict():
+    """
+    Classify leaf images and return the top-k classes with probabilities.
+
+    Takes the same uploads as /api/plant-disease/predict-batch. Parameters:
+    k (classes per image, default DISEASE_TOP_K), aggregate=1 to add the
+    total probability of the healthy classes and of the diseased ones, and
+    tta (test-time augmentation views per image, default DISEASE_TTA_VIEWS)
+    to average the scores over crops and mirror images of each image. One
+    image uploaded as 'file' returns a single result, anything else
+    {count, errors, results}. Probabilities are the softmax of the model
+    outputs (see DISEASE_OUTPUT), computed for each batch at once.
+    """
+    if ort_session is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Plant disease detection model is not available'
+        }), 503
+
+    max_images = app.config['DISEASE_MAX_IMAGES']
+    try:
+        items, batch_size = disease_batch_items()
+        k = int(request.values.get('k', app.config['DISEASE_TOP_K']))
+        if k < 1:
+            raise ValueError("k must be a positive integer")
+        views = int(request.values.get('tta', app.config['DISEASE_TTA_VIEWS']))
+        if not 1 <= views <= len(disease_service.TTA_VIEWS):
+            raise ValueError(f"tta must be between 1 and {len(disease_service.TTA_VIEWS)}")
+        if disease_fixed_batch and disease_fixed_batch % views:
+            raise ValueError(f"tta must divide the model's fixed batch size {disease_fixed_batch}")
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    if not items:
+        return jsonify({'status': 'error', 'message': 'No images were uploaded'}), 400
+    if len(items) > max_images:
+        return jsonify({'status': 'error', 'message': f"Too many images, the limit is {max_images}"}), 400
+
+    aggregate = request.values.get('aggregate', '0').lower() in ('1', 'true', 'yes')
+    uploads = request.files.getlist('file') + request.files.getlist('files')
+    single = len(items) == 1 and len(uploads) == 1 and not uploads[0].filename.lower().endswith('.zip')
+    # Images per model call; with TTA each takes views rows of the batch
+    if disease_fixed_batch:
+        batch_size = disease_fixed_batch // views
+    else:
+        batch_size = max(1, min(batch_size, app.config['DISEASE_BATCH_SIZE'] // views, len(items)))
+
+    def summarize(scores):
+        top, probabilities, healthy = disease_service.top_k(
+            scores, k, disease_healthy_classes if aggregate else None, app.config['DISEASE_OUTPUT'])
+        summaries = []
+        for row in range(len(scores)):
+            best = int(top[row, 0])
+            summary = {
+                'class_index': best,
+                'disease': disease_catalog.names[best],
+                'label': disease_catalog.label(best),
+                'probability': float(probabilities[row, 0]),
+                'is_healthy': bool(disease_catalog.healthy[best]),
+                'top_k': [{'class_index': int(c), 'disease': disease_catalog.names[c], 'probability': float(p)}
+                          for c, p in zip(top[row], probabilities[row])]
+            }
+            if healthy is not None:
+                summary['healthy_probability'] = float(healthy[row])
+                summary['diseased_probability'] = float(1.0 - healthy[row])
+            summaries.append(summary)
+        return summaries
+
+    try:
+        with inference_pool.admit():
+            results = list(disease_service.predict_images(run_disease_model, items, len(items), batch_size,
+                                                          disease_layout, decode_pool, disease_input_dtype,
+                                                          summarize, views, bool(disease_fixed_batch)))
+    except InferenceQueueFull:
+        raise
+    except Exception as e:
+        print(f"Error in plant disease API prediction: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+    if single:
+        result = results[0]
+        if result['status'] == 'error':
+            return jsonify({'status': 'error', 'message': result['message']}), 400
+        return jsonify({'status': 'success', 'tta_views': views,
+                        **{key: value for key, value in result.items() if key not in ('index', 'status')}})
+    return jsonify({
+        'status': 'success',
+        'tta_views': views,
+        'count': len(results),
+        'errors': sum(result['status'] == 'error' for result in results),
+        'results': results
+    })
+
+def score_disease_tiles(image_data, stride, scale):
+    """
+    Tiled diagnosis of one photo: a per-tile class heatmap and an aggregate
+    over all tiles.
+
+    Returns:
+        dict: The tiles response body
+    """
+    started = time.perf_counter()
+    image = disease_service.decode_for_tiles(image_data, scale)
+    batch_size = disease_fixed_batch or app.config['DISEASE_BATCH_SIZE']
+    ys, xs, scores = disease_service.predict_tiles(run_disease_model, image, batch_size, disease_layout,
+                                                   disease_input_dtype, stride,
+                                                   max_tiles=app.config['DISEASE_MAX_TILES'])
+    heatmap = scores.argmax(axis=2)
+    confidence = np.take_along_axis(scores, heatmap[..., np.newaxis], axis=2)[..., 0]
+
+    # Aggregate: class with the highest mean score over the tiles, and how
+    # many tiles each disease wins
+    mean_scores = scores.reshape(-1, scores.shape[2]).mean(axis=0)
+    best = int(mean_scores.argmax())
+    tile_classes, tile_counts = np.unique(heatmap, return_counts=True)
+    healthy_tiles = int(tile_counts[disease_catalog.healthy[tile_classes]].sum())
+    seconds = time.perf_counter() - started
+    print(f"Tiled plant disease prediction: {heatmap.size} tiles in {seconds:.2f}s")
+    return {
+        'status': 'success',
+        'image_size': list(image.size),
+        'tile_size': list(disease_service.INPUT_SIZE),
+        'stride': stride,
+        'rows': len(ys),
+        'columns': len(xs),
+        'tile_x': xs,
+        'tile_y': ys,
+        'heatmap': heatmap.tolist(),
+        'confidence': np.round(confidence.astype(float), 4).tolist(),
+        'classes': {int(c): disease_catalog.names[c] for c in tile_classes},
+        'aggregate': {
+            'class_index': best,
+            'disease': disease_catalog.names[best],
+            'label': disease_catalog.label(best),
+            'mean_score': float(mean_scores[best]),
+            'is_healthy': bool(disease_catalog.healthy[best]),
+            'healthy_tile_fraction': round(healthy_tiles / heatmap.size, 4),
+            'tiles_per_class': {disease_catalog.names[c]: int(n) for c, n in zip(tile_classes, tile_counts)},
+            **disease_catalog.advice(best)
+        },
+        'seconds': round(seconds, 3)
+    }
+
+@app.route('/api/plant-disease/predict-tiles', methods=['POST'])
+def api_plant_disease_predict_tiles():
+    """
+    Diagnose a large field photo tile by tile.
+
+    The uploaded 'file' is cut into overlapping windows of the model input
+    size (stride parameter, default DISEASE_TILE_STRIDE), optionally after
+    shrinking it by scale (0 < scale <= 1). The windows are scored in
+    batches and the response has the class and confidence of every tile as
+    row-major grids plus an aggregate diagnosis. With async=1 the photo is
+    queued as a job like /api/plant-disease/predict-batch.
+    """
+    if ort_session is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Plant disease detection model is not available'
+        }), 503
+
+    file = request.files.get('file')
+    if file is None or not disease_service.is_image_name(file.filename):
+        return jsonify({'status': 'error', 'message': 'Upload one image as the file field'}), 400
+    try:
+        stride = int(request.values.get('stride', app.config['DISEASE_TILE_STRIDE']))
+        scale = float(request.values.get('scale', 1.0))
+        if stride < 1 or not 0 < scale <= 1:
+            raise ValueError("stride must be a positive integer and scale in (0, 1]")
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    image_data = file.read()
+    if request.values.get('async', '0').lower() in ('1', 'true', 'yes'):
+        job_id = disease_jobs.submit(score_disease_tiles, image_data, stride, scale, images=1)
+        status_url = url_for('api_plant_disease_job', job_id=job_id)
+        response = jsonify({'status': 'accepted', 'job_id': job_id, 'status_url': status_url})
+        response.status_code = 202
+        response.headers['Location'] = status_url
+        return response
+
+    try:
+        with inference_pool.admit():
+            return jsonify(score_disease_tiles(image_data, stride, scale))
+    except InferenceQueueFull:
+        raise
+    except (ValueError, OSError, Image.DecompressionBombError) as e:
+        return jsonify({'status': 'error', 'message': f"Could not tile image: {e}"}), 400
+    except Exception as e:
+        print(f"Error in tiled plant disease prediction: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/uploads/thumbnails/<path:filename>')
+def upload_thumbnail(filename):
+    """Serve the display thumbnail of an upload, waiting briefly if it is still being written."""
+    if not filename.endswith(upload_store.THUMBNAIL_SUFFIX):
+        abort(404)
+    upload_writer.wait(filename, timeout=5)
+    try:
+        upload_index.touch(filename)
+    except sqlite3.Error as e:
+        print(f"Error updating the upload index: {e}")
+    # Content-addressed, so the file never changes
+    return send_from_directory(UPLOAD_DIR, filename, max_age=365 * 86400)
+
+@app.route('/api/plant-disease/predict-batch', methods=['POST'])
+def api_plant_disease_predict_batch():
+    """
+    Classify many leaf images in one request.
+
+    Accepts multipart uploads (any number of 'files'/'file' fields, each an
+    image or a zip archive of images) or a zip archive as the request body
+    (Content-Type: application/zip). Images are decoded in parallel and
+    scored in fixed-size batches (optional 'batch_size' parameter); results
+    come back in upload order with class, confidence and advice.
+
+    With async=1 the images are queued as a job and the response (202) only
+    carries its id; GET /api/plant-disease/jobs/<job_id> returns the status
+    and, once done, the same body as the synchronous response.
+    """
+    if ort_session is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Plant disease detection model is not available'
+        }), 503
+
+    max_images = app.config['DISEASE_MAX_IMAGES']
+    run_async = request.values.get('async', '0').lower() in ('1', 'true', 'yes')
+    try:
+        items, batch_size = disease_batch_items(eager=run_async)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    if not items:
+        return jsonify({'status': 'error', 'message': 'No images were uploaded'}), 400
+    if len(items) > max_images:
+        return jsonify({'status': 'error', 'message': f"Too many images, the limit is {max_images}"}), 400
+
+    # A model exported with a fixed batch dimension only accepts that size
+    batch_size = disease_fixed_batch or min(batch_size, app.config['DISEASE_BATCH_SIZE'], len(items))
+
+    if run_async:
+        # Bounded by the job queue instead of the inference pool admission
+        job_id = disease_jobs.submit(score_disease_batch, items, batch_size, images=len(items))
+        status_url = url_for('api_plant_disease_job', job_id=job_id)
+        response = jsonify({'status': 'accepted', 'job_id': job_id, 'status_url': status_url})
+        response.status_code = 202
+        response.headers['Location'] = status_url
+        return response
+
+    try:
+        with inference_pool.admit():
+            return jsonify(score_disease_batch(items, batch_size))
+    except InferenceQueueFull:
+        raise
+    except Exception as e:
+        print(f"Error in batch plant disease prediction: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/plant-disease/jobs/<job_id>')
+def api_plant_disease_job(job_id):
+    """
+    Status of an async plant-disease job: state (queued, running, done or
+    failed), queue wait and run time, and the result once done.
+    """
+    job = disease_jobs.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Unknown or expired job'}), 404
+    return jsonify({'status': 'success', 'job': job})
+
 # ----- Chatbot Routes -----
 
 @app.route('/chatbot')
@@ -0,0 +1,173 @@
+"""
+Micro-batching dispatcher for model inference.
+
+Concurrent Flask handlers submit single inputs; a background thread collects
+everything that arrives within a short window (or until the batch is full),
+runs the model once on the whole batch and hands each handler its own result.
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+
+import numpy as np
+
+# Defaults for the collection window
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_MAX_WAIT_MS = 2.0
+# Seconds a caller waits for its result before giving up
+DEFAULT_TIMEOUT = 30.0
+
+# Number of recent queue-wait samples kept for percentiles
+WAIT_SAMPLES = 4096
+
+
+class BatchMetrics:
+    """Thread-safe batch-size distribution and queue wait statistics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.batch_sizes = Counter()
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.recent_waits = deque(maxlen=WAIT_SAMPLES)
+
+    def record(self, waits, failed=False):
+        """Record one dispatched batch given the queue wait of each item in seconds."""
+        with self._lock:
+            self.batch_sizes[len(waits)] += 1
+            self.batches += 1
+            self.items += len(waits)
+            if failed:
+                self.errors += 1
+            self.wait_total += sum(waits)
+            self.wait_max = max(self.wait_max, max(waits))
+            self.recent_waits.extend(waits)
+
+    def snapshot(self):
+        """Return the metrics as a JSON-serializable dict (wait times in ms)."""
+        with self._lock:
+            recent = np.array(self.recent_waits) * 1000
+            return {
+                'batches': self.batches,
+                'items': self.items,
+                'errors': self.errors,
+                'mean_batch_size': round(self.items / self.batches, 2) if self.batches else 0,
+                'batch_size_distribution': {str(k): v for k, v in sorted(self.batch_sizes.items())},
+                'queue_wait_ms': {
+                    'mean': round(self.wait_total * 1000 / self.items, 3) if self.items else 0,
+                    'p50': round(float(np.percentile(recent, 50)), 3) if len(recent) else 0,
+                    'p99': round(float(np.percentile(recent, 99)), 3) if len(recent) else 0,
+                    'max': round(self.wait_max * 1000, 3)
+                }
+            }
+
+
+class MicroBatcher:
+    """
+    Collect single inputs into batches for one model.
+
+    Args:
+        name (str): Name reported in metrics
+        batch_fn (callable): Takes a list of inputs and returns a sequence of
+            results of the same length and order
+        max_batch_size (int): Dispatch as soon as this many inputs are waiting
+        max_wait_ms (float): Dispatch at most this long after the first input
+            of a batch arrived
+        timeout (float): Seconds __call__ waits for a result by default
+    """
+
+    def __init__(self, name, batch_fn, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS,
+                 timeout=DEFAULT_TIMEOUT):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.timeout = timeout
+        self.metrics = BatchMetrics()
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+
+    def submit(self, item):
+        """Queue one input and return a Future for its result."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def __call__(self, item, timeout=None):
+        """
+        Queue one input and block until its result is ready.
+
+        Raises:
+            concurrent.futures.TimeoutError: If there is no result after
+                timeout seconds (self.timeout by default)
+        """
+        return self.submit(item).result(self.timeout if timeout is None else timeout)
+
+    def _ensure_started(self):
+        # Start lazily, and again in a forked worker where the thread is gone
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name=f'batcher-{self.name}', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            try:
+                deadline = batch[0][2] + self.max_wait
+                while len(batch) < self.max_batch_size:
+                    remaining = deadline - time.perf_counter()
+                    try:
+                        if remaining > 0:
+                            batch.append(self._queue.get(timeout=remaining))
+                        else:
+                            # Window closed: still take whatever is already queued
+                            batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                self._dispatch(batch)
+            except Exception as e:
+                # Keep the dispatcher alive for later callers; fail this batch
+                print(f"Error in {self.name} batcher: {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _dispatch(self, batch):
+        started = time.perf_counter()
+        waits = [started - submitted for _, _, submitted in batch]
+        try:
+            results = self.batch_fn([item for item, _, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"{self.name} batch function returned {len(results)} results for {len(batch)} inputs")
+        except Exception as e:
+            self.metrics.record(waits, failed=True)
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        self.metrics.record(waits)
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+def stack_rows(predict):
+    """Wrap a model method so it scores a list of 1-D feature rows in one call."""
+    def batch_fn(rows):
+        return predict(np.vstack(rows))
+    return batch_fn
@@ -0,0 +1,69 @@
+"""
+Benchmark the flattened crop forest evaluator against scikit-learn.
+
+Reports p50/p99 predict latency at batch sizes 1, 64 and 4096 and checks
+that both engines agree on every prediction first.
+
+Usage:
+    python benchmarks/crop_forest_benchmark.py [--repeats 200]
+"""
+
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tree_ensemble import FlatForest  # noqa: E402
+
+MODEL_PATH = os.path.join(ROOT, 'models', 'crop_recommender_rf.joblib')
+BATCH_SIZES = [1, 64, 4096]
+
+# Realistic ranges for N, P, K, temperature, humidity, ph, rainfall
+FEATURE_LOW = [0, 5, 5, 8, 14, 3.5, 20]
+FEATURE_HIGH = [140, 145, 205, 44, 100, 10, 300]
+
+
+def measure(predict, X, repeats):
+    """Return p50 and p99 latency of predict(X) in milliseconds."""
+    predict(X)  # warm up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict(X)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeats', type=int, default=200, help='timed calls per batch size')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    model = joblib.load(MODEL_PATH)
+    flat = FlatForest.from_sklearn(model)
+
+    rng = np.random.default_rng(0)
+    X = rng.uniform(FEATURE_LOW, FEATURE_HIGH, size=(max(BATCH_SIZES), len(FEATURE_LOW)))
+
+    if not np.array_equal(model.predict_proba(X), flat.predict_proba(X)):
+        sys.exit("Parity check failed: probabilities differ from scikit-learn")
+    print(f"Parity check passed on {len(X)} rows\n")
+
+    print(f"{'batch':>6} {'engine':>8} {'p50 ms':>10} {'p99 ms':>10} {'rows/s':>12}")
+    for batch_size in BATCH_SIZES:
+        batch = X[:batch_size]
+        for name, predict in [('sklearn', model.predict), ('flat', flat.predict)]:
+            p50, p99 = measure(predict, batch, args.repeats)
+            print(f"{batch_size:>6} {name:>8} {p50:>10.3f} {p99:>10.3f} {batch_size / p50 * 1000:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
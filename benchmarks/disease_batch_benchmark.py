@@ -0,0 +1,65 @@
+"""
+Benchmark batched plant-disease inference throughput.
+
+Decodes the sample images in static/uploads (repeated up to --images) on a
+thread pool into fixed-size batches and reports images/s per batch size.
+
+Usage:
+    python benchmarks/disease_batch_benchmark.py [--images 256] [--model path.onnx]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import onnxruntime as ort
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import disease_service  # noqa: E402
+
+SAMPLES = os.path.join(ROOT, 'static', 'uploads')
+MODEL_PATH = os.path.join(ROOT, 'models', 'plant_disease_optimized.onnx')
+BATCH_SIZES = [1, 2, 4, 8, 16, 32, 64]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--images', type=int, default=256, help='images scored per batch size')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--decode-workers', type=int, default=os.cpu_count() or 4)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        sys.exit(f"Model not found: {args.model}")
+    session = ort.InferenceSession(args.model)
+    input_name = session.get_inputs()[0].name
+    layout, fixed_batch = disease_service.input_layout(session)
+    if fixed_batch:
+        sys.exit(f"The model has a fixed batch size of {fixed_batch}, nothing to sweep")
+
+    paths = glob.glob(os.path.join(SAMPLES, '**', '*'), recursive=True)
+    samples = [open(path, 'rb').read() for path in sorted(paths) if disease_service.is_image_name(path)]
+    items = [(str(i), lambda data=samples[i % len(samples)]: data) for i in range(args.images)]
+
+    def run(batch):
+        return session.run(None, {input_name: batch})[0]
+
+    print(f"{args.images} images, {layout}, {args.decode_workers} decode workers, {os.cpu_count()} CPUs\n")
+    print(f"{'batch':>6} {'seconds':>10} {'images/s':>10}")
+    with ThreadPoolExecutor(args.decode_workers) as pool:
+        list(disease_service.predict_images(run, items[:8], 8, 8, layout, pool))  # warm up
+        for batch_size in BATCH_SIZES:
+            start = time.perf_counter()
+            for _ in disease_service.predict_images(run, items, len(items), batch_size, layout, pool):
+                pass
+            seconds = time.perf_counter() - start
+            print(f"{batch_size:>6} {seconds:>10.3f} {args.images / seconds:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
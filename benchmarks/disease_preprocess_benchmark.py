@@ -0,0 +1,135 @@
+"""
+Benchmark plant-disease image preprocessing: full decode against JPEG draft decoding.
+
+Times every preprocessing variant from encoded bytes to the model input on
+the sample images in static/uploads and on 12 MP phone-sized JPEGs made
+from them, and checks each against the app's preprocess_image:
+
+    reference:  Image.open -> convert('RGB') -> resize -> / 255.0 -> float32
+    full:       decode_image with draft decoding off
+    draft xN:   JPEG decoded at a reduced scale of at least N x the input size
+    uint8:      draft x2 pixels for a model with the scaling folded in
+
+With --model, the variants are also scored by the model (top-1 agreement
+with the reference input) and, if the onnx package is installed, the
+float and uint8-input models are timed end to end.
+
+Usage:
+    python benchmarks/disease_preprocess_benchmark.py [--repeats 20] [--model models/plant_disease_optimized.onnx]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import disease_model  # noqa: E402
+import disease_service  # noqa: E402
+
+PHONE_SIZE = (4032, 3024)
+
+
+def reference_preprocess(data, target_size=(224, 224)):
+    """app.preprocess_image, reading from bytes instead of a path."""
+    img = Image.open(BytesIO(data)).convert('RGB').resize(target_size)
+    return np.expand_dims(np.array(img) / 255.0, axis=0).astype(np.float32)
+
+
+def phone_photo(data):
+    """Re-encode an image as a 12 MP JPEG."""
+    img = Image.open(BytesIO(data)).convert('RGB').resize(PHONE_SIZE)
+    buffer = BytesIO()
+    img.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def variants():
+    def float_input(draft):
+        return lambda data: disease_service.decode_image(data, draft=draft)[None]
+    return {
+        'reference': reference_preprocess,
+        'full': float_input(0),
+        'draft x1': float_input(1),
+        'draft x2': float_input(2),
+        'draft x4': float_input(4),
+        'uint8': lambda data: disease_service.decode_pixels(data, draft=2)[None]
+    }
+
+
+def timed(fn, images, repeats):
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for data in images:
+            fn(data)
+    return (time.perf_counter() - started) / (repeats * len(images))
+
+
+def report(title, images, repeats, session=None):
+    print(f"\n{title} ({len(images)} images)")
+    print(f"{'variant':<10} {'ms/image':>9} {'max |diff|':>11} {'mean |diff|':>12} {'top-1':>7}")
+    reference = [reference_preprocess(data) for data in images]
+    for name, fn in variants().items():
+        inputs = [fn(data) for data in images]
+        diffs = np.abs(np.stack(inputs) / (255.0 if name == 'uint8' else 1.0) - np.stack(reference))
+        agreement = ''
+        if session is not None and name != 'uint8':
+            input_name = session.get_inputs()[0].name
+            top1 = [np.argmax(session.run(None, {input_name: x})[0]) for x in (inputs + reference)]
+            agreement = f"{np.mean(np.equal(top1[:len(images)], top1[len(images):])):.0%}"
+        print(f"{name:<10} {timed(fn, images, repeats) * 1000:>9.2f} {diffs.max() * 255:>9.2f}/255 "
+              f"{diffs.mean() * 255:>8.3f}/255 {agreement:>7}")
+
+
+def end_to_end(model_path, images, repeats):
+    """Time decode plus model call with the float model and its uint8-input version."""
+    import onnxruntime as ort
+    try:
+        import onnx  # noqa: F401
+    except ImportError:
+        print("\nonnx is not installed, skipped the uint8-input model")
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        uint8_path = os.path.join(tmp, 'uint8.onnx')
+        disease_model.fold_scaling(model_path, uint8_path)
+        print(f"\nEnd to end, one image per call ({len(images)} images)")
+        for label, path, decode in [('float, full decode', model_path, lambda d: disease_service.decode_image(d, draft=0)),
+                                    ('float, draft x2', model_path, disease_service.decode_image),
+                                    ('uint8, draft x2', uint8_path, disease_service.decode_pixels)]:
+            session = ort.InferenceSession(path, providers=['CPUExecutionProvider'])
+            run = disease_service.session_runner(session, {})
+            seconds = timed(lambda data: run(decode(data)[None]), images, repeats)
+            print(f"{label:<20} {seconds * 1000:>8.2f} ms/image")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeats', type=int, default=20, help='timed passes over the images')
+    parser.add_argument('--model', help='float-input ONNX model for the top-1 and end-to-end checks')
+    args = parser.parse_args()
+
+    samples = disease_model.sample_images()
+    if not samples:
+        sys.exit(f"No sample images in {disease_model.SAMPLES}")
+    phone = [phone_photo(data) for data in samples]
+
+    session = None
+    if args.model:
+        import onnxruntime as ort
+        session = ort.InferenceSession(args.model, providers=['CPUExecutionProvider'])
+
+    report('Sample images', samples, args.repeats, session)
+    report(f'{PHONE_SIZE[0]}x{PHONE_SIZE[1]} JPEGs', phone, max(1, args.repeats // 10), session)
+    if args.model:
+        end_to_end(args.model, phone, max(1, args.repeats // 10))
+
+
+if __name__ == '__main__':
+    main()
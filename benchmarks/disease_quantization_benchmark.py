@@ -0,0 +1,92 @@
+"""
+Compare the float plant-disease model with its uint8-input and INT8 variants.
+
+For every variant, reports the file size, the throughput of the model calls
+at the given batch size and the top-1 agreement with the float model on
+the images of a local folder (static/uploads by default). Each variant is
+fed the input its serving path would feed it (float32 or uint8 pixels).
+
+Variants are the existing models/plant_disease_uint8.onnx and
+models/plant_disease_int8.onnx, any --variant NAME=PATH, and with --build
+static and dynamic INT8 versions quantized from the float model into a
+temporary directory (needs the onnx package).
+
+Usage:
+    python benchmarks/disease_quantization_benchmark.py [--build] [--images static/uploads]
+        [--variant int8=models/plant_disease_int8.onnx] [--batch-size 16] [--repeats 3]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import disease_model  # noqa: E402
+
+MODEL_PATH = os.path.join(ROOT, 'models', 'plant_disease_optimized.onnx')
+KNOWN_VARIANTS = {
+    'uint8 input': os.path.join(ROOT, 'models', 'plant_disease_uint8.onnx'),
+    'int8': os.path.join(ROOT, 'models', 'plant_disease_int8.onnx')
+}
+
+
+def measure(path, images, batch_size, repeats):
+    """Scores of one pass and the best images/s over the timed passes."""
+    scores, _ = disease_model.score_images(path, images, batch_size)
+    seconds = min(disease_model.score_images(path, images, batch_size)[1] for _ in range(repeats))
+    return scores, len(images) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--model', default=MODEL_PATH, help='float model, the reference')
+    parser.add_argument('--images', default=disease_model.SAMPLES, help='folder of evaluation images')
+    parser.add_argument('--limit', type=int, help='evaluate on this many images drawn at random')
+    parser.add_argument('--variant', action='append', default=[], metavar='NAME=PATH')
+    parser.add_argument('--build', action='store_true', help='quantize static and dynamic INT8 variants first')
+    parser.add_argument('--calibration-size', type=int, default=disease_model.DEFAULT_CALIBRATION_SIZE)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--repeats', type=int, default=3, help='timed passes per variant, best is reported')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        sys.exit(f"Float model not found: {args.model}")
+    images = disease_model.sample_images(args.images, args.limit)
+    if not images:
+        sys.exit(f"No images in {args.images}")
+
+    variants = {'float': args.model}
+    variants.update({name: path for name, path in KNOWN_VARIANTS.items() if os.path.exists(path)})
+    for spec in args.variant:
+        name, path = spec.split('=', 1)
+        variants[name] = path
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.build:
+            # Calibrate on a different random draw than a --limit evaluation set would use
+            calibration = disease_model.sample_images(args.images, args.calibration_size, seed=1)
+            for mode in disease_model.QUANTIZATION_MODES:
+                path = os.path.join(tmp, f'int8_{mode}.onnx')
+                disease_model.quantize(args.model, path, mode, calibration)
+                variants[f'int8 {mode} (built)'] = path
+            print(f"Built INT8 variants, static calibrated on {len(calibration)} images")
+
+        print(f"{len(images)} images from {args.images}, batch size {args.batch_size}\n")
+        print(f"{'variant':<22} {'size MiB':>9} {'images/s':>9} {'speedup':>8} {'top-1 agree':>12} {'max |diff|':>11}")
+        reference, reference_rate = None, None
+        for name, path in variants.items():
+            scores, rate = measure(path, images, args.batch_size, args.repeats)
+            if reference is None:
+                reference, reference_rate = scores, rate
+            agreement = np.mean(scores.argmax(axis=1) == reference.argmax(axis=1))
+            print(f"{name:<22} {os.path.getsize(path) / 2 ** 20:>9.2f} {rate:>9.1f} {rate / reference_rate:>7.2f}x "
+                  f"{agreement:>12.2%} {np.abs(scores - reference).max():>11.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Measure tiled plant-disease inference on a large field photograph.
+
+Decodes the photo once, then scores every overlapping window of the model
+input size at the given stride in batches, the way /api/plant-disease/
+predict-tiles does. Reports decode time, tiles/s and memory: the decoded
+raster PIL holds (at most MAX_TILE_PIXELS), the peak of the NumPy buffers
+allocated while tiling (tracemalloc: bands, the batch and the score grid)
+and the peak RSS of the process, model included.
+
+Usage:
+    python benchmarks/disease_tile_benchmark.py PHOTO [--model models/plant_disease_optimized.onnx]
+        [--stride 160] [--scale 1.0] [--batch-size 16]
+"""
+
+import argparse
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import disease_service  # noqa: E402
+
+MODEL_PATH = os.path.join(ROOT, 'models', 'plant_disease_optimized.onnx')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('photo')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--stride', type=int, default=disease_service.DEFAULT_TILE_STRIDE)
+    parser.add_argument('--scale', type=float, default=1.0, help='shrink the photo first, 0 < scale <= 1')
+    parser.add_argument('--batch-size', type=int, default=16)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        sys.exit(f"Model not found: {args.model}")
+    session = disease_service.create_session(args.model, {})
+    run = disease_service.session_runner(session, {})
+    layout, fixed_batch = disease_service.input_layout(session)
+    dtype = disease_service.input_dtype(session)
+    batch_size = fixed_batch or args.batch_size
+    with open(args.photo, 'rb') as f:
+        data = f.read()
+
+    started = time.perf_counter()
+    image = disease_service.decode_for_tiles(data, args.scale)
+    decode_seconds = time.perf_counter() - started
+    # Warm-up, allocates the bindings of the batch shape
+    disease_service.predict_tiles(run, image, batch_size, layout, dtype, args.stride, max_tiles=10 ** 9)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    ys, xs, scores = disease_service.predict_tiles(run, image, batch_size, layout, dtype, args.stride,
+                                                   max_tiles=10 ** 9)
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    tiles = len(ys) * len(xs)
+    width, height = disease_service.INPUT_SIZE
+    print(f"{args.photo}: decoded at {image.img.size[0]}x{image.img.size[1]} in {decode_seconds * 1000:.1f} ms, "
+          f"tiled at {image.size[0]}x{image.size[1]}")
+    print(f"{tiles} tiles ({len(ys)} rows x {len(xs)} columns), stride {args.stride}, batch size {batch_size}")
+    print(f"Inference: {seconds * 1000:.1f} ms, {tiles / seconds:.1f} tiles/s")
+    print(f"Decoded raster:             {image.nbytes / 2 ** 20:8.2f} MiB")
+    print(f"Peak NumPy memory tiling:   {peak / 2 ** 20:8.2f} MiB")
+    print(f"Process peak RSS:           {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10:8.2f} MiB")
+    print(f"(the tiles stacked as float32 would take {tiles * 4 * width * height * 3 / 2 ** 20:.1f} MiB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Measure the latency overhead of test-time augmentation on plant-disease images.
+
+For every sample image in static/uploads, times decode plus inference:
+
+    plain:        one decode at the input size, one model call on 1 row
+    single pass:  one decode with the TTA margin, N views stacked into one
+                  batch (crops and mirror images are views, copied once into
+                  the batch) and one model call on N rows
+    separate:     the same N views scored with N model calls
+
+for N = 2, 4 and 8, and reports the overhead of each over plain inference.
+
+Usage:
+    python benchmarks/disease_tta_benchmark.py [--model models/plant_disease_optimized.onnx] [--repeats 20]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import disease_model  # noqa: E402
+import disease_service  # noqa: E402
+
+MODEL_PATH = os.path.join(ROOT, 'models', 'plant_disease_optimized.onnx')
+
+
+def timed(fn, images, repeats):
+    for data in images:
+        fn(data)  # warm-up, allocates the bindings of each batch shape
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for data in images:
+            fn(data)
+    return (time.perf_counter() - started) / (repeats * len(images))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--repeats', type=int, default=20, help='timed passes over the images')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        sys.exit(f"Model not found: {args.model}")
+    images = disease_model.sample_images()
+    if not images:
+        sys.exit(f"No sample images in {disease_model.SAMPLES}")
+
+    session = disease_service.create_session(args.model, {})
+    run = disease_service.session_runner(session, {})
+    layout, fixed_batch = disease_service.input_layout(session)
+    if fixed_batch:
+        sys.exit("The model has a fixed batch size, TTA needs a dynamic batch dimension")
+    dtype = disease_service.input_dtype(session)
+    width, height = disease_service.INPUT_SIZE
+    shape = (height, width, 3) if layout == 'NHWC' else (3, height, width)
+
+    def plain(data):
+        batch = np.empty((1,) + shape, dtype)
+        if layout == 'NHWC':
+            disease_service.decode_image(data, out=batch[0])
+        else:
+            batch[0] = disease_service.decode_image(data, out=np.empty((height, width, 3), dtype)).transpose(2, 0, 1)
+        return run(batch)
+
+    def single_pass(n_views):
+        def score(data):
+            batch = np.empty((n_views,) + shape, dtype)
+            disease_service.decode_augmented(data, batch, layout)
+            return run(batch).mean(axis=0)
+        return score
+
+    def separate(n_views):
+        def score(data):
+            batch = np.empty((n_views,) + shape, dtype)
+            disease_service.decode_augmented(data, batch, layout)
+            return np.mean([run(batch[i:i + 1])[0] for i in range(n_views)], axis=0)
+        return score
+
+    baseline = timed(plain, images, args.repeats)
+    print(f"{len(images)} images, {args.model}\n")
+    print(f"{'views':>5} {'single pass ms':>15} {'overhead':>9} {'separate ms':>12} {'overhead':>9}")
+    print(f"{1:>5} {baseline * 1000:>15.2f} {'':>9} {'':>12} {'':>9}")
+    for n_views in (2, 4, 8):
+        batched = timed(single_pass(n_views), images, args.repeats)
+        looped = timed(separate(n_views), images, args.repeats)
+        print(f"{n_views:>5} {batched * 1000:>15.2f} {batched / baseline - 1:>+9.0%} "
+              f"{looped * 1000:>12.2f} {looped / baseline - 1:>+9.0%}")
+
+
+if __name__ == '__main__':
+    main()
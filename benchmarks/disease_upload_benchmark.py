@@ -0,0 +1,104 @@
+"""
+Benchmark the in-memory plant-disease upload path against the disk round-trip.
+
+For every sample image in static/uploads, times the request path from the
+uploaded file to the model input (and the model call, if
+models/plant_disease_optimized.onnx exists):
+
+    disk:   file.save -> os.path.exists -> Image.open(path) -> preprocess
+    memory: file.read -> decode into the input buffer -> queue background write
+
+Usage:
+    python benchmarks/disease_upload_benchmark.py [--repeats 50]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+import uuid
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import disease_service  # noqa: E402
+
+SAMPLES = os.path.join(ROOT, 'static', 'uploads')
+MODEL_PATH = os.path.join(ROOT, 'models', 'plant_disease_optimized.onnx')
+
+
+def disk_path(file, upload_dir, infer):
+    filepath = os.path.join(upload_dir, f'{uuid.uuid4()}.jpg')
+    file.save(filepath)
+    if not os.path.exists(filepath):
+        raise RuntimeError("Failed to save the uploaded file")
+    img = Image.open(filepath)
+    img = img.resize((224, 224))
+    img_array = np.array(img).astype(np.float32)
+    img_array = img_array / 255.0
+    img_array = np.expand_dims(img_array, axis=0)
+    return infer(img_array)
+
+
+def memory_path(file, writer, infer):
+    image_data = file.read()
+    img_array = np.empty((1, 224, 224, 3), dtype=np.float32)
+    disease_service.decode_image(image_data, out=img_array[0])
+    writer.save(image_data, f'{uuid.uuid4()}.jpg')
+    return infer(img_array)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeats', type=int, default=50, help='timed uploads per sample and path')
+    args = parser.parse_args()
+
+    paths = glob.glob(os.path.join(SAMPLES, '**', '*'), recursive=True)
+    samples = [open(path, 'rb').read() for path in sorted(paths) if disease_service.is_image_name(path)]
+    if not samples:
+        sys.exit(f"No sample images in {SAMPLES}")
+
+    infer = lambda x: x  # noqa: E731
+    if os.path.exists(MODEL_PATH):
+        import onnxruntime as ort
+        session = ort.InferenceSession(MODEL_PATH)
+        input_name = session.get_inputs()[0].name
+        infer = lambda x: session.run(None, {input_name: x})  # noqa: E731
+        print(f"Including the model call ({MODEL_PATH})")
+    else:
+        print("Model not found, timing the path up to the model input")
+
+    # Write next to static/uploads so both paths hit the same filesystem
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(SAMPLES)) as upload_dir:
+        writer = disease_service.UploadWriter(upload_dir)
+        timings = {'disk': [], 'memory': []}
+        for _ in range(args.repeats):
+            for data in samples:
+                for name in timings:
+                    file = FileStorage(BytesIO(data), filename='leaf.jpg')
+                    start = time.perf_counter()
+                    if name == 'disk':
+                        disk_path(file, upload_dir, infer)
+                    else:
+                        memory_path(file, writer, infer)
+                    timings[name].append((time.perf_counter() - start) * 1000)
+        writer.join()
+
+    print(f"{len(samples)} samples x {args.repeats} repeats\n")
+    print(f"{'path':>8} {'mean ms':>10} {'p50 ms':>10} {'p99 ms':>10}")
+    for name, values in timings.items():
+        print(f"{name:>8} {np.mean(values):>10.3f} {np.percentile(values, 50):>10.3f} "
+              f"{np.percentile(values, 99):>10.3f}")
+    saving = 1 - np.mean(timings['memory']) / np.mean(timings['disk'])
+    print(f"\nMean latency saving of the in-memory path: {saving:.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark the fleet-wide fertilizer planning job.
+
+Fills a temporary SQLite database with --farms farms, each with a few soil
+records of N/P/K/moisture values, then times the latest-record query, the
+single model call and the bulk insert of plan_fertilizers. Without
+models/xgb_pipeline.pkl a stand-in pipeline is used.
+
+Usage:
+    python benchmarks/fertilizer_plan_benchmark.py [--farms 100000]
+"""
+
+import argparse
+import os
+import pickle
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fertilizer_plan import SOIL_COMPONENTS, plan_fertilizers  # noqa: E402
+from fertilizer_xgb_benchmark import MODEL_PATH, stand_in_pipeline  # noqa: E402
+
+# Minimal schema of the tables the job touches, as created by app.py
+SCHEMA = [
+    'CREATE TABLE soil_component (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL UNIQUE)',
+    'CREATE TABLE soil_record (id INTEGER PRIMARY KEY, farm_id INTEGER NOT NULL, date DATETIME NOT NULL)',
+    'CREATE TABLE soil_value (id INTEGER PRIMARY KEY, soil_record_id INTEGER NOT NULL, '
+    'component_id INTEGER NOT NULL, value FLOAT NOT NULL)',
+    'CREATE TABLE fertilizer_recommendation (id INTEGER PRIMARY KEY, farm_id INTEGER NOT NULL, '
+    'soil_record_id INTEGER NOT NULL, soil_type VARCHAR(20) NOT NULL, crop_type VARCHAR(20) NOT NULL, '
+    'fertilizer VARCHAR(20) NOT NULL, created_at DATETIME NOT NULL)'
+]
+
+
+def populate(connection, n_farms, records_per_farm, rng):
+    for statement in SCHEMA:
+        connection.execute(text(statement))
+    connection.execute(text('INSERT INTO soil_component (id, name) VALUES (:id, :name)'),
+                       [{'id': i + 1, 'name': name} for i, name in enumerate(SOIL_COMPONENTS)])
+
+    n_records = n_farms * records_per_farm
+    farm_ids = np.repeat(np.arange(1, n_farms + 1), records_per_farm)
+    days = rng.integers(0, 365, n_records)
+    start = datetime(2024, 1, 1)
+    connection.execute(text('INSERT INTO soil_record (id, farm_id, date) VALUES (:id, :farm_id, :date)'), [
+        {'id': i + 1, 'farm_id': farm_id, 'date': start + timedelta(days=day)}
+        for i, (farm_id, day) in enumerate(zip(farm_ids.tolist(), days.tolist()))
+    ])
+
+    values = rng.uniform([4, 0, 0, 25], [42, 42, 19, 65], size=(n_records, len(SOIL_COMPONENTS)))
+    connection.execute(text('INSERT INTO soil_value (soil_record_id, component_id, value) '
+                            'VALUES (:record, :component, :value)'), [
+        {'record': record + 1, 'component': component + 1, 'value': value}
+        for record, row in enumerate(values.tolist()) for component, value in enumerate(row)
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--farms', type=int, default=100000)
+    parser.add_argument('--records-per-farm', type=int, default=3)
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    rng = np.random.default_rng(0)
+    if os.path.exists(MODEL_PATH):
+        with open(MODEL_PATH, 'rb') as f:
+            model = pickle.load(f)
+    else:
+        print(f"{MODEL_PATH} not found, using a stand-in pipeline")
+        model = stand_in_pipeline(rng)
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'plan.db')}")
+        with engine.begin() as connection:
+            started = time.perf_counter()
+            populate(connection, args.farms, args.records_per_farm, rng)
+            print(f"Populated {args.farms} farms x {args.records_per_farm} records "
+                  f"in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        with engine.begin() as connection:
+            stats = plan_fertilizers(connection, model.predict, 'Loamy', 'Wheat', 30.0, 60.0)
+        total = time.perf_counter() - started
+
+        with engine.connect() as connection:
+            written = connection.execute(text('SELECT COUNT(*) FROM fertilizer_recommendation')).scalar()
+        engine.dispose()
+
+    print(f"Planned {stats['scored']} farms in {total:.2f}s (query {stats['query_seconds']}s, "
+          f"scoring {stats['score_seconds']}s, writing {stats['write_seconds']}s); {written} rows stored")
+
+
+if __name__ == '__main__':
+    main()
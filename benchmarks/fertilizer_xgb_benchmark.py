@@ -0,0 +1,93 @@
+"""
+Benchmark the native XGBoost fertilizer engine against the sklearn pipeline.
+
+Reports p50/p99 predict latency for a single row and a 10k-row batch and
+checks that both engines agree on every prediction first. Without
+models/xgb_pipeline.pkl a stand-in StandardScaler + XGBClassifier pipeline
+is trained on synthetic data.
+
+Usage:
+    python benchmarks/fertilizer_xgb_benchmark.py [--repeats 200]
+"""
+
+import argparse
+import os
+import pickle
+import sys
+import time
+import warnings
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from xgb_native import NativeXGBPipeline  # noqa: E402
+
+MODEL_PATH = os.path.join(ROOT, 'models', 'xgb_pipeline.pkl')
+BATCH_SIZES = [1, 10000]
+
+# Realistic ranges for N, P, K, temperature, humidity, moisture, soil type, crop type
+FEATURE_LOW = [4, 0, 0, 25, 50, 25, 0, 0]
+FEATURE_HIGH = [42, 42, 19, 38, 72, 65, 4, 10]
+
+
+def measure(predict, X, repeats):
+    """Return p50 and p99 latency of predict(X) in milliseconds."""
+    predict(X)  # warm up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict(X)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+
+def sample(rng, n):
+    X = rng.uniform(FEATURE_LOW, FEATURE_HIGH, size=(n, len(FEATURE_LOW)))
+    X[:, 6:] = np.round(X[:, 6:])
+    return X
+
+
+def stand_in_pipeline(rng):
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+    from xgboost import XGBClassifier
+
+    X = sample(rng, 5000)
+    y = (X[:, 0] // 6 + X[:, 2] // 5 + X[:, 7]).astype(int) % 7
+    return Pipeline([('scaler', StandardScaler()),
+                     ('xgb', XGBClassifier(n_estimators=100, max_depth=6, n_jobs=1))]).fit(X, y)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeats', type=int, default=200, help='timed calls per batch size')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    rng = np.random.default_rng(0)
+    if os.path.exists(MODEL_PATH):
+        with open(MODEL_PATH, 'rb') as f:
+            model = pickle.load(f)
+    else:
+        print(f"{MODEL_PATH} not found, benchmarking a stand-in pipeline")
+        model = stand_in_pipeline(rng)
+    native = NativeXGBPipeline.from_pipeline(model)
+    native.n_jobs = 1
+
+    X = sample(rng, max(BATCH_SIZES))
+    if not np.array_equal(model.predict(X), native.predict(X)):
+        sys.exit("Parity check failed: predictions differ from the pipeline")
+    print(f"Parity check passed on {len(X)} rows\n")
+
+    print(f"{'batch':>6} {'engine':>8} {'p50 ms':>10} {'p99 ms':>10} {'rows/s':>12}")
+    for batch_size in BATCH_SIZES:
+        batch = X[:batch_size]
+        for name, predict in [('pipeline', model.predict), ('native', native.predict)]:
+            p50, p99 = measure(predict, batch, args.repeats)
+            print(f"{batch_size:>6} {name:>8} {p50:>10.3f} {p99:>10.3f} {batch_size / p50 * 1000:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark crop prediction latency under concurrent load with and without the inference pool.
+
+64 client threads (by default) each send single-row predictions as fast as
+they can. Scenarios:
+  direct         every client calls the model itself (the app before the pool)
+  direct-njobs   same, with the forest's n_jobs=-1 so every call fans out
+                 over all cores (the oversubscription the pool prevents)
+  pool           calls go through InferencePool with pinned model threads;
+                 requests beyond its capacity are rejected (503 in the app)
+
+Usage:
+    python benchmarks/inference_pool_benchmark.py [--clients 64] [--requests 50]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from inference_pool import InferencePool, InferenceQueueFull, limit_native_threads, pin_model_threads  # noqa: E402
+
+MODEL_PATH = os.path.join(ROOT, 'models', 'crop_recommender_rf.joblib')
+
+
+def run_clients(call, n_clients, n_requests, rows):
+    """Return per-request latencies (ms) and the number of rejected requests."""
+    latencies = []
+    rejected = [0]
+    lock = threading.Lock()
+    start_gate = threading.Barrier(n_clients)
+
+    def client(offset):
+        start_gate.wait()
+        local = []
+        for i in range(n_requests):
+            row = rows[(offset + i) % len(rows)][np.newaxis, :]
+            started = time.perf_counter()
+            try:
+                call(row)
+            except InferenceQueueFull:
+                with lock:
+                    rejected[0] += 1
+                continue
+            local.append((time.perf_counter() - started) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i * n_requests,)) for i in range(n_clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return np.array(latencies), rejected[0], time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--requests', type=int, default=50, help='requests per client')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4, help='inference pool threads')
+    parser.add_argument('--queue', type=int, default=64, help='inference pool queue size')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    model = joblib.load(MODEL_PATH)
+    rng = np.random.default_rng(0)
+    rows = rng.uniform([0, 5, 5, 8, 14, 3.5, 20], [140, 145, 205, 44, 100, 10, 300], size=(1000, 7))
+
+    def direct(row):
+        return model.predict(row)
+
+    pool = InferencePool(args.workers, args.queue)
+
+    def pooled(row):
+        with pool.admit():
+            return pool.run(model.predict, row)
+
+    print(f"{args.clients} clients x {args.requests} requests, {os.cpu_count()} cores\n")
+    print(f"{'scenario':>13} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9} {'req/s':>9} {'rejected':>9}")
+
+    scenarios = [
+        ('direct', direct, lambda: setattr(model, 'n_jobs', None)),
+        ('direct-njobs', direct, lambda: setattr(model, 'n_jobs', -1)),
+        ('pool', pooled, lambda: (limit_native_threads(1), pin_model_threads(model, 1))),
+    ]
+    for name, call, setup in scenarios:
+        setup()
+        latencies, rejected, elapsed = run_clients(call, args.clients, args.requests, rows)
+        print(f"{name:>13} {np.percentile(latencies, 50):>9.2f} {np.percentile(latencies, 99):>9.2f} "
+              f"{latencies.max():>9.2f} {len(latencies) / elapsed:>9.0f} {rejected:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Measure per-worker memory of the crop model for each loading engine.
+
+Starts N worker processes per engine (as a WSGI server would), has each load
+the crop model and run one prediction, then reports the model's share of
+RSS and PSS per worker while all workers are alive. PSS divides shared pages
+between the processes mapping them, so it shows what memory-mapping saves.
+
+Linux only (reads /proc/self/smaps_rollup).
+
+Usage:
+    python benchmarks/model_memory_benchmark.py [--workers 16]
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_PATH = os.path.join(ROOT, 'models', 'crop_recommender_rf.joblib')
+
+
+def memory_kb():
+    """Return (rss, pss) of the current process in kB."""
+    values = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Pss:'):
+                values[parts[0]] = int(parts[1])
+    return values['Rss:'], values['Pss:']
+
+
+def worker(engine, barrier, results):
+    sys.path.insert(0, ROOT)
+    warnings.filterwarnings('ignore')
+    import numpy as np
+    import model_store
+
+    rss_before, pss_before = memory_kb()
+    model = model_store.load_crop_model(MODEL_PATH, engine)
+    model.predict(np.array([[90, 42, 43, 20.87, 82.0, 6.5, 202.93]]))
+
+    # Measure once every worker holds the model, as in a live deployment
+    barrier.wait()
+    rss_after, pss_after = memory_kb()
+    results.put((rss_after - rss_before, pss_after - pss_before))
+    barrier.wait()
+
+
+def run(engine, n_workers):
+    ctx = mp.get_context('spawn')
+    barrier = ctx.Barrier(n_workers)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(engine, barrier, results)) for _ in range(n_workers)]
+    for p in procs:
+        p.start()
+    samples = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    rss = sum(s[0] for s in samples) / n_workers
+    pss = sum(s[1] for s in samples) / n_workers
+    return rss, pss
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--workers', type=int, default=16, help='worker processes per engine')
+    args = parser.parse_args()
+
+    # Export the memory-mapped arrays up front so workers only open them
+    sys.path.insert(0, ROOT)
+    import model_store
+    model_store.load_crop_model(MODEL_PATH, 'mmap')
+
+    print(f"Model memory per worker with {args.workers} workers (kB)\n")
+    print(f"{'engine':>8} {'RSS':>10} {'PSS':>10} {'PSS total':>12}")
+    for engine in model_store.CROP_ENGINES:
+        rss, pss = run(engine, args.workers)
+        print(f"{engine:>8} {rss:>10.0f} {pss:>10.0f} {pss * args.workers:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Sweep ONNX Runtime session settings for the plant disease model.
+
+Times every combination of graph optimization level, intra-op threads,
+execution mode, memory arena and IOBinding at a fixed batch size on the CPU
+and prints the fastest configuration as environment variables for app.py.
+
+Usage:
+    python benchmarks/ort_session_sweep.py [--batch-size 1] [--repeats 50] [--model path.onnx]
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import disease_service  # noqa: E402
+
+MODEL_PATH = os.path.join(ROOT, 'models', 'plant_disease_optimized.onnx')
+
+
+def thread_counts():
+    """1, 2, 4, ... up to the number of CPUs"""
+    cpus = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cpus:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cpus:
+        counts.append(cpus)
+    return counts
+
+
+def measure(run, batch, repeats):
+    """Return p50 and p99 latency of run(batch) in milliseconds."""
+    for _ in range(3):  # warm up, lets the arena and memory patterns settle
+        run(batch)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run(batch)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--batch-size', type=int, default=1)
+    parser.add_argument('--repeats', type=int, default=50, help='timed calls per configuration')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        sys.exit(f"Model not found: {args.model}")
+
+    grid = {
+        'graph_optimization': list(disease_service.GRAPH_OPTIMIZATION_LEVELS),
+        'intra_op_threads': thread_counts(),
+        'execution_mode': list(disease_service.EXECUTION_MODES),
+        'cpu_mem_arena': [True, False],
+        'io_binding': [True, False]
+    }
+
+    batch = None
+    results = []
+    print(f"{'optimization':>12} {'threads':>7} {'mode':>10} {'arena':>5} {'binding':>7} {'p50 ms':>9} {'p99 ms':>9}")
+    for values in itertools.product(*grid.values()):
+        config = dict(zip(grid, values))
+        # Parallel mode runs independent graph branches on the inter-op pool
+        config['inter_op_threads'] = config['intra_op_threads'] if config['execution_mode'] == 'parallel' else 1
+        config['mem_pattern'] = config['cpu_mem_arena']
+        session = disease_service.create_session(args.model, config)
+        if batch is None:
+            layout, fixed_batch = disease_service.input_layout(session)
+            size = fixed_batch or args.batch_size
+            width, height = disease_service.INPUT_SIZE
+            shape = (height, width, 3) if layout == 'NHWC' else (3, height, width)
+            batch = np.random.default_rng(0).random((size,) + shape, dtype=np.float32)
+        p50, p99 = measure(disease_service.session_runner(session, config), batch, args.repeats)
+        results.append((p50, p99, config))
+        print(f"{config['graph_optimization']:>12} {config['intra_op_threads']:>7} {config['execution_mode']:>10} "
+              f"{config['cpu_mem_arena']!s:>5} {config['io_binding']!s:>7} {p50:>9.3f} {p99:>9.3f}")
+
+    p50, p99, best = min(results, key=lambda result: result[0])
+    print(f"\nBest configuration for batch size {len(batch)} on {os.cpu_count()} CPUs "
+          f"(p50 {p50:.3f} ms, p99 {p99:.3f} ms):")
+    print(f"ORT_GRAPH_OPTIMIZATION={best['graph_optimization']}")
+    print(f"ORT_INTRA_OP_THREADS={best['intra_op_threads']}")
+    print(f"ORT_INTER_OP_THREADS={best['inter_op_threads']}")
+    print(f"ORT_EXECUTION_MODE={best['execution_mode']}")
+    print(f"ORT_CPU_MEM_ARENA={int(best['cpu_mem_arena'])}")
+    print(f"ORT_MEM_PATTERN={int(best['mem_pattern'])}")
+    print(f"ORT_IO_BINDING={int(best['io_binding'])}")
+
+
+if __name__ == '__main__':
+    main()
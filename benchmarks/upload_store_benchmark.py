@@ -0,0 +1,83 @@
+"""
+Benchmark the upload index against directory scans at large file counts.
+
+Fills a temporary sharded store with --files small uploads (each with a
+thumbnail), then times what the quota sweeper needs per run: the total size
+from the index versus an os.walk of the tree, and evicting down to the low
+watermark once the store is 1% over its quota, least recently used first.
+Also times the one-off reindex scan and the per-view index update.
+
+Usage:
+    python benchmarks/upload_store_benchmark.py [--files 100000]   # 1000000 takes a few minutes to set up
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import upload_store  # noqa: E402
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def walk_total(directory):
+    total = 0
+    for path, _, files in os.walk(directory):
+        for name in files:
+            total += os.path.getsize(os.path.join(path, name))
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--files', type=int, default=100000, help='uploads in the store')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = os.path.join(tmp, 'uploads')
+        index = upload_store.UploadIndex(os.path.join(tmp, 'index.sqlite3'))
+
+        started = time.perf_counter()
+        rows, now = [], time.time()
+        for i in range(args.files):
+            digest = hashlib.sha256(str(i).encode()).hexdigest()
+            original, thumbnail = upload_store.content_name(digest, '.jpg'), upload_store.thumbnail_name(digest)
+            os.makedirs(os.path.join(directory, os.path.dirname(original)), exist_ok=True)
+            for name, size in ((original, 300), (thumbnail, 100)):
+                with open(os.path.join(directory, name), 'wb') as f:
+                    f.write(b'\0' * size)
+            rows.append((original, thumbnail, 400, now - args.files + i))
+            if len(rows) == 10000:
+                index.add_many(rows)
+                rows = []
+        index.add_many(rows)
+        print(f"Created {args.files} uploads ({2 * args.files} files) in {time.perf_counter() - started:.1f}s\n")
+
+        (count, nbytes), seconds = timed(index.totals)
+        print(f"Total size from the index:   {seconds * 1000:9.1f} ms ({count} uploads, {nbytes / 2 ** 20:.1f} MiB)")
+        _, seconds = timed(lambda: walk_total(directory))
+        print(f"Total size from os.walk:     {seconds * 1000:9.1f} ms")
+        _, seconds = timed(lambda: index.least_recent(upload_store.EVICTION_CHUNK))
+        print(f"Least recently used {upload_store.EVICTION_CHUNK}:    {seconds * 1000:9.1f} ms")
+
+        quota = nbytes * 0.99
+        stats, seconds = timed(lambda: upload_store.sweep(directory, index, quota))
+        print(f"Sweep 1% over quota:         {seconds * 1000:9.1f} ms ({stats['evicted']} uploads evicted)")
+        _, seconds = timed(lambda: index.touch(upload_store.thumbnail_name(hashlib.sha256(b'7').hexdigest())))
+        print(f"Index update on a view:      {seconds * 1000:9.1f} ms")
+        count, seconds = timed(lambda: upload_store.reindex(directory, index))
+        print(f"Reindex scan:                {seconds * 1000:9.1f} ms ({count} uploads)")
+
+
+if __name__ == '__main__':
+    main()
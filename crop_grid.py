@@ -0,0 +1,253 @@
+"""
+Precomputed crop-suitability grid for map rendering.
+
+The crop model is evaluated once over a discretized temperature x humidity x
+rainfall grid at fixed soil N/P/K/pH. The recommended crop of every cell is
+stored as a uint8 class index in a .npy file that is memory-mapped for O(1)
+lookups and slice queries. The grid is rebuilt when the model file changes.
+
+Usage:
+    python crop_grid.py            # build (or refresh) the grid
+    python crop_grid.py --force    # rebuild even if it is up to date
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from crop_service import CROP_FEATURES
+
+# Axes of the grid: name -> (start, stop, step), stop inclusive
+DEFAULT_AXES = {
+    'temperature': (8.0, 44.0, 0.5),
+    'humidity': (14.0, 100.0, 1.0),
+    'rainfall': (20.0, 300.0, 2.0)
+}
+
+# Soil values held fixed across the grid
+DEFAULT_FIXED = {'N': 50.0, 'P': 50.0, 'K': 50.0, 'ph': 6.5}
+
+# Cells scored per model call while building
+BUILD_CHUNK_SIZE = 65536
+
+GRID_AXES = ('temperature', 'humidity', 'rainfall')
+
+# Cells a slice may return, enough for any map with one axis fixed
+MAX_SLICE_CELLS = 65536
+
+
+def axis_values(start, stop, step):
+    """Return the coordinates of one grid axis."""
+    count = int(round((stop - start) / step)) + 1
+    return start + step * np.arange(count)
+
+
+def model_signature(model_path):
+    """Identify a model file version by modification time and size."""
+    stat = os.stat(model_path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def build_grid(model, grid_path, axes=None, fixed=None, signature=None, chunk_size=BUILD_CHUNK_SIZE):
+    """
+    Evaluate the crop model over the grid and write it to grid_path.
+
+    The class indices are written chunk by chunk into a memory-mapped .npy
+    file, so memory use stays bounded whatever the grid size. Files are
+    written under temporary names and renamed into place.
+
+    Args:
+        model: Crop model with predict_proba and classes_
+        grid_path (str): Target .npy path; metadata goes to the matching .json
+        axes (dict): Axis name -> (start, stop, step), see DEFAULT_AXES
+        fixed (dict): Fixed N/P/K/ph values, see DEFAULT_FIXED
+        signature (list): Model file signature stored for staleness checks
+
+    Returns:
+        dict: The grid metadata
+    """
+    axes = axes or DEFAULT_AXES
+    fixed = fixed or DEFAULT_FIXED
+    classes = np.asarray(model.classes_).astype(str)
+    if len(classes) > 255:
+        raise ValueError("Too many crop classes for a uint8 grid")
+
+    coords = [axis_values(*axes[name]) for name in GRID_AXES]
+    shape = tuple(len(c) for c in coords)
+    n_cells = int(np.prod(shape))
+
+    started = time.perf_counter()
+    # Per-process temporary names so concurrent workers never collide
+    tmp_path = f'{grid_path}.{os.getpid()}.tmp'
+    grid = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.uint8, shape=shape)
+    flat = grid.reshape(-1)
+
+    columns = {name: CROP_FEATURES.index(name) for name in CROP_FEATURES}
+    for start in range(0, n_cells, chunk_size):
+        cells = np.arange(start, min(start + chunk_size, n_cells))
+        index = np.unravel_index(cells, shape)
+        X = np.empty((len(cells), len(CROP_FEATURES)))
+        for name, value in fixed.items():
+            X[:, columns[name]] = value
+        for axis, name in enumerate(GRID_AXES):
+            X[:, columns[name]] = coords[axis][index[axis]]
+        flat[start:start + len(cells)] = np.argmax(model.predict_proba(X), axis=1)
+
+    grid.flush()
+    del grid, flat
+
+    meta = {
+        'axes': {name: list(axes[name]) for name in GRID_AXES},
+        'fixed': fixed,
+        'classes': classes.tolist(),
+        'shape': list(shape),
+        'model_signature': signature,
+        'build_seconds': round(time.perf_counter() - started, 3)
+    }
+    meta_path = os.path.splitext(grid_path)[0] + '.json'
+    tmp_meta_path = f'{meta_path}.{os.getpid()}.tmp'
+    with open(tmp_meta_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, grid_path)
+    os.replace(tmp_meta_path, meta_path)
+    return meta
+
+
+class CropGrid:
+    """Read-only view of a built grid with point lookups and slice queries."""
+
+    def __init__(self, grid_path):
+        with open(os.path.splitext(grid_path)[0] + '.json') as f:
+            self.meta = json.load(f)
+        self.grid = np.load(grid_path, mmap_mode='r')
+        self.classes = np.asarray(self.meta['classes'])
+        self.axes = {name: tuple(self.meta['axes'][name]) for name in GRID_AXES}
+
+    def cell_index(self, name, value):
+        """Return the index of the cell nearest to value on an axis, or None outside the grid."""
+        start, stop, step = self.axes[name]
+        value = float(value)
+        if not np.isfinite(value):
+            return None
+        i = int(round((value - start) / step))
+        if i < 0 or i >= self.grid.shape[GRID_AXES.index(name)]:
+            return None
+        return i
+
+    def lookup(self, temperature, humidity, rainfall):
+        """Return the recommended crop of the cell nearest to a point, or None outside the grid."""
+        index = tuple(self.cell_index(name, value) for name, value in zip(GRID_AXES, (temperature, humidity, rainfall)))
+        if None in index:
+            return None
+        return str(self.classes[self.grid[index]])
+
+    def query(self, ranges, max_cells=MAX_SLICE_CELLS):
+        """
+        Slice the grid.
+
+        Args:
+            ranges (dict): Axis name -> (low, high) value range, or a single
+                value to fix the axis; missing axes span the whole grid
+            max_cells (int): Largest slice returned
+
+        Returns:
+            tuple: (coords, indices) where coords maps every remaining axis to
+            its coordinates and indices is the uint8 class index sub-array
+
+        Raises:
+            ValueError: If a fixed value is outside the grid, a bound is NaN
+                or the slice has more than max_cells cells
+        """
+        slices = []
+        coords = {}
+        for name in GRID_AXES:
+            values = axis_values(*self.axes[name])
+            bounds = ranges.get(name)
+            if bounds is None:
+                slices.append(slice(None))
+                coords[name] = values
+            elif isinstance(bounds, tuple):
+                if np.isnan(bounds).any():
+                    raise ValueError(f"{name} range {bounds} is not a number")
+                low, high = np.searchsorted(values, bounds[0], 'left'), np.searchsorted(values, bounds[1], 'right')
+                slices.append(slice(low, high))
+                coords[name] = values[low:high]
+            else:
+                i = self.cell_index(name, bounds)
+                if i is None:
+                    raise ValueError(f"{name}={bounds} is outside the grid")
+                slices.append(i)
+        n_cells = int(np.prod([len(values) for values in coords.values()]))
+        if n_cells > max_cells:
+            raise ValueError(f"Slice has {n_cells} cells, the limit is {max_cells}; fix an axis or narrow the ranges")
+        return coords, np.asarray(self.grid[tuple(slices)])
+
+
+class GridManager:
+    """
+    Keep a CropGrid in sync with the model file, rebuilding it when stale.
+
+    Args:
+        grid_path (str): .npy path of the grid
+        model_path (str): Model file the grid is derived from
+        load_model (callable): Returns the current crop model
+        axes (dict), fixed (dict): Grid definition
+    """
+
+    def __init__(self, grid_path, model_path, load_model, axes=None, fixed=None):
+        self.grid_path = grid_path
+        self.model_path = model_path
+        self.load_model = load_model
+        self.axes = axes or DEFAULT_AXES
+        self.fixed = fixed or DEFAULT_FIXED
+        self._grid = None
+        self._lock = threading.Lock()
+
+    def _is_current(self, grid, signature):
+        meta = grid.meta
+        return (meta['model_signature'] == signature and meta['fixed'] == self.fixed and
+                meta['axes'] == {name: list(self.axes[name]) for name in GRID_AXES})
+
+    def get(self, force=False):
+        """Return an up-to-date CropGrid, building it first if needed."""
+        signature = model_signature(self.model_path)
+        grid = self._grid
+        if grid is not None and not force and self._is_current(grid, signature):
+            return grid
+
+        with self._lock:
+            if not force and (self._grid is None or not self._is_current(self._grid, signature)):
+                # Another process may already have rebuilt the file
+                try:
+                    self._grid = CropGrid(self.grid_path)
+                except (OSError, ValueError):
+                    self._grid = None
+            if force or self._grid is None or not self._is_current(self._grid, signature):
+                meta = build_grid(self.load_model(), self.grid_path, self.axes, self.fixed, signature)
+                print(f"Crop grid built: {meta['shape']} cells in {meta['build_seconds']}s")
+                self._grid = CropGrid(self.grid_path)
+            return self._grid
+
+
+def main():
+    import model_store
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--model', default=os.path.join(root, 'models', 'crop_recommender_rf.joblib'))
+    parser.add_argument('--output', default=os.path.join(root, 'models', 'crop_grid.npy'))
+    parser.add_argument('--force', action='store_true', help='rebuild even if the grid is up to date')
+    args = parser.parse_args()
+
+    manager = GridManager(args.output, args.model,
+                          lambda: model_store.load_crop_model(args.model, os.getenv('CROP_ENGINE', 'sklearn')))
+    grid = manager.get(force=args.force)
+    print(f"Grid {tuple(grid.meta['shape'])}, {grid.grid.nbytes / 1024:.0f} KiB, at {args.output}")
+
+
+if __name__ == '__main__':
+    main()
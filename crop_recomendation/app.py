@@ -1,12 +1,22 @@
-from flask import Flask, request, render_template, jsonify
+from flask import Flask, request, render_template, jsonify, Response, stream_with_context
+import json
+import os
+import sys
 import numpy as np
 import joblib
 
+# Share the batch parsing and validation of the main app's crop_service
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import crop_service
+
 app = Flask(__name__)
 
 # Load the model
 model = joblib.load('crop_recommender_rf.joblib')
 
+# Rows scored per predict call in batch mode
+CHUNK_SIZE = crop_service.DEFAULT_CHUNK_SIZE
+
 @app.route('/')
 def home():
     return render_template('index.html')
@@ -76,6 +86,30 @@ def api_predict():
             'message': str(e)
         }), 400
 
+@app.route('/api/predict-batch', methods=['POST'])
+def api_predict_batch():
+    """
+    Score a JSON array (or {"records": [...]}) or an NDJSON body of records,
+    streaming NDJSON results in input order.
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        records = crop_service.iter_ndjson(request.stream)
+    else:
+        records = request.get_json(silent=True)
+        if isinstance(records, dict):
+            records = records.get('records')
+        if not isinstance(records, list):
+            return jsonify({
+                'status': 'error',
+                'message': 'Expected a JSON array of records or an NDJSON body'
+            }), 400
+
+    def generate():
+        for result in crop_service.predict_batch(model, records, CHUNK_SIZE):
+            yield json.dumps(result) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 if __name__ == '__main__':
     print("Starting Flask app...")
     print("Model loaded successfully")
@@ -0,0 +1,342 @@
+"""
+Service for batch crop recommendations with the RandomForest crop model.
+"""
+
+import csv
+import io
+import json
+import time
+
+import numpy as np
+
+# Feature order expected by models/crop_recommender_rf.joblib
+CROP_FEATURES = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+
+# Alternative field names accepted by the JSON API
+CROP_FEATURE_ALIASES = {
+    'N': 'nitrogen',
+    'P': 'phosphorus',
+    'K': 'potassium'
+}
+
+# Number of rows scored per model call in batch mode
+DEFAULT_CHUNK_SIZE = 1024
+
+# Number of ranked alternatives returned in top-k mode
+DEFAULT_TOP_K = 3
+
+
+def records_to_matrix(records):
+    """
+    Validate a list of crop records column-wise into a single feature matrix.
+
+    Args:
+        records (list): List of dicts with N/P/K/temperature/humidity/ph/rainfall values
+
+    Returns:
+        tuple: (matrix, errors) where matrix is an (n, 7) float64 array and errors
+        maps the index of every invalid record to an error message. Rows of
+        invalid records are left as NaN.
+    """
+    n = len(records)
+    matrix = np.full((n, len(CROP_FEATURES)), np.nan)
+    errors = {}
+
+    for i, record in enumerate(records):
+        if not isinstance(record, dict):
+            errors[i] = "Record must be a JSON object"
+
+    for col, feature in enumerate(CROP_FEATURES):
+        alias = CROP_FEATURE_ALIASES.get(feature)
+        column = [
+            _field(record, feature, alias) if i not in errors else None
+            for i, record in enumerate(records)
+        ]
+        try:
+            # Fast path: the whole column converts in one call
+            matrix[:, col] = np.array(column, dtype=np.float64)
+        except (TypeError, ValueError):
+            # Slow path: find the offending records one by one
+            for i, value in enumerate(column):
+                if i in errors:
+                    continue
+                try:
+                    matrix[i, col] = float(value)
+                except (TypeError, ValueError):
+                    errors[i] = f"Invalid or missing value for '{feature}'"
+
+    invalid = ~np.isfinite(matrix).all(axis=1)
+    for i in np.flatnonzero(invalid):
+        errors.setdefault(int(i), "Missing or non-finite feature values")
+
+    return matrix, errors
+
+
+def _field(record, name, alias=None):
+    """Return a record field by its name or alias, or None when it is missing."""
+    if name in record:
+        return record[name]
+    if alias is not None:
+        return record.get(alias)
+    return None
+
+
+def class_index(model):
+    """Return the model's class labels as a plain string array, built once at load time."""
+    return np.asarray(model.classes_).astype(str)
+
+
+def parse_top_k(value, n_classes):
+    """
+    Parse a requested top-k value, clamping it to the number of crop classes.
+
+    Returns None when no top-k was requested.
+    """
+    if value is None or value == '':
+        return None
+    k = int(value)
+    if k < 1:
+        raise ValueError("top_k must be a positive integer")
+    return min(k, n_classes)
+
+
+def top_k_indices(proba, k):
+    """
+    Return the column indices of the k largest probabilities in each row, best first.
+
+    Selection uses argpartition so its cost does not grow with the number of
+    crops; only the k selected entries are sorted. Equal probabilities are
+    ordered by class index, matching the argmax used by predict.
+    """
+    n_classes = proba.shape[1]
+    if k < n_classes:
+        selected = np.argpartition(-proba, k - 1, axis=1)[:, :k]
+    else:
+        selected = np.broadcast_to(np.arange(n_classes), proba.shape)
+    scores = np.take_along_axis(proba, selected, axis=1)
+    order = np.lexsort((selected, -scores), axis=1)
+    return np.take_along_axis(selected, order, axis=1)
+
+
+def predict_top_k(model, matrix, k, classes):
+    """
+    Rank the k most probable crops for every row of a feature matrix.
+
+    Args:
+        model: Fitted classifier with predict_proba
+        matrix (np.ndarray): (n, 7) feature matrix
+        k (int): Number of crops to return per row
+        classes (np.ndarray): Class labels from class_index(model)
+
+    Returns:
+        tuple: (predictions, recommendations) where predictions holds the top
+        crop of each row (identical to model.predict) and recommendations holds
+        a list of {'crop', 'probability'} dicts per row.
+    """
+    return rank_proba(model.predict_proba(matrix), k, classes)
+
+
+def rank_proba(proba, k, classes):
+    """
+    Turn a (n, n_classes) probability matrix into top predictions and ranked
+    top-k recommendations; see predict_top_k for the return value.
+    """
+    predictions = classes[np.argmax(proba, axis=1)]
+    indices = top_k_indices(proba, k)
+    scores = np.take_along_axis(proba, indices, axis=1)
+    labels = classes[indices]
+
+    recommendations = [
+        [
+            {'crop': crop, 'probability': round(float(p), 4)}
+            for crop, p in zip(row_labels, row_scores)
+        ]
+        for row_labels, row_scores in zip(labels.tolist(), scores.tolist())
+    ]
+    return predictions, recommendations
+
+
+def iter_ndjson(lines):
+    """
+    Parse newline-delimited JSON records, skipping blank lines.
+
+    Lines that are not valid UTF-8 JSON are yielded as None so that the caller
+    can report them at the right position.
+    """
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            yield json.loads(line)
+        except ValueError:
+            # Also covers UnicodeDecodeError
+            yield None
+
+
+def iter_chunks(records, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Group an iterable of records into lists of at most chunk_size items."""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def predict_batch(model, records, chunk_size=DEFAULT_CHUNK_SIZE, top_k=None, classes=None):
+    """
+    Score crop records in chunks, yielding one result dict per record in input order.
+
+    Each chunk is validated into a single matrix and scored with one
+    model.predict call, so the cost per record falls as the batch grows.
+    When top_k is given, one predict_proba call per chunk also yields the
+    ranked recommendations of every record.
+    """
+    offset = 0
+    for chunk in iter_chunks(records, chunk_size):
+        matrix, errors = records_to_matrix(chunk)
+        valid = np.ones(len(chunk), dtype=bool)
+        if errors:
+            valid[list(errors)] = False
+
+        recommendations = None
+        if not valid.any():
+            predictions = []
+        elif top_k:
+            predictions, recommendations = predict_top_k(model, matrix[valid], top_k, classes)
+            recommendations = iter(recommendations)
+        else:
+            predictions = model.predict(matrix[valid])
+        predictions = iter(predictions)
+
+        for i in range(len(chunk)):
+            if valid[i]:
+                result = {
+                    'index': offset + i,
+                    'status': 'success',
+                    'prediction': str(next(predictions))
+                }
+                if recommendations is not None:
+                    result['recommendations'] = next(recommendations)
+                yield result
+            else:
+                yield {
+                    'index': offset + i,
+                    'status': 'error',
+                    'message': errors[i]
+                }
+        offset += len(chunk)
+
+
+def _csv_columns(header):
+    """
+    Map every crop feature to its column in a CSV header (case-insensitive, aliases allowed).
+
+    Raises:
+        ValueError: If a feature column is missing
+    """
+    names = [name.strip().lower() for name in header]
+    columns = []
+    for feature in CROP_FEATURES:
+        candidates = [feature.lower(), CROP_FEATURE_ALIASES.get(feature, feature).lower()]
+        match = next((names.index(c) for c in candidates if c in names), None)
+        if match is None:
+            raise ValueError(f"CSV header is missing the '{feature}' column")
+        columns.append(match)
+    return columns
+
+
+def _csv_text(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def score_csv(lines, model, chunk_size=DEFAULT_CHUNK_SIZE, stats=None):
+    """
+    Score a CSV of soil samples chunk by chunk, yielding the annotated CSV as text.
+
+    The output repeats every input row with two extra columns: the predicted
+    crop and an error message (with the input line number) for rows that could
+    not be scored. Only one chunk is held in memory at a time.
+
+    Args:
+        lines (iterable): Lines of the CSV, header first, as text or as UTF-8
+            bytes (an undecodable row becomes a row error, a leading BOM is
+            skipped)
+        model: Crop model with predict
+        chunk_size (int): Rows scored per model call
+        stats (dict): Optional dict filled with rows, scored, errors, seconds
+            and rows_per_second once the output is exhausted
+
+    Raises:
+        ValueError: If the header lacks a feature column
+    """
+    stats = stats if stats is not None else {}
+    stats.update(rows=0, scored=0, errors=0)
+    started = time.perf_counter()
+
+    # Physical line numbers that were not valid UTF-8
+    undecodable = set()
+
+    def decoded_lines():
+        for number, line in enumerate(lines, 1):
+            if isinstance(line, bytes):
+                try:
+                    line = line.decode('utf-8-sig' if number == 1 else 'utf-8')
+                except UnicodeDecodeError:
+                    if number == 1:
+                        raise
+                    undecodable.add(number)
+                    line = line.decode('utf-8', 'replace')
+            yield line
+
+    reader = csv.reader(decoded_lines())
+    header = next(reader, None)
+    if header is None:
+        raise ValueError("CSV file is empty")
+    columns = _csv_columns(header)
+    yield _csv_text([header + ['prediction', 'error']])
+
+    def numbered_rows():
+        first = reader.line_num + 1
+        for row in reader:
+            if row:
+                bad = any(number in undecodable for number in range(first, reader.line_num + 1))
+                yield reader.line_num, row, bad
+            first = reader.line_num + 1
+
+    for chunk in iter_chunks(numbered_rows(), chunk_size):
+        records = [
+            dict(zip(CROP_FEATURES, (row[c] for c in columns))) if len(row) == len(header) and not bad else None
+            for _, row, bad in chunk
+        ]
+        matrix, errors = records_to_matrix(records)
+        valid = np.ones(len(chunk), dtype=bool)
+        if errors:
+            valid[list(errors)] = False
+        predictions = iter(model.predict(matrix[valid]) if valid.any() else [])
+
+        out = []
+        for i, (line_num, row, bad) in enumerate(chunk):
+            if valid[i]:
+                out.append(row + [str(next(predictions)), ''])
+            else:
+                if bad:
+                    message = "Row is not valid UTF-8"
+                elif records[i] is None:
+                    message = f"Expected {len(header)} fields, got {len(row)}"
+                else:
+                    message = errors[i]
+                out.append(row + ['', f"line {line_num}: {message}"])
+        stats['rows'] += len(chunk)
+        stats['scored'] += int(valid.sum())
+        stats['errors'] += len(chunk) - int(valid.sum())
+        yield _csv_text(out)
+
+    stats['seconds'] = time.perf_counter() - started
+    stats['rows_per_second'] = stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0
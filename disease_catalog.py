@@ -0,0 +1,110 @@
+"""
+Plant disease catalog: class labels and advice of the disease model.
+
+The catalog is a versioned JSON file (models/plant_disease_catalog.json)
+whose classes are listed in model output order. It is loaded once into
+read-only arrays aligned with the class index, so a prediction is turned
+into its label and advice by indexing, and the JSON API bodies are
+serialized once with an ETag derived from the file content.
+
+File format:
+    {"version": 1,
+     "default_advice": {"solution": str, "tips": [str]},
+     "classes": [{"index": 0, "name": "Apple___Apple_scab", "crop": "Apple",
+                  "condition": "Apple scab", "healthy": false,
+                  "solution": str, "tips": [str]}, ...]}
+
+Classes without solution/tips get the default advice.
+"""
+
+import hashlib
+import json
+
+import numpy as np
+
+SUPPORTED_VERSIONS = (1,)
+
+
+class DiseaseCatalog:
+    """
+    Index-aligned, read-only disease metadata.
+
+    Attributes:
+        version (int): Catalog file format version
+        etag (str): Content hash of the catalog file
+        names (tuple): Class name per index, e.g. 'Tomato___Late_blight'
+        crops (tuple), conditions (tuple): Display parts of the names
+        healthy (ndarray): Read-only bool mask of the healthy classes
+        solutions (tuple), tips (tuple): Advice per index
+        specific_advice (ndarray): Read-only bool mask of the classes with their own advice
+    """
+
+    def __init__(self, data, etag):
+        if data.get('version') not in SUPPORTED_VERSIONS:
+            raise ValueError(f"Unsupported disease catalog version {data.get('version')}")
+        classes = data['classes']
+        if [entry['index'] for entry in classes] != list(range(len(classes))):
+            raise ValueError("Disease catalog classes must be listed in index order from 0")
+
+        default = data['default_advice']
+        self.version = data['version']
+        self.etag = etag
+        self.names = tuple(entry['name'] for entry in classes)
+        self.crops = tuple(entry['crop'] for entry in classes)
+        self.conditions = tuple(entry['condition'] for entry in classes)
+        self.solutions = tuple(entry.get('solution', default['solution']) for entry in classes)
+        self.tips = tuple(tuple(entry.get('tips', default['tips'])) for entry in classes)
+        self.healthy = np.array([entry['healthy'] for entry in classes], dtype=bool)
+        self.specific_advice = np.array(['solution' in entry for entry in classes], dtype=bool)
+        self.healthy.flags.writeable = False
+        self.specific_advice.flags.writeable = False
+        self._index = {name: i for i, name in enumerate(self.names)}
+
+        # API bodies, serialized once
+        self.entries = tuple(self._entry(i) for i in range(len(self)))
+        self.catalog_json = json.dumps({'status': 'success', 'version': self.version, 'count': len(self),
+                                        'classes': self.entries})
+        self.entry_json = tuple(json.dumps({'status': 'success', 'version': self.version, 'class': entry})
+                                for entry in self.entries)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _entry(self, index):
+        return {
+            'index': index,
+            'name': self.names[index],
+            'label': self.label(index),
+            'crop': self.crops[index],
+            'condition': self.conditions[index],
+            'healthy': bool(self.healthy[index]),
+            'solution': self.solutions[index],
+            'tips': list(self.tips[index])
+        }
+
+    def label(self, index):
+        """Display name, e.g. 'Tomato - Late_blight'."""
+        return self.names[index].replace('___', ' - ')
+
+    def advice(self, index):
+        """{'solution': str, 'tips': list} for a class index."""
+        return {'solution': self.solutions[index], 'tips': list(self.tips[index])}
+
+    def find(self, key):
+        """
+        Class index from an index ('12') or a class name.
+
+        Returns:
+            int: The index, or None if the class is unknown
+        """
+        if key.isascii() and key.isdecimal():
+            index = int(key)
+            return index if index < len(self) else None
+        return self._index.get(key)
+
+
+def load_catalog(path):
+    """Load the catalog file; the ETag is the SHA-256 of its bytes."""
+    with open(path, 'rb') as f:
+        content = f.read()
+    return DiseaseCatalog(json.loads(content), hashlib.sha256(content).hexdigest()[:32])
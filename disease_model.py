@@ -0,0 +1,251 @@
+"""
+Offline conversions of the plant disease ONNX model.
+
+fold-scaling rewrites the model to take uint8 pixels: a Cast and a Div by
+255 in front of the original graph do the 0-255 to 0-1 scaling the server
+would otherwise do in NumPy, with the same float32 arithmetic, so the
+server feeds the decoded pixels as they are. The new model is checked
+against the original on the sample images before it is used:
+
+    python disease_model.py fold-scaling [--model models/plant_disease_optimized.onnx]
+                                         [--output models/plant_disease_uint8.onnx]
+
+quantize writes an INT8 version for CPU serving. Static quantization
+calibrates the activation ranges on images from a local folder, decoded
+exactly as the server decodes them; dynamic quantization only quantizes
+the weights and needs no images:
+
+    python disease_model.py quantize [--mode static|dynamic] [--calibration static/uploads]
+                                     [--output models/plant_disease_int8.onnx]
+
+Serve a variant with e.g. DISEASE_MODEL=models/plant_disease_int8.onnx, and
+compare the variants with benchmarks/disease_quantization_benchmark.py.
+Both commands need the onnx package (pip install onnx), which the server
+does not.
+"""
+
+import argparse
+import glob
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+import disease_service
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SAMPLES = os.path.join(ROOT, 'static', 'uploads')
+
+QUANTIZATION_MODES = ('static', 'dynamic')
+# Images used to calibrate static quantization
+DEFAULT_CALIBRATION_SIZE = 200
+
+
+def _require_onnx():
+    try:
+        import onnx
+    except ImportError:
+        raise SystemExit("This command needs the onnx package: pip install onnx")
+    return onnx
+
+
+def fold_scaling(model_path, output_path):
+    """
+    Write a copy of the model whose input is uint8 pixels in [0, 255].
+
+    The input keeps its name and shape; the original graph reads the output
+    of Div(Cast(input, float), 255) instead.
+
+    Raises:
+        ValueError: If the model input is not float32
+    """
+    onnx = _require_onnx()
+    from onnx import TensorProto, helper
+
+    model = onnx.load(model_path)
+    graph = model.graph
+    graph_input = graph.input[0]
+    if graph_input.type.tensor_type.elem_type != TensorProto.FLOAT:
+        raise ValueError(f"Model input '{graph_input.name}' is not float32")
+
+    name = graph_input.name
+    if any(output.name == name for output in graph.output):
+        raise ValueError("Model input is also a graph output")
+    scaled = f'{name}_scaled'
+    for node in graph.node:
+        for i, node_input in enumerate(node.input):
+            if node_input == name:
+                node.input[i] = scaled
+
+    graph.initializer.append(helper.make_tensor(f'{name}_scale', TensorProto.FLOAT, [], [255.0]))
+    scaling = [
+        helper.make_node('Cast', [name], [f'{name}_float'], to=TensorProto.FLOAT, name=f'{name}_cast'),
+        helper.make_node('Div', [f'{name}_float', f'{name}_scale'], [scaled], name=f'{name}_div')
+    ]
+    for node in reversed(scaling):
+        graph.node.insert(0, node)
+    graph_input.type.tensor_type.elem_type = TensorProto.UINT8
+
+    onnx.checker.check_model(model)
+    onnx.save(model, output_path)
+
+
+def sample_images(directory=SAMPLES, limit=None, seed=0):
+    """
+    Encoded bytes of the images under directory, in path order.
+
+    Args:
+        limit (int): Optional number of images drawn at random (with seed)
+    """
+    paths = sorted(path for path in glob.glob(os.path.join(directory, '**', '*'), recursive=True)
+                   if disease_service.is_image_name(path))
+    if limit is not None and len(paths) > limit:
+        paths = sorted(random.Random(seed).sample(paths, limit))
+    images = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            images.append(f.read())
+    return images
+
+
+def model_inputs(session, images):
+    """Decode images into one input batch for the session's layout and dtype."""
+    layout, _ = disease_service.input_layout(session)
+    uint8 = disease_service.input_dtype(session) == np.uint8
+    decode = disease_service.decode_pixels if uint8 else disease_service.decode_image
+    batch = np.stack([decode(data) for data in images])
+    return batch.transpose(0, 3, 1, 2) if layout == 'NCHW' else batch
+
+
+def score_images(model_path, images, batch_size=1):
+    """
+    Score images with a model, batch_size images per call (or the model's
+    fixed batch size).
+
+    Returns:
+        tuple: ((n, n_classes) scores, seconds spent in model calls)
+    """
+    session = disease_service.create_session(model_path, {'io_binding': False})
+    _, fixed_batch = disease_service.input_layout(session)
+    batch_size = fixed_batch or batch_size
+    inputs = model_inputs(session, images)
+    run = disease_service.session_runner(session, {'io_binding': False})
+
+    scores, seconds = [], 0.0
+    for start in range(0, len(inputs), batch_size):
+        batch = inputs[start:start + batch_size]
+        n = len(batch)
+        if n < batch_size:
+            batch = np.concatenate([batch, np.zeros((batch_size - n,) + batch.shape[1:], batch.dtype)])
+        started = time.perf_counter()
+        scores.append(run(batch)[:n])
+        seconds += time.perf_counter() - started
+    return np.concatenate(scores), seconds
+
+
+def compare_models(reference_path, candidate_path, images):
+    """
+    Score the images with both models, each fed its own input dtype.
+
+    Returns:
+        dict: Number of images, top-1 agreement and the largest absolute
+        difference between the class scores
+    """
+    reference, _ = score_images(reference_path, images)
+    candidate, _ = score_images(candidate_path, images)
+    return {
+        'images': len(images),
+        'top1_agreement': float(np.mean(reference.argmax(axis=1) == candidate.argmax(axis=1))),
+        'max_abs_diff': float(np.abs(reference - candidate).max())
+    }
+
+
+class CalibrationReader:
+    """
+    Feed calibration images to ONNX Runtime static quantization, one image
+    per call, decoded the way the server decodes them.
+    """
+
+    def __init__(self, model_path, images):
+        session = disease_service.create_session(model_path, {})
+        self.input_name = session.get_inputs()[0].name
+        self._batches = iter(model_inputs(session, images)[:, None])
+
+    def get_next(self):
+        batch = next(self._batches, None)
+        return None if batch is None else {self.input_name: batch}
+
+
+def quantize(model_path, output_path, mode='static', images=None):
+    """
+    Write an INT8 version of the model.
+
+    Args:
+        mode (str): 'static' (weights and activations, calibrated on images)
+            or 'dynamic' (weights only, activations quantized at run time)
+        images (list): Encoded calibration images, required for 'static'
+
+    Raises:
+        ValueError: For an unknown mode or static mode without images
+    """
+    _require_onnx()
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode '{mode}', expected one of {QUANTIZATION_MODES}")
+    if mode == 'static' and not images:
+        raise ValueError("Static quantization needs calibration images")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Shape inference and graph cleanup the quantizer relies on; the
+        # model's shapes are static apart from the batch, so ONNX shape
+        # inference is enough and sympy is not needed
+        prepared_path = os.path.join(tmp, 'prepared.onnx')
+        quant_pre_process(model_path, prepared_path, skip_symbolic_shape=True)
+        if mode == 'dynamic':
+            quantize_dynamic(prepared_path, output_path, weight_type=QuantType.QInt8)
+        else:
+            quantize_static(prepared_path, output_path, CalibrationReader(prepared_path, images),
+                            quant_format=QuantFormat.QDQ, per_channel=True,
+                            activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('command', choices=['fold-scaling', 'quantize'])
+    parser.add_argument('--model', default=os.path.join(ROOT, 'models', 'plant_disease_optimized.onnx'))
+    parser.add_argument('--output', help='default: models/plant_disease_uint8.onnx or plant_disease_int8.onnx')
+    parser.add_argument('--samples', default=SAMPLES, help='images for the parity check')
+    parser.add_argument('--mode', choices=QUANTIZATION_MODES, default='static', help='quantization mode')
+    parser.add_argument('--calibration', default=SAMPLES, help='folder of calibration images')
+    parser.add_argument('--calibration-size', type=int, default=DEFAULT_CALIBRATION_SIZE,
+                        help='calibration images drawn at random from the folder')
+    args = parser.parse_args()
+
+    if args.command == 'fold-scaling':
+        output = args.output or os.path.join(ROOT, 'models', 'plant_disease_uint8.onnx')
+        fold_scaling(args.model, output)
+    else:
+        output = args.output or os.path.join(ROOT, 'models', 'plant_disease_int8.onnx')
+        images = sample_images(args.calibration, args.calibration_size) if args.mode == 'static' else None
+        if args.mode == 'static' and not images:
+            raise SystemExit(f"No calibration images in {args.calibration}")
+        quantize(args.model, output, args.mode, images)
+        if images:
+            print(f"Calibrated on {len(images)} images from {args.calibration}")
+    print(f"Wrote {output} ({os.path.getsize(output) / 2 ** 20:.1f} MiB)")
+
+    images = sample_images(args.samples)
+    if not images:
+        print(f"No sample images in {args.samples}, skipped the parity check")
+        return
+    report = compare_models(args.model, output, images)
+    print(f"Parity on {report['images']} images: top-1 agreement {report['top1_agreement']:.2%}, "
+          f"max score difference {report['max_abs_diff']:.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,713 @@
+"""
+Service for plant disease detection with the ONNX model.
+
+Uploads are decoded from memory straight into the model's input buffer;
+the original file is persisted for display by a background writer, so no
+disk I/O happens on the request path. Many images (or a zip archive of
+them) are decoded in parallel into fixed-size batches, one model call per
+batch.
+
+Large JPEGs are decoded at a reduced scale (JPEG draft mode) before the
+resize. A model whose input is uint8 (see disease_model.py fold-scaling)
+does the 0-255 to 0-1 scaling itself and is fed the decoded pixels as is.
+"""
+
+import os
+import queue
+import threading
+import zipfile
+from collections import Counter
+from io import BytesIO
+
+import numpy as np
+import onnxruntime as ort
+from PIL import Image, ImageOps
+
+# Model input size (width, height); the model takes NHWC float32 in [0, 1],
+# or uint8 in [0, 255] when the scaling is folded into the graph
+INPUT_SIZE = (224, 224)
+INPUT_CHANNELS = 3
+INPUT_DTYPES = {'tensor(float)': np.float32, 'tensor(uint8)': np.uint8}
+
+# JPEGs are decoded at the smallest 1/2, 1/4 or 1/8 scale that is still at
+# least this multiple of the input size; 0 decodes at full resolution
+DRAFT_OVERSAMPLE = 2
+
+# Test-time augmentation: the image is decoded TTA_MARGIN pixels larger on
+# every side and each view is a crop of it at the input size, at
+# (row, column) offset in units of the margin (1, 1 = centre), optionally
+# mirrored; the first n views are used
+TTA_MARGIN = 16
+TTA_VIEWS = (
+    ((1, 1), False), ((1, 1), True),
+    ((0, 0), False), ((2, 2), False),
+    ((0, 2), False), ((2, 0), False),
+    ((0, 0), True), ((2, 2), True)
+)
+
+# Tiled inference of large photos: windows of the input size every
+# DEFAULT_TILE_STRIDE pixels (overlapping) and at most MAX_TILES windows per
+# image. The decoded raster is limited to MAX_TILE_PIXELS (48 MiB as RGB):
+# larger JPEGs are decoded at 1/2, 1/4 or 1/8 scale, other formats refused
+DEFAULT_TILE_STRIDE = 160
+MAX_TILE_PIXELS = 16 * 2 ** 20
+MAX_TILES = 4096
+
+# Display thumbnails of uploads: bounding box (width, height) and WebP quality
+THUMBNAIL_SIZE = (320, 320)
+THUMBNAIL_QUALITY = 80
+
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+
+# Images per model call in batch inference
+DEFAULT_BATCH_SIZE = 16
+# Limits for one batch request: number of images and uncompressed archive size
+DEFAULT_MAX_IMAGES = 1000
+MAX_ARCHIVE_BYTES = 512 * 1024 * 1024
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    'disable': ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    'basic': ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    'extended': ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    'all': ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+}
+EXECUTION_MODES = {
+    'sequential': ort.ExecutionMode.ORT_SEQUENTIAL,
+    'parallel': ort.ExecutionMode.ORT_PARALLEL
+}
+
+# ONNX Runtime session settings; see session_options
+DEFAULT_SESSION_CONFIG = {
+    'graph_optimization': 'all',
+    'intra_op_threads': 1,
+    'inter_op_threads': 1,
+    'execution_mode': 'sequential',
+    'cpu_mem_arena': True,
+    'mem_pattern': True,
+    'io_binding': True
+}
+
+
+def decode_pixels(data, size=INPUT_SIZE, draft=DRAFT_OVERSAMPLE):
+    """
+    Decode an encoded image and resize it to the model input size.
+
+    Args:
+        data (bytes): Encoded image (JPEG, PNG, GIF, ...)
+        size (tuple): Model input (width, height)
+        draft (int): Reduced-scale JPEG decoding, see DRAFT_OVERSAMPLE
+
+    Returns:
+        ndarray: (height, width, 3) uint8 RGB array
+    """
+    with Image.open(BytesIO(data)) as img:
+        if draft:
+            # No-op for formats other than JPEG
+            img.draft('RGB', (size[0] * draft, size[1] * draft))
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        return np.asarray(img.resize(size))
+
+
+def decode_image(data, out=None, size=INPUT_SIZE, draft=DRAFT_OVERSAMPLE):
+    """
+    Decode an encoded image into a model input array.
+
+    Args:
+        data (bytes): Encoded image (JPEG, PNG, GIF, ...)
+        out (ndarray): Optional (height, width, 3) float32 or uint8 buffer to
+            fill, e.g. one slot of a preallocated batch; uint8 buffers get
+            the raw pixels
+        size (tuple): Model input (width, height)
+        draft (int): Reduced-scale JPEG decoding, see DRAFT_OVERSAMPLE
+
+    Returns:
+        ndarray: (height, width, 3) array, float32 scaled to [0, 1] or uint8
+    """
+    pixels = decode_pixels(data, size, draft)
+    if out is None:
+        out = np.empty((size[1], size[0], INPUT_CHANNELS), dtype=np.float32)
+    if out.dtype == np.uint8:
+        out[...] = pixels
+    else:
+        # Same arithmetic as float32(pixels) / 255.0, written in place
+        np.divide(pixels, 255.0, out=out, dtype=np.float32)
+    return out
+
+
+def make_thumbnail(data, size=THUMBNAIL_SIZE, quality=THUMBNAIL_QUALITY):
+    """
+    Encode a small WebP display copy of an image, upright per its EXIF
+    orientation, fitting in size.
+
+    Returns:
+        bytes: The encoded thumbnail
+    """
+    with Image.open(BytesIO(data)) as img:
+        img.draft('RGB', size)
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+        img.thumbnail(size)
+        buffer = BytesIO()
+        img.save(buffer, 'WEBP', quality=quality)
+        return buffer.getvalue()
+
+
+def augmented_views(image, n_views, margin=TTA_MARGIN, size=INPUT_SIZE):
+    """
+    Crops and mirror images of an image decoded with a margin, as views of
+    it (no pixels are copied).
+
+    Args:
+        image (ndarray): (height + 2 * margin, width + 2 * margin, 3) array
+        n_views (int): Number of views, at most len(TTA_VIEWS)
+
+    Returns:
+        list: n_views (height, width, 3) views
+    """
+    width, height = size
+    views = []
+    for (row, column), mirrored in TTA_VIEWS[:n_views]:
+        top, left = row * margin, column * margin
+        view = image[top:top + height, left:left + width]
+        views.append(view[:, ::-1] if mirrored else view)
+    return views
+
+
+def decode_augmented(data, out, layout='NHWC', margin=TTA_MARGIN, size=INPUT_SIZE):
+    """
+    Decode an image once and write its test-time augmentation views into
+    consecutive batch slots.
+
+    Args:
+        out (ndarray): (n_views, ...) slice of a batch, one slot per view
+        layout (str): 'NHWC' or 'NCHW'
+    """
+    width, height = size
+    padded = (width + 2 * margin, height + 2 * margin)
+    image = decode_image(data, out=np.empty((padded[1], padded[0], INPUT_CHANNELS), dtype=out.dtype), size=padded)
+    for slot, view in enumerate(augmented_views(image, len(out), margin, size)):
+        out[slot] = view if layout == 'NHWC' else view.transpose(2, 0, 1)
+
+
+class TiledImage:
+    """
+    A decoded photo that predict_tiles reads one row band at a time.
+
+    Only the decoded raster is held in full; every band is cropped or
+    resized from it on demand, so the image at tile scale never exists as
+    a whole.
+
+    Attributes:
+        size (tuple): (width, height) of the image the tiles are cut from
+        nbytes (int): Memory of the decoded raster
+    """
+
+    def __init__(self, img, size):
+        self.img = img
+        self.size = size
+        self.nbytes = img.size[0] * img.size[1] * len(img.getbands())
+
+    def band(self, y, height):
+        """Rows y to y + height as a (height, width, 3) uint8 array."""
+        if self.img.size == self.size:
+            return np.asarray(self.img.crop((0, y, self.size[0], y + height)))
+        # Resampling a box of the raster gives the same rows as resizing it whole
+        ratio = self.img.size[1] / self.size[1]
+        box = (0, y * ratio, self.img.size[0], (y + height) * ratio)
+        return np.asarray(self.img.resize((self.size[0], height), box=box))
+
+
+def decode_for_tiles(data, scale=1.0, max_pixels=MAX_TILE_PIXELS, size=INPUT_SIZE):
+    """
+    Decode an image for tiled inference.
+
+    The decoded raster has at most max_pixels pixels: JPEGs larger than
+    that are decoded at the largest 1/2, 1/4 or 1/8 scale that fits (draft
+    mode), other formats are refused before decoding. The tiles are cut
+    from the image resized by scale, and at most to the decoded size;
+    images with a side below the tile size are upscaled.
+
+    Args:
+        scale (float): Resize factor applied to the image first (0 < scale <= 1)
+
+    Returns:
+        TiledImage: The decoded image
+
+    Raises:
+        ValueError: If the image would decode to more than max_pixels
+    """
+    img = Image.open(BytesIO(data))
+    width, height = img.size
+    target = (max(1, round(width * scale)), max(1, round(height * scale)))
+    if width * height > max_pixels:
+        if img.format != 'JPEG':
+            raise ValueError(f"Image has {width * height} pixels, the limit is {max_pixels} "
+                             f"(JPEG photos are decoded at a reduced scale)")
+        # Smallest JPEG scale-down that fits; requesting at most its size
+        # makes draft decode at that scale or smaller
+        reduction = next((r for r in (2, 4, 8) if -(-width // r) * -(-height // r) <= max_pixels), None)
+        if reduction is None:
+            raise ValueError(f"Image has {width * height} pixels, too many to decode even at 1/8 scale")
+        target = (min(target[0], width // reduction), min(target[1], height // reduction))
+    if target != (width, height):
+        img.draft('RGB', target)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    img.load()
+    # Upscale images with a side below the tile size
+    grow = max(1.0, size[0] / target[0], size[1] / target[1])
+    target = (max(size[0], round(target[0] * grow)), max(size[1], round(target[1] * grow)))
+    return TiledImage(img, target)
+
+
+def tile_positions(length, tile, stride):
+    """Window offsets along one axis, every stride pixels plus one flush with the end."""
+    positions = list(range(0, length - tile + 1, stride))
+    if positions[-1] != length - tile:
+        positions.append(length - tile)
+    return positions
+
+
+def predict_tiles(run, image, batch_size, layout='NHWC', dtype=np.float32, stride=DEFAULT_TILE_STRIDE,
+                  size=INPUT_SIZE, max_tiles=MAX_TILES):
+    """
+    Score overlapping windows of an image.
+
+    The image is read in row bands of the tile height; every tile is a
+    view of its band, scaled (or, for uint8 models, copied) straight into a
+    fixed-size batch buffer, so the memory beyond the decoded raster is one
+    band and one batch whatever the image size.
+
+    Args:
+        run (callable): Takes an input batch and returns class scores (n, n_classes)
+        image (TiledImage): See decode_for_tiles
+        batch_size (int): Tiles per model call
+        stride (int): Pixels between neighbouring windows
+
+    Returns:
+        tuple: (row offsets, column offsets, (rows, columns, n_classes) scores)
+
+    Raises:
+        ValueError: If the image has more than max_tiles windows
+    """
+    width, height = size
+    ys = tile_positions(image.size[1], height, stride)
+    xs = tile_positions(image.size[0], width, stride)
+    if len(ys) * len(xs) > max_tiles:
+        raise ValueError(f"Image has {len(ys) * len(xs)} tiles, the limit is {max_tiles}; "
+                         f"use a larger stride or a smaller scale")
+
+    shape = (height, width, INPUT_CHANNELS) if layout == 'NHWC' else (INPUT_CHANNELS, height, width)
+    batch = np.zeros((batch_size,) + shape, dtype=dtype)
+    scores = None
+    cells = []
+
+    def flush():
+        nonlocal scores
+        batch_scores = run(batch)
+        if scores is None:
+            scores = np.empty((len(ys), len(xs), batch_scores.shape[1]), dtype=np.float32)
+        for slot, (row, column) in enumerate(cells):
+            scores[row, column] = batch_scores[slot]
+        cells.clear()
+
+    for row, y in enumerate(ys):
+        band = image.band(y, height)
+        for column, x in enumerate(xs):
+            tile = band[:, x:x + width]
+            if layout == 'NCHW':
+                tile = tile.transpose(2, 0, 1)
+            slot = batch[len(cells)]
+            if dtype == np.uint8:
+                slot[...] = tile
+            else:
+                np.divide(tile, 255.0, out=slot, dtype=np.float32)
+            cells.append((row, column))
+            if len(cells) == batch_size:
+                flush()
+    if cells:
+        flush()
+    return ys, xs, scores
+
+
+def is_image_name(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in IMAGE_EXTENSIONS
+
+
+def input_layout(session):
+    """
+    Inspect the model input.
+
+    Returns:
+        tuple: ('NHWC' or 'NCHW', fixed batch size or None if dynamic)
+    """
+    shape = session.get_inputs()[0].shape
+    layout = 'NCHW' if shape[1] == INPUT_CHANNELS else 'NHWC'
+    return layout, shape[0] if isinstance(shape[0], int) else None
+
+
+def input_dtype(session):
+    """NumPy dtype of the model input: uint8 if the model scales pixels itself, else float32."""
+    input_type = session.get_inputs()[0].type
+    if input_type not in INPUT_DTYPES:
+        raise ValueError(f"Unsupported model input type {input_type}")
+    return INPUT_DTYPES[input_type]
+
+
+def preprocess_signature(dtype):
+    """
+    Identifies the preprocessing of decode_image for a model input dtype;
+    stored predictions are only valid for the signature they were made with.
+    """
+    width, height = INPUT_SIZE
+    return f'size={width}x{height};draft={DRAFT_OVERSAMPLE};dtype={np.dtype(dtype).name}'
+
+
+def archive_items(fileobj, max_images=DEFAULT_MAX_IMAGES, max_bytes=MAX_ARCHIVE_BYTES):
+    """
+    List (name, loader) for every image in a zip archive, loader() returning
+    its bytes; members are only read when their batch is decoded.
+
+    Raises:
+        ValueError: If the archive is invalid or exceeds the limits
+    """
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Invalid zip archive: {e}")
+    members = [info for info in archive.infolist() if not info.is_dir() and is_image_name(info.filename)]
+    if len(members) > max_images:
+        raise ValueError(f"Archive contains {len(members)} images, the limit is {max_images}")
+    if sum(info.file_size for info in members) > max_bytes:
+        raise ValueError(f"Archive expands to more than {max_bytes // 2 ** 20} MiB")
+    return [(info.filename, lambda info=info: archive.read(info)) for info in members]
+
+
+def _decode_into(batch, slot, loader, layout, views=1):
+    data = loader()
+    if views > 1:
+        decode_augmented(data, batch[slot * views:(slot + 1) * views], layout)
+    elif layout == 'NCHW':
+        pixels = decode_image(data, out=np.empty(batch.shape[2:] + (INPUT_CHANNELS,), dtype=batch.dtype))
+        batch[slot] = pixels.transpose(2, 0, 1)
+    else:
+        decode_image(data, out=batch[slot])
+
+
+def top_class(scores):
+    """Class index and score of the argmax of every row of a batch of scores."""
+    class_idx = scores.argmax(axis=1)
+    confidence = scores[np.arange(len(scores)), class_idx]
+    return [{'class_index': int(i), 'confidence': float(c)} for i, c in zip(class_idx, confidence)]
+
+
+def is_distribution(scores, atol=1e-3):
+    """Whether every row is already a probability distribution (e.g. the model ends in Softmax)."""
+    return bool((scores >= 0).all() and np.allclose(scores.sum(axis=1), 1.0, atol=atol))
+
+
+def top_k(scores, k, healthy_classes=None, output='auto'):
+    """
+    Top-k classes with softmax probabilities for a batch of model outputs.
+
+    The k largest scores of every row are selected with argpartition and
+    only those are sorted; the softmax normalizer is computed once per row.
+
+    Args:
+        scores (ndarray): (n, n_classes) logits or probabilities
+        k (int): Classes per row, capped at n_classes
+        healthy_classes (ndarray): Optional indexes of the healthy classes
+        output (str): 'logits', 'probabilities' or 'auto' (probabilities if
+            the rows already sum to 1, see is_distribution)
+
+    Returns:
+        tuple: ((n, k) class indexes, (n, k) probabilities, both best
+        first, and (n,) total probability of the healthy classes or None)
+    """
+    scores = np.asarray(scores, dtype=np.float32)
+    k = max(1, min(k, scores.shape[1]))
+    if output == 'auto':
+        output = 'probabilities' if is_distribution(scores) else 'logits'
+    if output == 'logits':
+        weights = np.exp(scores - scores.max(axis=1, keepdims=True))
+    else:
+        weights = scores
+    total = weights.sum(axis=1, keepdims=True)
+
+    top = np.argpartition(scores, -k, axis=1)[:, -k:]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind='stable')
+    top = np.take_along_axis(top, order, axis=1)
+    probabilities = np.take_along_axis(weights, top, axis=1) / total
+    healthy = weights[:, healthy_classes].sum(axis=1) / total[:, 0] if healthy_classes is not None else None
+    return top, probabilities, healthy
+
+
+def predict_images(run, items, n_items, batch_size, layout, pool, dtype=np.float32, summarize=top_class, views=1,
+                   fixed_batch=False):
+    """
+    Classify many images with one model call per fixed-size batch.
+
+    Every batch is decoded in parallel on pool into a preallocated buffer;
+    the last batch is padded so the model always sees the same input shape.
+    With test-time augmentation every image takes views consecutive rows of
+    the batch and its scores are the mean over them.
+
+    Args:
+        run (callable): Takes an input batch and returns class scores (n, n_classes)
+        items (iterable): (name, loader) pairs, loader() returning the encoded image
+        n_items (int): Number of items, used to size the batch buffer
+        batch_size (int): Images per model call
+        layout (str): 'NHWC' or 'NCHW'
+        pool (Executor): Pool used for decoding
+        dtype: Model input dtype, see input_dtype
+        summarize (callable): Maps the (n, n_classes) scores of a batch to
+            one dict per row; by default class_index and confidence
+        views (int): Test-time augmentation views per image (see
+            TTA_VIEWS), 1 for none; the model is called with
+            batch_size * views rows
+        fixed_batch (bool): The model only accepts batch_size * views rows;
+            otherwise the buffer is shrunk to n_items when there are fewer
+
+    Yields:
+        dict: Per image, in input order: index, filename, status and either
+        the summary fields or an error message
+    """
+    if not fixed_batch:
+        batch_size = max(1, min(batch_size, n_items))
+    width, height = INPUT_SIZE
+    shape = (height, width, INPUT_CHANNELS) if layout == 'NHWC' else (INPUT_CHANNELS, height, width)
+    batch = np.zeros((batch_size * views,) + shape, dtype=dtype)
+
+    items = iter(items)
+    index = 0
+    while True:
+        chunk = [item for _, item in zip(range(batch_size), items)]
+        if not chunk:
+            break
+        futures = [pool.submit(_decode_into, batch, slot, loader, layout, views)
+                   for slot, (_, loader) in enumerate(chunk)]
+        errors = {}
+        for slot, future in enumerate(futures):
+            try:
+                future.result()
+            except Exception as e:
+                errors[slot] = f"Could not decode image: {e}"
+
+        summaries = None
+        if len(errors) < len(chunk):
+            scores = run(batch)
+            if views > 1:
+                # Average the views of every image (logits or probabilities, as the model outputs them)
+                scores = scores.reshape(batch_size, views, -1).mean(axis=1)
+            summaries = summarize(scores[:len(chunk)])
+        for slot, (name, _) in enumerate(chunk):
+            if slot in errors:
+                yield {'index': index, 'filename': name, 'status': 'error', 'message': errors[slot]}
+            else:
+                yield {'index': index, 'filename': name, 'status': 'success', **summaries[slot]}
+            index += 1
+
+
+def session_options(config):
+    """
+    Build ONNX Runtime session options.
+
+    Args:
+        config (dict): Keys of DEFAULT_SESSION_CONFIG; graph_optimization is
+            one of GRAPH_OPTIMIZATION_LEVELS, execution_mode one of
+            EXECUTION_MODES, thread counts of 0 let ONNX Runtime decide
+    """
+    config = {**DEFAULT_SESSION_CONFIG, **config}
+    options = ort.SessionOptions()
+    options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[config['graph_optimization']]
+    options.intra_op_num_threads = config['intra_op_threads']
+    options.inter_op_num_threads = config['inter_op_threads']
+    options.execution_mode = EXECUTION_MODES[config['execution_mode']]
+    options.enable_cpu_mem_arena = config['cpu_mem_arena']
+    options.enable_mem_pattern = config['mem_pattern']
+    return options
+
+
+def create_session(model_path, config):
+    """Open the model on the CPU with the given session config."""
+    return ort.InferenceSession(model_path, session_options(config), providers=['CPUExecutionProvider'])
+
+
+class BoundRunner:
+    """
+    Run a session through IOBinding with preallocated output buffers.
+
+    Each thread keeps its own binding and output buffer per batch size, so
+    repeated calls with a fixed batch shape allocate nothing: the input is
+    bound in place and the model writes into the buffer.
+
+    Args:
+        session (InferenceSession): Session with one float32 or uint8 input and a float32 output
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.input_name = session.get_inputs()[0].name
+        self.input_dtype = input_dtype(session)
+        self.output_name = session.get_outputs()[0].name
+        self.n_outputs = session.get_outputs()[0].shape[1]
+        self._local = threading.local()
+
+    def _binding(self, batch_size):
+        bindings = getattr(self._local, 'bindings', None)
+        if bindings is None:
+            bindings = self._local.bindings = {}
+        if batch_size not in bindings:
+            n_outputs = self.n_outputs
+            if not isinstance(n_outputs, int):
+                # Symbolic dimension: learn it from one regular run
+                shape = (batch_size,) + tuple(self.session.get_inputs()[0].shape[1:])
+                n_outputs = self.session.run(None, {self.input_name: np.zeros(shape, self.input_dtype)})[0].shape[1]
+            output = np.empty((batch_size, n_outputs), dtype=np.float32)
+            binding = self.session.io_binding()
+            binding.bind_output(self.output_name, 'cpu', 0, np.float32, output.shape, output.ctypes.data)
+            bindings[batch_size] = binding, output
+        return bindings[batch_size]
+
+    def __call__(self, batch):
+        """Score a batch and return a copy of the class scores."""
+        batch = np.ascontiguousarray(batch, dtype=self.input_dtype)
+        binding, output = self._binding(batch.shape[0])
+        binding.bind_input(self.input_name, 'cpu', 0, self.input_dtype, batch.shape, batch.ctypes.data)
+        self.session.run_with_iobinding(binding)
+        return output.copy()
+
+
+def session_runner(session, config):
+    """Return a callable scoring a batch: IOBinding-based if enabled, else session.run."""
+    if {**DEFAULT_SESSION_CONFIG, **config}['io_binding']:
+        return BoundRunner(session)
+    input_name = session.get_inputs()[0].name
+    return lambda batch: session.run(None, {input_name: batch})[0]
+
+
+class UploadWriter:
+    """
+    Persist uploaded files on a background thread.
+
+    Files are written under a temporary name and renamed into place, so a
+    reader never sees a partial image. Filenames may contain subdirectories;
+    with content-addressed names (see upload_store) a file that already
+    exists has the same content and is not written again. A display
+    thumbnail can be written along with each file, and every saved upload
+    is recorded in the index for the quota sweeper.
+
+    Args:
+        directory (str): Target directory
+        index (upload_store.UploadIndex): Optional index of the stored uploads
+    """
+
+    def __init__(self, directory, index=None):
+        self.directory = directory
+        self.index = index
+        self._lock = threading.Lock()
+        self._written = threading.Condition(self._lock)
+        self._pending = Counter()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self.written = 0
+        self.deduplicated = 0
+        self.thumbnails = 0
+        self.failed = 0
+
+    def save(self, data, filename, thumbnail=None):
+        """
+        Queue data to be written as directory/filename and return its path.
+
+        Args:
+            thumbnail (str): Optional filename for a display thumbnail of the image
+        """
+        self._ensure_started()
+        with self._lock:
+            self._pending.update(name for name in (filename, thumbnail) if name)
+        self._queue.put((data, filename, thumbnail))
+        return os.path.join(self.directory, filename)
+
+    def pending(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def wait(self, filename, timeout=None):
+        """Block until a queued file or thumbnail has been written; False on timeout."""
+        with self._written:
+            return self._written.wait_for(lambda: not self._pending[filename], timeout)
+
+    def join(self):
+        """Block until every queued file has been written."""
+        if self._queue is not None:
+            self._queue.join()
+
+    def stats(self):
+        """Return the writer counters as a JSON-serializable dict."""
+        return {'pending': self.pending(), 'written': self.written, 'deduplicated': self.deduplicated,
+                'thumbnails': self.thumbnails, 'failed': self.failed}
+
+    def _ensure_started(self):
+        # Start lazily, and again in a forked worker where the thread is gone
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pending = Counter()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='upload-writer', daemon=True)
+                self._thread.start()
+
+    def _write(self, filename, data):
+        """Write data into place unless the file exists; return whether it was written."""
+        path = os.path.join(self.directory, filename)
+        if os.path.exists(path):
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Unique per process and thread, so workers saving the same upload never share a temporary file
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        return True
+
+    def _run(self):
+        while True:
+            data, filename, thumbnail = self._queue.get()
+            try:
+                # Recorded before the files are checked: a concurrent eviction
+                # then either sees the fresh access time and keeps the upload,
+                # or has already deleted the files, which are written again.
+                # Also counts the original if the thumbnail fails.
+                if self.index is not None:
+                    self.index.add(filename, thumbnail, len(data))
+                if self._write(filename, data):
+                    self.written += 1
+                else:
+                    self.deduplicated += 1
+                if thumbnail:
+                    thumbnail_path = os.path.join(self.directory, thumbnail)
+                    if not os.path.exists(thumbnail_path):
+                        self._write(thumbnail, make_thumbnail(data))
+                        self.thumbnails += 1
+                    if self.index is not None:
+                        self.index.add(filename, thumbnail, len(data) + os.path.getsize(thumbnail_path))
+            except Exception as e:
+                self.failed += 1
+                print(f"Error saving upload {filename}: {e}")
+            finally:
+                with self._written:
+                    self._pending.subtract(name for name in (filename, thumbnail) if name)
+                    self._pending += Counter()  # drops the names that reached zero
+                    self._written.notify_all()
+                self._queue.task_done()
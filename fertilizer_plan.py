@@ -0,0 +1,133 @@
+"""
+Fleet-wide fertilizer planning over the soil-record database.
+
+The latest SoilRecord of every farm is fetched with one set-based query that
+pivots its N/P/K/moisture SoilValues into columns, the rows are scored with a
+single fertilizer model call and the recommendations are bulk-inserted into
+the fertilizer_recommendation table.
+"""
+
+import time
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import text
+
+from fertilizer_service import ENCODERS, FERTILIZERS
+
+# SoilComponent names of the model inputs taken from the database
+SOIL_COMPONENTS = ('Nitrogen (N)', 'Phosphorus (P)', 'Potassium (K)', 'Moisture')
+
+# Indexes the latest-record query relies on (also declared on the models for new databases)
+INDEXES = [
+    'CREATE INDEX IF NOT EXISTS ix_soil_record_farm_date ON soil_record (farm_id, date)',
+    'CREATE INDEX IF NOT EXISTS ix_soil_value_record ON soil_value (soil_record_id)'
+]
+
+LATEST_SOIL_VALUES = text("""
+    WITH latest AS (
+        SELECT id, farm_id FROM (
+            SELECT id, farm_id,
+                   ROW_NUMBER() OVER (PARTITION BY farm_id ORDER BY date DESC, id DESC) AS position
+            FROM soil_record
+        ) ranked
+        WHERE position = 1
+    )
+    SELECT latest.farm_id, latest.id,
+           MAX(CASE WHEN sc.name = :nitrogen THEN sv.value END),
+           MAX(CASE WHEN sc.name = :phosphorus THEN sv.value END),
+           MAX(CASE WHEN sc.name = :potassium THEN sv.value END),
+           MAX(CASE WHEN sc.name = :moisture THEN sv.value END)
+    FROM latest
+    LEFT JOIN soil_value sv ON sv.soil_record_id = latest.id
+    LEFT JOIN soil_component sc ON sc.id = sv.component_id
+    GROUP BY latest.farm_id, latest.id
+    ORDER BY latest.farm_id
+""")
+
+INSERT_RECOMMENDATION = text("""
+    INSERT INTO fertilizer_recommendation
+        (farm_id, soil_record_id, soil_type, crop_type, fertilizer, created_at)
+    VALUES (:farm_id, :soil_record_id, :soil_type, :crop_type, :fertilizer, :created_at)
+""")
+
+
+def ensure_indexes(connection):
+    """Create the indexes of the latest-record query on databases created before they existed."""
+    for statement in INDEXES:
+        connection.execute(text(statement))
+
+
+def latest_soil_matrix(connection):
+    """
+    Fetch the latest soil record of every farm.
+
+    Returns:
+        tuple: (farm_ids, record_ids, values) where values is an (n, 4)
+        float64 matrix of N, P, K and moisture with NaN for missing values
+    """
+    params = dict(zip(('nitrogen', 'phosphorus', 'potassium', 'moisture'), SOIL_COMPONENTS))
+    rows = connection.execute(LATEST_SOIL_VALUES, params).fetchall()
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty((0, 4))
+    matrix = np.array(rows, dtype=np.float64)  # None becomes NaN
+    return matrix[:, 0].astype(np.int64), matrix[:, 1].astype(np.int64), matrix[:, 2:]
+
+
+def plan_fertilizers(connection, predict, soil_type, crop_type, temperature, humidity):
+    """
+    Score the latest soil record of every farm and store the recommendations.
+
+    Temperature, humidity, soil type and crop type are not recorded per farm,
+    so the same values are used for the whole fleet.
+
+    Args:
+        connection: SQLAlchemy connection; the caller commits
+        predict (callable): Fertilizer model predict over (n, 8) rows
+        soil_type (str), crop_type (str): Labels from fertilizer_service
+        temperature (float), humidity (float): Assumed conditions
+
+    Returns:
+        dict: Farm counts and the time spent querying, scoring and writing
+    """
+    soil_code = ENCODERS['soil_type'].encode([soil_type])[0]
+    crop_code = ENCODERS['crop_type'].encode([crop_type])[0]
+    if soil_code < 0 or crop_code < 0:
+        raise ValueError(f"Unknown soil type '{soil_type}' or crop type '{crop_type}'")
+
+    started = time.perf_counter()
+    ensure_indexes(connection)
+    farm_ids, record_ids, values = latest_soil_matrix(connection)
+    queried = time.perf_counter()
+
+    # N, P, K, temperature, humidity, moisture, soil type, crop type
+    X = np.empty((len(farm_ids), 8))
+    X[:, 0:3] = values[:, 0:3]
+    X[:, 3] = temperature
+    X[:, 4] = humidity
+    X[:, 5] = values[:, 3]
+    X[:, 6] = soil_code
+    X[:, 7] = crop_code
+    complete = np.isfinite(X).all(axis=1)
+    labels = FERTILIZERS[np.asarray(predict(X[complete]), dtype=np.intp)] if complete.any() else []
+    scored = time.perf_counter()
+
+    created_at = datetime.utcnow()
+    rows = [
+        {'farm_id': farm_id, 'soil_record_id': record_id, 'soil_type': soil_type,
+         'crop_type': crop_type, 'fertilizer': fertilizer, 'created_at': created_at}
+        for farm_id, record_id, fertilizer in zip(farm_ids[complete].tolist(), record_ids[complete].tolist(),
+                                                  np.asarray(labels).tolist())
+    ]
+    if rows:
+        connection.execute(INSERT_RECOMMENDATION, rows)
+    written = time.perf_counter()
+
+    return {
+        'farms': len(farm_ids),
+        'scored': len(rows),
+        'skipped': int((~complete).sum()),
+        'query_seconds': round(queried - started, 3),
+        'score_seconds': round(scored - queried, 3),
+        'write_seconds': round(written - scored, 3)
+    }
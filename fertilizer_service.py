@@ -0,0 +1,121 @@
+"""
+Service for fertilizer recommendations with the XGBoost fertilizer pipeline.
+"""
+
+import numpy as np
+
+# Category labels in the order of the model's integer codes
+SOIL_TYPES = np.array(['Black', 'Clayey', 'Loamy', 'Red', 'Sandy'])
+CROP_TYPES = np.array(['Barley', 'Cotton', 'Ground Nuts', 'Maize', 'Millets', 'Oil seeds',
+                       'Paddy', 'Pulses', 'Sugarcane', 'Tobacco', 'Wheat'])
+FERTILIZERS = np.array(['10-26-26', '14-35-14', '17-17-17', '20-20', '28-28', 'DAP', 'Urea'])
+
+# Numeric inputs in model column order, with accepted alternative field names
+NUMERIC_FEATURES = [
+    ('n_content', ('N', 'nitrogen')),
+    ('p_content', ('P', 'phosphorus')),
+    ('k_content', ('K', 'potassium')),
+    ('temperature', ()),
+    ('humidity', ()),
+    ('moisture', ())
+]
+CATEGORICAL_FEATURES = [('soil_type', SOIL_TYPES), ('crop_type', CROP_TYPES)]
+N_FEATURES = len(NUMERIC_FEATURES) + len(CATEGORICAL_FEATURES)
+
+
+class CategoryEncoder:
+    """
+    Vectorized string -> code lookup over a fixed category array.
+
+    The categories are sorted once; a whole column is then encoded with a
+    single searchsorted call instead of one dict lookup per value.
+    """
+
+    def __init__(self, categories):
+        self.categories = np.asarray(categories)
+        self._order = np.argsort(self.categories)
+        self._sorted = self.categories[self._order]
+
+    def encode(self, values):
+        """Return the code of every value, or -1 for unknown values."""
+        values = np.asarray(values, dtype=str)
+        positions = np.searchsorted(self._sorted, values)
+        positions = np.minimum(positions, len(self._sorted) - 1)
+        found = self._sorted[positions] == values
+        return np.where(found, self._order[positions], -1)
+
+
+ENCODERS = {name: CategoryEncoder(categories) for name, categories in CATEGORICAL_FEATURES}
+
+
+def _field(record, name, aliases):
+    if name in record:
+        return record[name]
+    for alias in aliases:
+        if alias in record:
+            return record[alias]
+    return None
+
+
+def records_to_matrix(records):
+    """
+    Validate fertilizer records column-wise into the model's (n, 8) input matrix.
+
+    Returns:
+        tuple: (matrix, errors) where errors maps the index of every invalid
+        record to an error message
+    """
+    n = len(records)
+    matrix = np.full((n, N_FEATURES), np.nan)
+    errors = {i: "Record must be a JSON object" for i, r in enumerate(records) if not isinstance(r, dict)}
+
+    for col, (name, aliases) in enumerate(NUMERIC_FEATURES):
+        for i, record in enumerate(records):
+            if i in errors:
+                continue
+            try:
+                matrix[i, col] = float(_field(record, name, aliases))
+            except (TypeError, ValueError):
+                errors[i] = f"Invalid or missing value for '{name}'"
+
+    for offset, (name, categories) in enumerate(CATEGORICAL_FEATURES):
+        col = len(NUMERIC_FEATURES) + offset
+        column = [record.get(name, '') if i not in errors else '' for i, record in enumerate(records)]
+        codes = ENCODERS[name].encode(column)
+        matrix[:, col] = codes
+        for i in np.flatnonzero(codes < 0):
+            errors.setdefault(int(i), f"Unknown {name} '{column[i]}', expected one of: {', '.join(categories)}")
+
+    for i in np.flatnonzero(~np.isfinite(matrix).all(axis=1)):
+        errors.setdefault(int(i), "Missing or non-finite feature values")
+
+    return matrix, errors
+
+
+def predict_records(predict, records):
+    """
+    Score fertilizer records with a single model call.
+
+    Args:
+        predict (callable): Model predict taking the (n, 8) matrix of valid rows
+        records (list): Dicts with n_content/p_content/k_content, temperature,
+            humidity, moisture, soil_type and crop_type
+
+    Returns:
+        list: One result dict per record, in input order
+    """
+    matrix, errors = records_to_matrix(records)
+    valid = np.ones(len(records), dtype=bool)
+    if errors:
+        valid[list(errors)] = False
+
+    codes = np.asarray(predict(matrix[valid]), dtype=np.intp) if valid.any() else np.empty(0, dtype=np.intp)
+    labels = iter(FERTILIZERS[codes])
+
+    results = []
+    for i in range(len(records)):
+        if valid[i]:
+            results.append({'index': i, 'status': 'success', 'prediction': str(next(labels))})
+        else:
+            results.append({'index': i, 'status': 'error', 'message': errors[i]})
+    return results
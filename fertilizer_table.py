@@ -0,0 +1,385 @@
+"""
+Precompiled fertilizer decision tables.
+
+The fertilizer model has two categorical inputs (5 soil types x 11 crop
+types). For each of the 55 partitions the model is evaluated once per cell
+of the N/P/K/temperature/humidity/moisture space and the recommended
+fertilizer of every cell is stored as a uint8 class index in one .npy file
+of shape (soil, crop, *axes), memory-mapped at serving time.
+
+There are two kinds of table:
+
+    exact  The cells are the intervals between the split thresholds the
+           trees use on every feature. A tree ensemble is constant inside
+           such a cell, so a lookup returns exactly what the model returns,
+           for every finite input. The number of cells is the product of
+           the threshold counts, which only stays small for small models.
+    grid   A quantized grid (DEFAULT_AXES); inputs inside it are snapped to
+           the nearest cell, so answers near decision boundaries differ
+           from the model. Inputs outside the grid fall back to the model.
+
+The table is built offline. The CLI measures its agreement with the model
+and stores it with the table; the app only serves a table while it matches
+the model file and its agreement is at least DEFAULT_MIN_AGREEMENT:
+
+    python fertilizer_table.py            # build an exact table, then measure agreement
+    python fertilizer_table.py --grid     # build a grid table instead
+    python fertilizer_table.py --check    # only measure an existing table
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from crop_grid import axis_values, model_signature
+from fertilizer_service import CROP_TYPES, FERTILIZERS, NUMERIC_FEATURES, SOIL_TYPES
+from xgb_native import NativeXGBPipeline
+
+# Axes of the continuous features: name -> (start, stop, step), stop inclusive
+DEFAULT_AXES = {
+    'n_content': (0.0, 45.0, 5.0),
+    'p_content': (0.0, 45.0, 5.0),
+    'k_content': (0.0, 20.0, 2.5),
+    'temperature': (25.0, 40.0, 5.0),
+    'humidity': (50.0, 75.0, 5.0),
+    'moisture': (25.0, 65.0, 10.0)
+}
+
+TABLE_AXES = tuple(name for name, _ in NUMERIC_FEATURES)
+
+# Cells scored per model call while building
+BUILD_CHUNK_SIZE = 65536
+# Cells (bytes) an exact table may have
+MAX_EXACT_CELLS = 2 ** 28
+# Agreement with the model, measured by the CLI, below which a table is not served
+DEFAULT_MIN_AGREEMENT = 0.999
+
+
+def native_model(model):
+    """
+    The model as a NativeXGBPipeline, whose transform and split thresholds exact tables use.
+
+    Raises:
+        ValueError: If the model is not an XGBoost classifier (pipeline) the native engine supports
+    """
+    if isinstance(model, NativeXGBPipeline):
+        return model
+    try:
+        return NativeXGBPipeline.from_pipeline(model)
+    except AttributeError:
+        raise ValueError(f"{type(model).__name__} is not an XGBoost model")
+
+
+def _write_table(table_path, shape, fill, meta):
+    """
+    Write a table chunk by chunk into a memory-mapped .npy file under a
+    temporary name, then rename it and its metadata into place.
+
+    Args:
+        fill (callable): Takes the unraveled index arrays of a chunk of
+            cells and returns their class indices
+    """
+    n_cells = int(np.prod(shape))
+    started = time.perf_counter()
+    tmp_path = f'{table_path}.{os.getpid()}.tmp'
+    table = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.uint8, shape=shape)
+    flat = table.reshape(-1)
+    for start in range(0, n_cells, BUILD_CHUNK_SIZE):
+        cells = np.arange(start, min(start + BUILD_CHUNK_SIZE, n_cells))
+        flat[start:start + len(cells)] = fill(np.unravel_index(cells, shape))
+    table.flush()
+    del table, flat
+
+    meta = {
+        **meta,
+        'classes': FERTILIZERS.tolist(),
+        'shape': list(shape),
+        'nbytes': n_cells,
+        'build_seconds': round(time.perf_counter() - started, 3)
+    }
+    _write_meta(table_path, meta)
+    os.replace(tmp_path, table_path)
+    return meta
+
+
+def _write_meta(table_path, meta):
+    meta_path = os.path.splitext(table_path)[0] + '.json'
+    tmp_meta_path = f'{meta_path}.{os.getpid()}.tmp'
+    with open(tmp_meta_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_meta_path, meta_path)
+
+
+def build_exact_table(model, table_path, signature=None, max_cells=MAX_EXACT_CELLS):
+    """
+    Evaluate the fertilizer model once per cell between its split thresholds.
+
+    Every cell is scored at a representative transformed value: the lower
+    threshold of its interval, or just below the first threshold. Lookups
+    transform the input the same way and count the thresholds at or below
+    it, so they land in the cell whose tree paths they share.
+
+    Args:
+        model: Fertilizer model, see native_model
+        table_path (str): Target .npy path; metadata goes to the matching .json
+        signature (list): Model file signature stored for staleness checks
+        max_cells (int): Refuse to build larger tables
+
+    Returns:
+        dict: The table metadata
+
+    Raises:
+        ValueError: If the model is not supported or the table would exceed max_cells
+    """
+    native = native_model(model)
+    thresholds = native.split_thresholds()[:len(TABLE_AXES)]
+    shape = (len(SOIL_TYPES), len(CROP_TYPES)) + tuple(len(t) + 1 for t in thresholds)
+    if np.prod(shape, dtype=np.float64) > max_cells:
+        raise ValueError(f"An exact table would have {np.prod(shape, dtype=np.float64):.3g} cells "
+                         f"(threshold counts {[len(t) for t in thresholds]}), the limit is {max_cells}")
+    representatives = [np.concatenate([[np.nextafter(t[0], np.float32(-np.inf))], t]) if len(t) else
+                       np.zeros(1, dtype=np.float32) for t in thresholds]
+
+    # Transformed soil and crop codes
+    codes = np.zeros((max(len(SOIL_TYPES), len(CROP_TYPES)), len(TABLE_AXES) + 2))
+    codes[:len(SOIL_TYPES), -2] = np.arange(len(SOIL_TYPES))
+    codes[:len(CROP_TYPES), -1] = np.arange(len(CROP_TYPES))
+    codes = native.transform(codes)
+    soil_codes, crop_codes = codes[:len(SOIL_TYPES), -2], codes[:len(CROP_TYPES), -1]
+
+    def fill(index):
+        X = np.empty((len(index[0]), len(TABLE_AXES) + 2), dtype=np.float32)
+        for axis in range(len(TABLE_AXES)):
+            X[:, axis] = representatives[axis][index[axis + 2]]
+        X[:, -2] = soil_codes[index[0]]
+        X[:, -1] = crop_codes[index[1]]
+        return native.predict_transformed(X)
+
+    return _write_table(table_path, shape, fill, {
+        'kind': 'exact',
+        'thresholds': {name: t.tolist() for name, t in zip(TABLE_AXES, thresholds)},
+        'model_signature': signature
+    })
+
+
+def build_table(model, table_path, axes=None, signature=None):
+    """
+    Evaluate the fertilizer model over every partition and grid cell.
+
+    Args:
+        model: Fertilizer model with predict over the 8 input columns
+        table_path (str): Target .npy path; metadata goes to the matching .json
+        axes (dict): Axis name -> (start, stop, step), see DEFAULT_AXES
+        signature (list): Model file signature stored for staleness checks
+
+    Returns:
+        dict: The table metadata
+    """
+    axes = axes or DEFAULT_AXES
+    coords = [axis_values(*axes[name]) for name in TABLE_AXES]
+    shape = (len(SOIL_TYPES), len(CROP_TYPES)) + tuple(len(c) for c in coords)
+
+    def fill(index):
+        X = np.empty((len(index[0]), len(TABLE_AXES) + 2))
+        for axis in range(len(TABLE_AXES)):
+            X[:, axis] = coords[axis][index[axis + 2]]
+        X[:, -2] = index[0]
+        X[:, -1] = index[1]
+        return model.predict(X)
+
+    return _write_table(table_path, shape, fill, {
+        'kind': 'grid',
+        'axes': {name: list(axes[name]) for name in TABLE_AXES},
+        'model_signature': signature
+    })
+
+
+class FertilizerTable:
+    """
+    Read-only decision table with vectorized lookups and model fallback.
+
+    Args:
+        table_path (str): .npy file written by build_exact_table or build_table
+        model: The fertilizer model; exact tables look up transformed inputs
+            (see native_model)
+    """
+
+    def __init__(self, table_path, model=None):
+        with open(os.path.splitext(table_path)[0] + '.json') as f:
+            self.meta = json.load(f)
+        self.table = np.load(table_path, mmap_mode='r')
+        self.kind = self.meta.get('kind', 'grid')
+        if self.kind == 'exact':
+            self._transform = native_model(model).transform
+            self._thresholds = [np.array(self.meta['thresholds'][name], dtype=np.float32) for name in TABLE_AXES]
+        else:
+            axes = np.array([self.meta['axes'][name] for name in TABLE_AXES])
+            self._start, self._step = axes[:, 0], axes[:, 2]
+        self._size = np.array(self.table.shape)
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.fallbacks = 0
+
+    @property
+    def agreement(self):
+        """Agreement with the model measured by the CLI, or None if it was never measured."""
+        return self.meta.get('agreement')
+
+    def matches(self, model_path):
+        """Whether the table was built from the current version of the model file."""
+        try:
+            return self.meta['model_signature'] == model_signature(model_path)
+        except OSError:
+            return False
+
+    def cells(self, X):
+        """
+        Map feature rows to table cells.
+
+        Returns:
+            tuple: (index, inside) where index is a tuple of index arrays into
+            the table and inside flags the rows the table covers
+        """
+        X = np.asarray(X, dtype=np.float64)
+        # Non-finite values map to -1 so those rows fall outside the table
+        cells = np.empty_like(X)
+        cells[:, 0:2] = X[:, -2:]
+        if self.kind == 'exact':
+            transformed = self._transform(X)
+            for axis, thresholds in enumerate(self._thresholds):
+                cells[:, axis + 2] = np.searchsorted(thresholds, transformed[:, axis], side='right')
+            cells[~np.isfinite(transformed[:, :-2]).all(axis=1)] = -1
+        else:
+            cells[:, 2:] = np.rint((X[:, :-2] - self._start) / self._step)
+        positions = np.nan_to_num(cells, nan=-1, posinf=-1, neginf=-1).astype(np.int64)
+        inside = (((positions >= 0) & (positions < self._size)).all(axis=1) &
+                  (X[:, -2:] == positions[:, 0:2]).all(axis=1))
+        return tuple(positions[inside].T), inside
+
+    def predict(self, X, fallback):
+        """
+        Fertilizer class indices for a batch of rows.
+
+        Args:
+            X (ndarray): (n, 8) rows in fertilizer model column order
+            fallback (callable): Model predict used once for the rows outside the table
+        """
+        X = np.atleast_2d(X)
+        index, inside = self.cells(X)
+        predictions = np.empty(len(X), dtype=np.intp)
+        predictions[inside] = self.table[index]
+        if not inside.all():
+            predictions[~inside] = fallback(X[~inside])
+        with self._lock:
+            self.lookups += int(inside.sum())
+            self.fallbacks += int(len(X) - inside.sum())
+        return predictions
+
+    def stats(self):
+        """Return the table counters as a JSON-serializable dict."""
+        with self._lock:
+            return {
+                'kind': self.kind,
+                'shape': self.meta['shape'],
+                'nbytes': self.meta['nbytes'],
+                'agreement': self.agreement,
+                'lookups': self.lookups,
+                'fallbacks': self.fallbacks
+            }
+
+
+def load_table(table_path, model_path, model, min_agreement=DEFAULT_MIN_AGREEMENT):
+    """
+    Open the decision table if it exists, matches the model file and agreed
+    with the model at least min_agreement of the time, else return None.
+    """
+    if not os.path.exists(table_path):
+        return None
+    table = FertilizerTable(table_path, model)
+    if not table.matches(model_path):
+        print(f"Fertilizer table {table_path} is stale, rebuild it with 'python fertilizer_table.py'")
+        return None
+    if table.agreement is None or table.agreement < min_agreement:
+        print(f"Fertilizer table {table_path} is not used: its measured agreement with the model "
+              f"({table.agreement}) is below {min_agreement}")
+        return None
+    return table
+
+
+def agreement(table, model, n_samples=100000, seed=0):
+    """
+    Fraction of random inputs on which the table agrees with the model.
+
+    Inputs are drawn uniformly over the grid ranges of every partition (the
+    DEFAULT_AXES ranges widened by half their span for exact tables), so for
+    grid tables the rate includes the error from snapping inputs to the
+    nearest cell.
+    """
+    rng = np.random.default_rng(seed)
+    if table.kind == 'exact':
+        axes = np.array([DEFAULT_AXES[name][:2] for name in TABLE_AXES])
+        span = axes[:, 1] - axes[:, 0]
+        low, high = axes[:, 0] - span / 2, axes[:, 1] + span / 2
+    else:
+        axes = np.array([table.meta['axes'][name][:2] for name in TABLE_AXES])
+        low, high = axes[:, 0], axes[:, 1]
+    X = np.empty((n_samples, len(TABLE_AXES) + 2))
+    X[:, :-2] = rng.uniform(low, high, size=(n_samples, len(TABLE_AXES)))
+    X[:, -2] = rng.integers(0, len(SOIL_TYPES), n_samples)
+    X[:, -1] = rng.integers(0, len(CROP_TYPES), n_samples)
+    return float(np.mean(table.predict(X, model.predict) == model.predict(X)))
+
+
+def record_agreement(table_path, rate, n_samples):
+    """Store the measured agreement in the table metadata, where load_table checks it."""
+    with open(os.path.splitext(table_path)[0] + '.json') as f:
+        meta = json.load(f)
+    meta['agreement'] = rate
+    meta['agreement_samples'] = n_samples
+    _write_meta(table_path, meta)
+
+
+def main():
+    import model_store
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--model', default=os.path.join(root, 'models', 'xgb_pipeline.pkl'))
+    parser.add_argument('--output', default=os.path.join(root, 'models', 'fertilizer_table.npy'))
+    parser.add_argument('--grid', action='store_true', help='build an approximate grid table instead of an exact one')
+    parser.add_argument('--max-cells', type=int, default=MAX_EXACT_CELLS, help='size limit of an exact table')
+    parser.add_argument('--check', action='store_true', help='measure the existing table without rebuilding')
+    parser.add_argument('--samples', type=int, default=100000, help='random inputs for the agreement check')
+    args = parser.parse_args()
+
+    model = model_store.load_fertilizer_model(args.model, os.getenv('FERTILIZER_ENGINE', 'pipeline'))
+    if not args.check:
+        signature = model_signature(args.model)
+        if args.grid:
+            meta = build_table(model, args.output, signature=signature)
+        else:
+            try:
+                meta = build_exact_table(model, args.output, signature, args.max_cells)
+            except ValueError as e:
+                raise SystemExit(f"Error: {e}. An exact table is not feasible for this model; "
+                                 f"use --grid for an approximate one")
+        print(f"Built {meta['kind']} table: {len(SOIL_TYPES) * len(CROP_TYPES)} partitions of "
+              f"{meta['shape'][2:]} cells in {meta['build_seconds']}s")
+
+    table = FertilizerTable(args.output, model)
+    if not table.matches(args.model):
+        print("Warning: the table was built from a different version of the model")
+    rate = agreement(table, model, args.samples)
+    record_agreement(args.output, rate, args.samples)
+    print(f"Table memory: {table.table.nbytes / 2 ** 20:.2f} MiB at {args.output}")
+    print(f"Agreement with the live model on {args.samples} random inputs: {rate:.2%}")
+    if rate < DEFAULT_MIN_AGREEMENT:
+        print(f"The app will not serve this table (agreement below {DEFAULT_MIN_AGREEMENT:.1%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,56 +1,42 @@
 import os
 import pickle
-import numpy as np
+import sys
 from flask import Flask, render_template, request, jsonify
 
+# Share the category encoding and record validation of the main app's fertilizer_service
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fertilizer_service
+
 app = Flask(__name__)
 
 # Load the model
 MODEL_PATH = 'xgb_pipeline.pkl'
 model = pickle.load(open(MODEL_PATH, 'rb'))
 
-# Mapping dictionaries
-soil_type_mapping = {0: 'Black', 1: 'Clayey', 2: 'Loamy', 3: 'Red', 4: 'Sandy'}
-soil_type_reverse = {v: k for k, v in soil_type_mapping.items()}
-
-crop_type_mapping = {0: 'Barley', 1: 'Cotton', 2: 'Ground Nuts', 3: 'Maize', 
-                    4: 'Millets', 5: 'Oil seeds', 6: 'Paddy', 7: 'Pulses', 
-                    8: 'Sugarcane', 9: 'Tobacco', 10: 'Wheat'}
-crop_type_reverse = {v: k for k, v in crop_type_mapping.items()}
-
-fertilizer_mapping = {0: '10-26-26', 1: '14-35-14', 2: '17-17-17', 3: '20-20', 
-                     4: '28-28', 5: 'DAP', 6: 'Urea'}
+# Labels offered by the form, in the order of the model's integer codes
+soil_types = fertilizer_service.SOIL_TYPES.tolist()
+crop_types = fertilizer_service.CROP_TYPES.tolist()
 
 @app.route('/')
 def home():
     return render_template('index.html', 
-                          soil_types=list(soil_type_mapping.values()),
-                          crop_types=list(crop_type_mapping.values()))
+                          soil_types=soil_types,
+                          crop_types=crop_types)
 
 @app.route('/predict', methods=['POST'])
 def predict():
     try:
-        # Get form data
-        n_content = float(request.form['n_content'])
-        p_content = float(request.form['p_content'])
-        k_content = float(request.form['k_content'])
-        temperature = float(request.form['temperature'])
-        humidity = float(request.form['humidity'])
-        moisture = float(request.form['moisture'])
+        # Validate and encode the form like a single API record
+        matrix, errors = fertilizer_service.records_to_matrix([request.form.to_dict()])
+        if errors:
+            raise ValueError(errors[0])
+        n_content, p_content, k_content, temperature, humidity, moisture = matrix[0, :6].tolist()
         soil_type = request.form['soil_type']
         crop_type = request.form['crop_type']
-        
-        # Convert soil and crop types to numerical values
-        soil_type_num = soil_type_reverse[soil_type]
-        crop_type_num = crop_type_reverse[crop_type]
-        
-        # Create input array for prediction
-        input_data = np.array([[n_content, p_content, k_content, temperature, 
-                               humidity, moisture, soil_type_num, crop_type_num]])
-        
+
         # Make prediction
-        prediction = model.predict(input_data)[0]
-        fertilizer = fertilizer_mapping[prediction]
+        prediction = model.predict(matrix)[0]
+        fertilizer = fertilizer_service.FERTILIZERS[int(prediction)]
         
         return render_template('result.html', 
                               fertilizer=fertilizer,
@@ -66,8 +52,31 @@ def predict():
     except Exception as e:
         return render_template('index.html', 
                               error=f"Error making prediction: {str(e)}",
-                              soil_types=list(soil_type_mapping.values()),
-                              crop_types=list(crop_type_mapping.values()))
+                              soil_types=soil_types,
+                              crop_types=crop_types)
+
+@app.route('/api/predict', methods=['POST'])
+def api_predict():
+    """
+    Recommend fertilizers for a JSON object, a JSON array of objects or
+    {"records": [...]}, scoring the whole batch with one model call.
+    """
+    data = request.get_json(silent=True)
+    single = isinstance(data, dict) and 'records' not in data
+    records = [data] if single else data.get('records') if isinstance(data, dict) else data
+    if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+        return jsonify({'status': 'error', 'message': 'Expected a JSON object or a list of objects'}), 400
+
+    try:
+        results = fertilizer_service.predict_records(model.predict, records)
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+    if single:
+        result = results[0]
+        result.pop('index')
+        return jsonify(result), 200 if result['status'] == 'success' else 400
+    return jsonify({'status': 'success', 'count': len(results), 'results': results})
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,134 @@
+"""
+Bounded thread pool that runs all model inference for the app.
+
+Requests are admitted while the pool has free capacity (running plus queued
+calls); beyond that they are rejected immediately with InferenceQueueFull so
+the server can answer 503 instead of piling up latency. Model calls run on a
+fixed number of threads, and the models' own thread pools (joblib n_jobs,
+XGBoost nthread, OpenMP/BLAS, ONNX Runtime intra-op threads) are pinned so
+that the total number of busy threads never exceeds the cores available.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:  # installed with scikit-learn, but optional here
+    threadpool_limits = None
+
+DEFAULT_WORKERS = os.cpu_count() or 4
+DEFAULT_QUEUE_SIZE = 64
+DEFAULT_MODEL_THREADS = 1
+
+
+class InferenceQueueFull(Exception):
+    """Raised when a request arrives while the inference pool is at capacity."""
+
+
+class InferencePool:
+    """
+    Fixed-size executor with admission control.
+
+    Args:
+        max_workers (int): Threads running model calls
+        max_queue (int): Admitted requests allowed to wait beyond max_workers
+    """
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, max_queue=DEFAULT_QUEUE_SIZE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix='inference')
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    @contextmanager
+    def admit(self):
+        """
+        Reserve capacity for one request for the duration of the block.
+
+        Raises:
+            InferenceQueueFull: If the pool is already at capacity
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise InferenceQueueFull("Inference queue is full, please retry shortly")
+        with self._lock:
+            self.in_flight += 1
+            self.admitted += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+    def run(self, fn, *args, **kwargs):
+        """Run a model call on a pool thread and return its result."""
+        return self._executor.submit(fn, *args, **kwargs).result()
+
+    def stats(self):
+        """Return pool counters as a JSON-serializable dict."""
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'queue_size': self.max_queue,
+                'in_flight': self.in_flight,
+                'admitted': self.admitted,
+                'rejected': self.rejected
+            }
+
+
+class PooledModel:
+    """
+    Model proxy whose predict and predict_proba calls run on an InferencePool.
+
+    Lets chunked scorers that take a model (crop_service.predict_batch,
+    score_csv) share the pool's threads with the single-row routes.
+    """
+
+    def __init__(self, pool, model):
+        self.pool = pool
+        self.model = model
+
+    def predict(self, X):
+        return self.pool.run(self.model.predict, X)
+
+    def predict_proba(self, X):
+        return self.pool.run(self.model.predict_proba, X)
+
+
+def limit_native_threads(n_threads):
+    """
+    Cap the OpenMP/BLAS thread pools loaded in the process (used by
+    scikit-learn and XGBoost) through threadpoolctl.
+
+    OMP_NUM_THREADS and the like are only read when those libraries load,
+    which happens on import, so they have to be set in the environment of
+    the server process instead.
+    """
+    if threadpool_limits is not None:
+        threadpool_limits(limits=n_threads)
+
+
+def pin_model_threads(model, n_threads):
+    """
+    Set the intra-model parallelism of a fitted estimator or pipeline.
+
+    Estimators exposing n_jobs (RandomForest, XGBoost's sklearn wrapper) get
+    n_jobs=n_threads; pipelines are handled step by step.
+    """
+    if model is None:
+        return
+    for step in getattr(model, 'steps', None) or [(None, model)]:
+        estimator = step[1]
+        if hasattr(estimator, 'get_params') and 'n_jobs' in estimator.get_params(deep=False):
+            estimator.set_params(n_jobs=n_threads)
+        elif hasattr(estimator, 'n_jobs'):
+            estimator.n_jobs = n_threads
@@ -0,0 +1,209 @@
+"""
+In-process job queue for inference requests that take seconds.
+
+A submission gets a job id immediately; a fixed number of worker threads
+run the jobs in arrival order and keep each result in memory until it is
+fetched or expires. The queue is bounded: beyond max_queue waiting jobs a
+submission is rejected with JobQueueFull, like InferencePool.admit. No
+broker is involved, so a job is only known to the process that accepted
+it (poll the same worker, e.g. with a single process or sticky sessions).
+"""
+
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+import numpy as np
+
+DEFAULT_WORKERS = 1
+DEFAULT_QUEUE_SIZE = 32
+# Seconds a finished job's result is kept
+DEFAULT_RESULT_TTL = 3600
+# Finished jobs kept at most, oldest dropped first
+MAX_FINISHED_JOBS = 1000
+# Wait and run times kept for percentiles
+TIME_SAMPLES = 1024
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class Job:
+    def __init__(self, fn, args, info):
+        self.id = uuid.uuid4().hex
+        self.fn = fn
+        self.args = args
+        self.info = info
+        self.state = QUEUED
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+
+    def to_dict(self):
+        """Job status as a JSON-serializable dict; the result once done."""
+        now = time.time()
+        job = {'job_id': self.id, 'state': self.state, **self.info,
+               'wait_ms': round(((self.started or now) - self.submitted) * 1000, 1)}
+        if self.started is not None:
+            job['run_ms'] = round(((self.finished or now) - self.started) * 1000, 1)
+        if self.state == DONE:
+            job['result'] = self.result
+        elif self.state == FAILED:
+            job['error'] = self.error
+        return job
+
+
+class JobQueue:
+    """
+    Bounded FIFO of jobs run by worker threads.
+
+    Args:
+        name (str): Name used for the worker threads
+        max_workers (int): Jobs running at the same time
+        max_queue (int): Jobs allowed to wait for a worker
+        result_ttl (float): Seconds a finished job stays available
+    """
+
+    def __init__(self, name, max_workers=DEFAULT_WORKERS, max_queue=DEFAULT_QUEUE_SIZE,
+                 result_ttl=DEFAULT_RESULT_TTL):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.result_ttl = result_ttl
+        self._queue = queue.Queue()
+        self._jobs = {}
+        self._finished = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+        self.queued = 0
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.wait_max = 0.0
+        self.recent_waits = deque(maxlen=TIME_SAMPLES)
+        self.recent_runs = deque(maxlen=TIME_SAMPLES)
+
+    def submit(self, fn, *args, **info):
+        """
+        Queue fn(*args) and return the job id.
+
+        Args:
+            info: Extra fields reported with the job status
+
+        Raises:
+            JobQueueFull: If max_queue jobs are already waiting
+        """
+        self._ensure_started()
+        job = Job(fn, args, info)
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise JobQueueFull("Job queue is full, please retry shortly")
+            self._expire()
+            self._jobs[job.id] = job
+            self.queued += 1
+            self.submitted += 1
+        self._queue.put(job)
+        return job.id
+
+    def get(self, job_id):
+        """Status dict of a job, or None if it is unknown or expired."""
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job is not None else None
+
+    def stats(self):
+        """Return queue depth, counters and wait/run times (ms) as a JSON-serializable dict."""
+        with self._lock:
+            waits = np.array(self.recent_waits) * 1000
+            runs = np.array(self.recent_runs) * 1000
+            return {
+                'workers': self.max_workers,
+                'queue_size': self.max_queue,
+                'depth': self.queued,
+                'running': self.running,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'stored_results': len(self._finished),
+                'wait_ms': {
+                    'mean': round(float(waits.mean()), 3) if len(waits) else 0,
+                    'p50': round(float(np.percentile(waits, 50)), 3) if len(waits) else 0,
+                    'p99': round(float(np.percentile(waits, 99)), 3) if len(waits) else 0,
+                    'max': round(self.wait_max * 1000, 3)
+                },
+                'run_ms': {
+                    'mean': round(float(runs.mean()), 3) if len(runs) else 0,
+                    'p50': round(float(np.percentile(runs, 50)), 3) if len(runs) else 0,
+                    'p99': round(float(np.percentile(runs, 99)), 3) if len(runs) else 0
+                }
+            }
+
+    def _expire(self):
+        # Caller holds the lock; finished jobs are ordered by finish time
+        deadline = time.time() - self.result_ttl
+        while self._finished:
+            job_id, finished = next(iter(self._finished.items()))
+            if finished >= deadline and len(self._finished) <= MAX_FINISHED_JOBS:
+                break
+            self._finished.popitem(last=False)
+            self._jobs.pop(job_id, None)
+
+    def _ensure_started(self):
+        # Start lazily, and again in a forked worker where the threads are gone
+        if self._threads and self._pid == os.getpid():
+            return
+        with self._lock:
+            if not self._threads or self._pid != os.getpid():
+                if self._pid is not None:
+                    # Jobs inherited from the parent process are never run here
+                    self._queue = queue.Queue()
+                    self._jobs.clear()
+                    self._finished.clear()
+                    self.queued = self.running = 0
+                self._pid = os.getpid()
+                self._threads = [threading.Thread(target=self._run, name=f'{self.name}-{i}', daemon=True)
+                                 for i in range(self.max_workers)]
+                for thread in self._threads:
+                    thread.start()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                job.started = time.time()
+                job.state = RUNNING
+                self.queued -= 1
+                self.running += 1
+                wait = job.started - job.submitted
+                self.wait_max = max(self.wait_max, wait)
+                self.recent_waits.append(wait)
+            try:
+                result, state, error = job.fn(*job.args), DONE, None
+            except Exception as e:
+                result, state, error = None, FAILED, str(e)
+            with self._lock:
+                job.finished = time.time()
+                job.result, job.state, job.error = result, state, error
+                job.fn = job.args = None
+                self.running -= 1
+                if state == DONE:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                self.recent_runs.append(job.finished - job.started)
+                self._finished[job.id] = job.finished
+                self._expire()
@@ -0,0 +1,239 @@
+"""
+Model loading layer that lets worker processes share model memory.
+
+A joblib-pickled RandomForest is rebuilt into private heap memory by every
+process that loads it. Here the forest is exported once into flat .npy files
+(see tree_ensemble.FlatForest) and every worker opens them with
+np.load(mmap_mode='r'), so all workers on a machine read the same physical
+pages from the OS page cache.
+
+Each export lives in a directory named after the model file's signature
+(modification time and size), and <model>.flat is a symlink to the current
+one. A new model version is exported beside the old one and the link is
+swapped with a rename, so a worker that is still opening the old arrays never
+sees them removed or half-written.
+"""
+
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import time
+
+import joblib
+import numpy as np
+
+from crop_grid import model_signature
+from tree_ensemble import FlatForest
+from xgb_native import NativeXGBPipeline
+
+# Arrays written for a flattened forest, one .npy file each
+FOREST_ARRAYS = ['feature', 'threshold', 'left', 'right', 'value', 'roots', 'classes_']
+
+# Superseded exports kept beside the current one for workers still opening them
+KEEP_OLD_EXPORTS = 1
+
+# Supported values of the CROP_ENGINE setting
+CROP_ENGINES = ('sklearn', 'flat', 'mmap')
+
+# Supported values of the FERTILIZER_ENGINE setting
+FERTILIZER_ENGINES = ('pipeline', 'native')
+
+
+def flat_forest_dir(model_path):
+    """Return the link to the current exported arrays for a joblib model file."""
+    return os.path.splitext(model_path)[0] + '.flat'
+
+
+def flat_forest_version_dir(model_path, signature):
+    """Return the directory holding the export of one model file version."""
+    return flat_forest_dir(model_path) + '.' + '-'.join(str(part) for part in signature)
+
+
+def read_flat_forest_signature(directory):
+    """Return the model signature recorded in an export, or None if there is none."""
+    try:
+        with open(os.path.join(directory, 'meta.json')) as f:
+            return json.load(f).get('model_signature')
+    except (OSError, ValueError):
+        return None
+
+
+def save_flat_forest(forest, directory, signature=None):
+    """
+    Write a FlatForest as uncompressed .npy files plus a small metadata file.
+
+    The files are written to a temporary directory and renamed into place so
+    that concurrently starting workers never see a half-written export. An
+    existing directory is left untouched.
+
+    Args:
+        forest (FlatForest): Evaluator to export
+        directory (str): Target directory
+        signature (list): Model file signature stored for staleness checks
+    """
+    parent = os.path.dirname(os.path.abspath(directory))
+    tmp_dir = tempfile.mkdtemp(prefix='.flat-', dir=parent)
+    try:
+        for name in FOREST_ARRAYS:
+            array = getattr(forest, name)
+            if name == 'classes_':
+                # Fixed-width strings load without pickle and can be mapped
+                array = array.astype(str)
+            np.save(os.path.join(tmp_dir, f'{name}.npy'), np.ascontiguousarray(array))
+
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump({'depth': forest.depth, 'n_features': forest.n_features_in_,
+                       'model_signature': signature}, f)
+
+        try:
+            os.rename(tmp_dir, directory)
+        except OSError:
+            # Another worker finished the export first
+            if not os.path.isdir(directory):
+                raise
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def export_flat_forest(model_path):
+    """
+    Return the export directory of the current model file, creating it if needed.
+
+    The export is built in its own version directory and published by
+    atomically replacing the <model>.flat symlink. Older version directories
+    are pruned, keeping the newest KEEP_OLD_EXPORTS of them for workers that
+    resolved the link just before the swap.
+    """
+    link = flat_forest_dir(model_path)
+    signature = model_signature(model_path)
+    current = os.path.realpath(link)
+    if read_flat_forest_signature(current) == signature:
+        return current
+
+    directory = flat_forest_version_dir(model_path, signature)
+    if read_flat_forest_signature(directory) != signature:
+        if os.path.isdir(directory):
+            # Incomplete or foreign export under this version's name
+            _move_aside(model_path, directory)
+        save_flat_forest(FlatForest.from_sklearn(joblib.load(model_path)), directory, signature)
+
+    if os.path.isdir(link) and not os.path.islink(link):
+        # Export from before versioned directories
+        _move_aside(model_path, link)
+    tmp_link = f'{link}.{os.getpid()}.tmp'
+    os.symlink(os.path.basename(directory), tmp_link)
+    os.replace(tmp_link, link)
+    _prune_flat_forests(model_path, directory)
+    return directory
+
+
+def _move_aside(model_path, directory):
+    """Rename an unusable export out of the way so that it is pruned later."""
+    try:
+        os.rename(directory, flat_forest_version_dir(model_path, ['old', os.getpid(), time.time_ns()]))
+    except FileNotFoundError:
+        # Another worker moved it first
+        pass
+
+
+def _prune_flat_forests(model_path, current):
+    """Remove superseded export directories, newest KEEP_OLD_EXPORTS excepted."""
+    prefix = os.path.basename(flat_forest_dir(model_path)) + '.'
+    parent = os.path.dirname(os.path.abspath(current))
+    old = []
+    for name in os.listdir(parent):
+        path = os.path.join(parent, name)
+        if (name.startswith(prefix) and not name.endswith('.tmp') and path != os.path.abspath(current)
+                and os.path.isdir(path) and not os.path.islink(path)):
+            old.append(path)
+    old.sort(key=os.path.getmtime, reverse=True)
+    for path in old[KEEP_OLD_EXPORTS:]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def load_flat_forest(directory, mmap_mode='r'):
+    """
+    Open an exported FlatForest.
+
+    Args:
+        directory (str): Directory written by save_flat_forest
+        mmap_mode (str): Passed to np.load; 'r' maps the arrays read-only and
+            shares them between processes, None reads private copies
+
+    Returns:
+        FlatForest: Evaluator backed by the arrays in directory
+    """
+    arrays = {
+        name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+        for name in FOREST_ARRAYS
+    }
+    with open(os.path.join(directory, 'meta.json')) as f:
+        meta = json.load(f)
+
+    return FlatForest(
+        feature=arrays['feature'],
+        threshold=arrays['threshold'],
+        left=arrays['left'],
+        right=arrays['right'],
+        value=arrays['value'],
+        roots=arrays['roots'],
+        depth=meta['depth'],
+        classes=arrays['classes_'],
+        n_features=meta['n_features']
+    )
+
+
+def load_crop_model(model_path, engine='sklearn'):
+    """
+    Load the crop recommendation model with the requested inference engine.
+
+    Args:
+        model_path (str): Path to crop_recommender_rf.joblib
+        engine (str): 'sklearn' for the pickled RandomForest, 'flat' for a
+            private FlatForest, 'mmap' for a FlatForest memory-mapped from an
+            export next to the model file (created on demand and refreshed
+            when the model file's modification time or size changes)
+
+    Returns:
+        An object with predict, predict_proba and classes_
+    """
+    if engine not in CROP_ENGINES:
+        raise ValueError(f"Unknown crop engine '{engine}', expected one of {', '.join(CROP_ENGINES)}")
+
+    if engine == 'mmap':
+        return load_flat_forest(export_flat_forest(model_path), mmap_mode='r')
+
+    model = joblib.load(model_path)
+    if engine == 'flat':
+        return FlatForest.from_sklearn(model)
+    return model
+
+
+def load_fertilizer_model(model_path, engine='pipeline'):
+    """
+    Load the fertilizer recommendation model with the requested inference engine.
+
+    Args:
+        model_path (str): Path to xgb_pipeline.pkl
+        engine (str): 'pipeline' for the pickled sklearn pipeline, 'native' for
+            a NativeXGBPipeline calling the booster directly (falls back to the
+            pipeline if it contains steps the native engine cannot replay)
+
+    Returns:
+        An object with predict and predict_proba
+    """
+    if engine not in FERTILIZER_ENGINES:
+        raise ValueError(f"Unknown fertilizer engine '{engine}', expected one of {', '.join(FERTILIZER_ENGINES)}")
+
+    with open(model_path, 'rb') as f:
+        model = pickle.load(f)
+    if engine == 'native':
+        try:
+            return NativeXGBPipeline.from_pipeline(model)
+        except ValueError as e:
+            print(f"Native fertilizer engine unavailable, using the pipeline: {e}")
+    return model
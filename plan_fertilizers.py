@@ -0,0 +1,61 @@
+"""
+Plan fertilizers for every farm from its latest soil record.
+
+Reads the latest N/P/K/moisture values of all farms with one query, scores
+them with the fertilizer model in one call and bulk-writes the results to
+the fertilizer_recommendation table. Soil type, crop type, temperature and
+humidity are not stored per farm and apply to the whole run.
+
+The job opens the database and the fertilizer model itself rather than
+importing app, whose start-up reseeds the sample data. The schema must
+already exist (start the web app once).
+
+Usage:
+    python plan_fertilizers.py --soil-type Loamy --crop-type Wheat
+"""
+
+import argparse
+import os
+
+from sqlalchemy import create_engine, inspect
+
+import model_store
+from fertilizer_plan import plan_fertilizers
+from fertilizer_service import CROP_TYPES, SOIL_TYPES
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# Same database as app.py's 'sqlite:///agriculture.db', which Flask-SQLAlchemy
+# resolves in the instance folder
+DATABASE_URI = 'sqlite:///' + os.path.join(ROOT, 'instance', 'agriculture.db')
+FERTILIZER_MODEL_PATH = os.path.join(ROOT, 'models', 'xgb_pipeline.pkl')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--soil-type', required=True, choices=SOIL_TYPES.tolist())
+    parser.add_argument('--crop-type', required=True, choices=CROP_TYPES.tolist())
+    parser.add_argument('--temperature', type=float, default=30.0, help='assumed temperature in °C')
+    parser.add_argument('--humidity', type=float, default=60.0, help='assumed relative humidity in %%')
+    parser.add_argument('--database-uri', default=DATABASE_URI)
+    parser.add_argument('--model', default=FERTILIZER_MODEL_PATH)
+    args = parser.parse_args()
+
+    try:
+        fertilizer_model = model_store.load_fertilizer_model(args.model, os.getenv('FERTILIZER_ENGINE', 'pipeline'))
+    except Exception as e:
+        raise SystemExit(f"Error: the fertilizer recommendation model is not available: {e}")
+
+    engine = create_engine(args.database_uri)
+    if not inspect(engine).has_table('fertilizer_recommendation'):
+        raise SystemExit(f"Error: no fertilizer_recommendation table in {args.database_uri}, start the app once to create it")
+    with engine.begin() as connection:
+        stats = plan_fertilizers(connection, fertilizer_model.predict, args.soil_type, args.crop_type,
+                                 args.temperature, args.humidity)
+    engine.dispose()
+
+    print(f"Planned {stats['scored']} of {stats['farms']} farms ({stats['skipped']} with incomplete soil values): "
+          f"query {stats['query_seconds']}s, scoring {stats['score_seconds']}s, writing {stats['write_seconds']}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Bounded LRU cache for model predictions keyed on quantized inputs.
+
+While the cache is enabled every input is snapped to a per-feature grid
+before it reaches the model, on cache hits and misses alike, so a cached
+answer is always bit-identical to what the model returns for the quantized
+input. Enabling the cache therefore changes outputs near grid cell
+boundaries; with max_size 0 the raw input is scored. The cache is cleared
+when the model file on disk changes, and answers computed with the old model
+while that happens are not stored.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_MAX_SIZE = 4096
+
+
+class QuantizedLRUCache:
+    """
+    LRU cache of model outputs keyed by quantized feature rows.
+
+    Args:
+        name (str): Name reported in metrics
+        resolutions (list): Grid step of every feature; 0 keeps a feature exact
+        max_size (int): Maximum number of cached entries; 0 disables caching
+            and the quantization of inputs
+        model_path (str): Model file watched for changes, or None
+        on_change (callable): Called when the model file changed, e.g. to
+            reload the model; the cache is cleared before and after the call
+            and lookups wait for it to return
+    """
+
+    def __init__(self, name, resolutions, max_size=DEFAULT_MAX_SIZE, model_path=None, on_change=None):
+        self.name = name
+        self.resolutions = np.asarray(resolutions, dtype=np.float64)
+        self.max_size = max_size
+        self.model_path = model_path
+        self.on_change = on_change
+        self._exact = self.resolutions <= 0
+        self._steps = np.where(self._exact, 1.0, self.resolutions)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        # Bumped whenever the entries are dropped; a miss computed across a
+        # bump may come from the old model and is not stored
+        self._generation = 0
+        self._signature = self._model_signature()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def quantize(self, row):
+        """
+        Snap a feature row to the grid.
+
+        Returns:
+            tuple: (key, quantized_row) where key is hashable and
+            quantized_row is the float64 row the model must be fed
+        """
+        row = np.asarray(row, dtype=np.float64)
+        # Adding 0.0 folds -0.0 into 0.0 so both map to the same key
+        cells = np.where(self._exact, row, np.round(row / self._steps)) + 0.0
+        quantized = np.where(self._exact, row, cells * self._steps)
+        return cells.tobytes(), quantized
+
+    def get_or_compute(self, row, compute):
+        """
+        Return the cached output for row, calling compute(quantized_row) on a miss.
+
+        With caching disabled compute gets the raw row.
+
+        Args:
+            row (array-like): Raw feature row
+            compute (callable): Model call taking the quantized row
+        """
+        self._check_model()
+        if self.max_size <= 0:
+            return compute(np.asarray(row, dtype=np.float64))
+        key, quantized = self.quantize(row)
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            generation = self._generation
+
+        result = compute(quantized)
+
+        with self._lock:
+            if generation != self._generation:
+                return result
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def stats(self):
+        """Return the cache counters as a JSON-serializable dict."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+    def _model_signature(self):
+        if not self.model_path:
+            return None
+        try:
+            stat = os.stat(self.model_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _check_model(self):
+        signature = self._model_signature()
+        if signature == self._signature:
+            return
+        # One thread reloads; the others wait here for the new model
+        with self._reload_lock:
+            if signature == self._signature:
+                return
+            # Drop the old model's entries before anything else
+            with self._lock:
+                self._entries.clear()
+                self._generation += 1
+                self.invalidations += 1
+            try:
+                if self.on_change is not None:
+                    self.on_change()
+            finally:
+                # Entries stored during the reload may still come from the old
+                # model; drop them too, then publish the new signature
+                with self._lock:
+                    self._entries.clear()
+                    self._generation += 1
+                    self._signature = signature
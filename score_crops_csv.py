@@ -0,0 +1,56 @@
+"""
+Score a CSV file of soil samples with the crop recommendation model.
+
+The input needs the columns N, P, K, temperature, humidity, ph and rainfall
+(any order, extra columns are kept). The output repeats every row with
+'prediction' and 'error' columns added. The file is streamed in chunks, so
+memory use does not depend on its size.
+
+Usage:
+    python score_crops_csv.py samples.csv -o recommendations.csv
+    python score_crops_csv.py samples.csv > recommendations.csv
+"""
+
+import argparse
+import os
+import sys
+
+import crop_service
+import model_store
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'crop_recommender_rf.joblib')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('input', help="CSV file to score, or '-' for stdin")
+    parser.add_argument('-o', '--output', help='output CSV file (default: stdout)')
+    parser.add_argument('--chunk-size', type=int, default=crop_service.DEFAULT_CHUNK_SIZE,
+                        help='rows scored per model call')
+    parser.add_argument('--engine', default=os.getenv('CROP_ENGINE', 'sklearn'),
+                        choices=model_store.CROP_ENGINES, help='crop model engine')
+    args = parser.parse_args()
+
+    model = model_store.load_crop_model(MODEL_PATH, args.engine)
+
+    # Read bytes so that a row that is not UTF-8 is reported instead of aborting the run
+    source = sys.stdin.buffer if args.input == '-' else open(args.input, 'rb')
+    target = open(args.output, 'w', newline='') if args.output else sys.stdout
+    stats = {}
+    try:
+        for text in crop_service.score_csv(source, model, args.chunk_size, stats):
+            target.write(text)
+    except ValueError as e:
+        sys.exit(f"Error: {e}")
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+
+    print(f"Scored {stats['rows']} rows ({stats['errors']} malformed) in {stats['seconds']:.2f}s, "
+          f"{stats['rows_per_second']:.0f} rows/s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+import csv
+
+import numpy as np
+
+import crop_service
+
+
+class ConstantModel:
+    def predict(self, X):
+        return np.full(len(X), 'rice')
+
+
+RECORD = b'{"N": 90, "P": 42, "K": 43, "temperature": 20.8, "humidity": 82, "ph": 6.5, "rainfall": 202}'
+
+
+def test_undecodable_ndjson_line_is_a_record_error():
+    lines = [RECORD + b'\n', b'\xff\xfe\n', b'\n', b'not json\n', RECORD + b'\n']
+    records = list(crop_service.iter_ndjson(lines))
+    assert records[1] is None and records[2] is None and len(records) == 4
+
+    results = list(crop_service.predict_batch(ConstantModel(), iter(records)))
+    assert [r['status'] for r in results] == ['success', 'error', 'error', 'success']
+    assert [r['index'] for r in results] == [0, 1, 2, 3]
+
+
+def test_undecodable_csv_row_is_a_line_numbered_error():
+    lines = [
+        b'\xef\xbb\xbfN,P,K,temperature,humidity,ph,rainfall,note\r\n',
+        b'90,42,43,20.8,82,6.5,202,ok\r\n',
+        b'90,42,43,20.8,82,6.5,202,caf\xe9\r\n',
+        b'90,42,43,20.8,82,6.5,202,"two\n',
+        b'lines"\r\n'
+    ]
+    rows = list(csv.reader(''.join(crop_service.score_csv(lines, ConstantModel())).splitlines()))
+    assert rows[0][-2:] == ['prediction', 'error'] and rows[0][0] == 'N'
+    assert rows[1][-2:] == ['rice', '']
+    assert rows[2][-2:] == ['', 'line 3: Row is not valid UTF-8']
+    assert rows[3][-2:] == ['rice', '']
+
+
+if __name__ == '__main__':
+    test_undecodable_ndjson_line_is_a_record_error()
+    test_undecodable_csv_row_is_a_line_numbered_error()
+    print("Undecodable NDJSON lines and CSV rows are reported per record")
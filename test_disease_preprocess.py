@@ -0,0 +1,115 @@
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import numpy as np
+import onnxruntime as ort
+from PIL import Image
+
+import disease_model
+import disease_service
+
+rng = np.random.default_rng(3)
+
+
+def encoded(size, fmt='JPEG'):
+    # Smooth gradient plus noise, like a photo rather than pure noise
+    y, x = np.mgrid[0:size[1], 0:size[0]]
+    pixels = np.stack([x * 255 // size[0], y * 255 // size[1], (x + y) * 127 // sum(size)], axis=-1)
+    pixels = np.clip(pixels + rng.integers(-20, 20, pixels.shape), 0, 255).astype(np.uint8)
+    buffer = BytesIO()
+    Image.fromarray(pixels).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def reference_preprocess(data):
+    # app.preprocess_image, from bytes
+    img = Image.open(BytesIO(data)).convert('RGB').resize((224, 224))
+    return (np.array(img) / 255.0).astype(np.float32)
+
+
+def test_full_decode_matches_preprocess_image():
+    for data in (encoded((640, 480)), encoded((300, 500), 'PNG')):
+        assert np.array_equal(disease_service.decode_image(data, draft=0), reference_preprocess(data))
+
+
+def test_draft_decode_close_to_preprocess_image():
+    data = encoded((2016, 1512))
+    diff = np.abs(disease_service.decode_image(data) - reference_preprocess(data))
+    assert diff.max() <= 3 / 255
+    assert diff.mean() <= 0.5 / 255
+
+
+def test_small_images_are_not_drafted():
+    data = encoded((256, 256))
+    assert np.array_equal(disease_service.decode_image(data), reference_preprocess(data))
+
+
+def test_uint8_buffer_gets_pixels():
+    data = encoded((800, 600))
+    out = np.empty((224, 224, 3), dtype=np.uint8)
+    disease_service.decode_image(data, out=out)
+    assert np.array_equal(out, disease_service.decode_pixels(data))
+    assert np.array_equal(out / np.float32(255.0), disease_service.decode_image(data))
+
+
+def test_folded_scaling_matches_float_model():
+    try:
+        from onnx import TensorProto, helper, save
+    except ImportError:
+        return
+    weights = rng.standard_normal((3, 4)).astype(np.float32)
+    graph = helper.make_graph(
+        [helper.make_node('ReduceMean', ['input'], ['mean'], axes=[1, 2], keepdims=0),
+         helper.make_node('MatMul', ['mean', 'weights'], ['output'])],
+        'stand_in',
+        [helper.make_tensor_value_info('input', TensorProto.FLOAT, ['N', 224, 224, 3])],
+        [helper.make_tensor_value_info('output', TensorProto.FLOAT, ['N', 4])],
+        [helper.make_tensor('weights', TensorProto.FLOAT, weights.shape, weights.ravel())])
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)])
+    model.ir_version = 8
+
+    with tempfile.TemporaryDirectory() as tmp:
+        float_path, uint8_path = os.path.join(tmp, 'float.onnx'), os.path.join(tmp, 'uint8.onnx')
+        save(model, float_path)
+        disease_model.fold_scaling(float_path, uint8_path)
+        session = ort.InferenceSession(uint8_path, providers=['CPUExecutionProvider'])
+        assert disease_service.input_dtype(session) == np.uint8
+        report = disease_model.compare_models(float_path, uint8_path, [encoded((640, 480)) for _ in range(3)])
+    assert report['max_abs_diff'] == 0.0
+
+
+def test_fixed_batch_model_always_gets_full_batches():
+    data = encoded((320, 240))
+
+    def scored_rows(n_images, batch_size, views, fixed_batch):
+        rows = []
+
+        def run(batch):
+            rows.append(len(batch))
+            return np.zeros((len(batch), 38), dtype=np.float32)
+
+        items = [(f'{i}.jpg', lambda: data) for i in range(n_images)]
+        with ThreadPoolExecutor(2) as pool:
+            results = list(disease_service.predict_images(run, items, n_images, batch_size, 'NHWC', pool,
+                                                          views=views, fixed_batch=fixed_batch))
+        assert [result['status'] for result in results] == ['success'] * n_images
+        return rows
+
+    # A fixed batch of 8: one image, with and without two TTA views per image
+    assert scored_rows(1, 8, 1, True) == [8]
+    assert scored_rows(1, 4, 2, True) == [8]
+    assert scored_rows(5, 4, 2, True) == [8, 8]
+    # A dynamic batch dimension is shrunk to the images
+    assert scored_rows(1, 8, 1, False) == [1]
+    assert scored_rows(1, 4, 2, False) == [2]
+
+
+if __name__ == '__main__':
+    test_full_decode_matches_preprocess_image()
+    test_draft_decode_close_to_preprocess_image()
+    test_small_images_are_not_drafted()
+    test_uint8_buffer_gets_pixels()
+    test_folded_scaling_matches_float_model()
+    test_fixed_batch_model_always_gets_full_batches()
@@ -0,0 +1,88 @@
+import os
+import tempfile
+import warnings
+
+import numpy as np
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from xgboost import XGBClassifier
+
+import fertilizer_table
+
+warnings.filterwarnings('ignore')
+
+# N, P, K, temperature, humidity, moisture, soil type code, crop type code
+rng = np.random.default_rng(11)
+low, high = [0, 0, 0, 20, 40, 20, 0, 0], [45, 45, 25, 40, 75, 70, 4, 10]
+X_train = rng.uniform(low, high, size=(2000, 8))
+X_train[:, 6:] = np.round(X_train[:, 6:])
+y_train = (X_train[:, 0] // 7 + X_train[:, 7]).astype(int) % 7
+
+
+def random_rows(n):
+    X = rng.uniform(np.subtract(low, 10), np.add(high, 10), size=(n, 8))
+    X[:, 6:] = rng.integers(0, [5, 11], size=(n, 2))
+    return X
+
+
+def exact_table(model, tmp):
+    path = os.path.join(tmp, 'table.npy')
+    fertilizer_table.build_exact_table(model, path)
+    return fertilizer_table.FertilizerTable(path, model)
+
+
+def test_exact_table_matches_model():
+    model = Pipeline([('scaler', StandardScaler()),
+                      ('xgb', XGBClassifier(n_estimators=5, max_depth=2, n_jobs=1))]).fit(X_train, y_train)
+    X = random_rows(20000)
+    with tempfile.TemporaryDirectory() as tmp:
+        table = exact_table(model, tmp)
+        assert np.array_equal(table.predict(X, model.predict), model.predict(X))
+        assert table.stats()['fallbacks'] == 0
+
+
+def test_exact_table_on_split_thresholds():
+    # Without a scaler the thresholds are raw values: rows exactly on them and just below
+    model = XGBClassifier(n_estimators=5, max_depth=2, n_jobs=1).fit(X_train, y_train)
+    X = random_rows(2000)
+    with tempfile.TemporaryDirectory() as tmp:
+        table = exact_table(model, tmp)
+        for axis, thresholds in enumerate(table._thresholds):
+            if len(thresholds):
+                X[:1000, axis] = rng.choice(thresholds, 1000)
+                X[1000:, axis] = np.nextafter(rng.choice(thresholds, 1000), np.float32(-np.inf))
+        assert np.array_equal(table.predict(X, model.predict), model.predict(X))
+
+
+def test_rows_outside_the_table_fall_back():
+    model = XGBClassifier(n_estimators=3, max_depth=2, n_jobs=1).fit(X_train, y_train)
+    X = random_rows(3)
+    X[0, 0], X[1, 6], X[2, 7] = np.nan, 2.5, 11
+    with tempfile.TemporaryDirectory() as tmp:
+        table = exact_table(model, tmp)
+        assert np.array_equal(table.predict(X, lambda rows: np.full(len(rows), -1)), [-1, -1, -1])
+
+
+def test_unmeasured_table_is_not_loaded():
+    model = XGBClassifier(n_estimators=3, max_depth=2, n_jobs=1).fit(X_train, y_train)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'table.npy')
+        fertilizer_table.build_exact_table(model, path)
+        model_path = os.path.join(tmp, 'model.pkl')
+        with open(model_path, 'wb'):
+            pass
+        fertilizer_table.record_agreement(path, 1.0, 0)
+        assert fertilizer_table.load_table(path, model_path, model) is None  # no model signature
+        fertilizer_table.build_exact_table(model, path, fertilizer_table.model_signature(model_path))
+        assert fertilizer_table.load_table(path, model_path, model) is None  # agreement not measured
+        fertilizer_table.record_agreement(path, 0.9, 1000)
+        assert fertilizer_table.load_table(path, model_path, model) is None
+        fertilizer_table.record_agreement(path, 1.0, 1000)
+        assert fertilizer_table.load_table(path, model_path, model) is not None
+
+
+if __name__ == '__main__':
+    test_exact_table_matches_model()
+    test_exact_table_on_split_thresholds()
+    test_rows_outside_the_table_fall_back()
+    test_unmeasured_table_is_not_loaded()
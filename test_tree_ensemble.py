@@ -0,0 +1,70 @@
+import copy
+import os
+import shutil
+import tempfile
+import warnings
+
+import joblib
+import numpy as np
+
+import model_store
+from tree_ensemble import FlatForest
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'crop_recommender_rf.joblib')
+
+warnings.filterwarnings('ignore')
+model = joblib.load(MODEL_PATH)
+flat = FlatForest.from_sklearn(model)
+
+# N, P, K, temperature, humidity, ph, rainfall over and beyond the training ranges
+rng = np.random.default_rng(42)
+X = rng.uniform([-10, 0, 0, 0, 0, 0, 0], [200, 200, 250, 50, 110, 14, 400], size=(5000, 7))
+
+
+def test_predict_proba_is_identical():
+    assert np.array_equal(model.predict_proba(X), flat.predict_proba(X))
+
+
+def test_predict_is_identical():
+    assert np.array_equal(model.predict(X), flat.predict(X))
+
+
+def test_single_row_and_sample_record():
+    sample = np.array([[90, 42, 43, 20.87, 82.00, 6.5, 202.93]])
+    assert flat.predict(sample)[0] == model.predict(sample)[0]
+    assert np.array_equal(flat.predict_proba(sample[0]), model.predict_proba(sample))
+
+
+def test_threshold_ties_follow_float32_comparison():
+    # Rows placed exactly on split thresholds exercise the <= branch
+    rows = np.repeat(X[:1], len(flat.threshold), axis=0)
+    rows[np.arange(len(rows)), flat.feature] = flat.threshold
+    assert np.array_equal(model.predict_proba(rows), flat.predict_proba(rows))
+
+
+def test_mmap_export_follows_model_with_older_mtime():
+    # A replacement model copied with its (older) timestamp preserved must not be served from the old export
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'crop.joblib')
+        shutil.copyfile(MODEL_PATH, path)
+        assert np.array_equal(model_store.load_crop_model(path, 'mmap').predict(X), model.predict(X))
+
+        smaller = copy.deepcopy(model)
+        smaller.estimators_ = smaller.estimators_[:3]
+        stat = os.stat(path)
+        joblib.dump(smaller, path + '.new')
+        os.utime(path + '.new', ns=(stat.st_atime_ns, stat.st_mtime_ns - 10 ** 9))
+        os.replace(path + '.new', path)
+        assert np.array_equal(model_store.load_crop_model(path, 'mmap').predict(X), smaller.predict(X))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    test_predict_proba_is_identical()
+    test_predict_is_identical()
+    test_single_row_and_sample_record()
+    test_threshold_ties_follow_float32_comparison()
+    test_mmap_export_follows_model_with_older_mtime()
+    print("FlatForest matches scikit-learn on", len(X), "rows")
@@ -0,0 +1,62 @@
+import os
+import pickle
+import warnings
+
+import numpy as np
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+from xgboost import XGBClassifier
+
+from xgb_native import NativeXGBPipeline
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'xgb_pipeline.pkl')
+
+warnings.filterwarnings('ignore')
+
+# N, P, K, temperature, humidity, moisture, soil type code, crop type code
+rng = np.random.default_rng(7)
+low, high = [0, 0, 0, 20, 40, 20, 0, 0], [45, 45, 25, 40, 75, 70, 4, 10]
+X_train = rng.uniform(low, high, size=(2000, 8))
+X_train[:, 6:] = np.round(X_train[:, 6:])
+y_train = (X_train[:, 0] // 7 + X_train[:, 7]).astype(int) % 7
+X = rng.uniform(np.subtract(low, 10), np.add(high, 10), size=(5000, 8))
+
+
+def fitted(*steps):
+    xgb = XGBClassifier(n_estimators=30, max_depth=4, n_jobs=1)
+    return Pipeline(list(steps) + [('xgb', xgb)]).fit(X_train, y_train)
+
+
+def assert_identical(model, rows):
+    native = NativeXGBPipeline.from_pipeline(model)
+    assert np.array_equal(model.predict(rows), native.predict(rows))
+    assert np.array_equal(model.predict_proba(rows), native.predict_proba(rows))
+
+
+def test_standard_scaler_pipeline():
+    assert_identical(fitted(('scaler', StandardScaler())), X)
+
+
+def test_min_max_scaler_pipeline():
+    assert_identical(fitted(('scaler', MinMaxScaler(clip=True))), X)
+
+
+def test_single_row():
+    model = fitted(('scaler', StandardScaler()))
+    native = NativeXGBPipeline.from_pipeline(model)
+    assert native.predict(X[0])[0] == model.predict(X[:1])[0]
+
+
+def test_saved_pipeline():
+    if not os.path.exists(MODEL_PATH):
+        return
+    with open(MODEL_PATH, 'rb') as f:
+        assert_identical(pickle.load(f), X)
+
+
+if __name__ == '__main__':
+    test_standard_scaler_pipeline()
+    test_min_max_scaler_pipeline()
+    test_single_row()
+    test_saved_pipeline()
+    print("NativeXGBPipeline matches the sklearn pipeline on", len(X), "rows")
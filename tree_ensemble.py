@@ -0,0 +1,127 @@
+"""
+Array-backed evaluator for scikit-learn RandomForestClassifier models.
+
+The forest is exported once into flat, contiguous NumPy arrays and all trees
+are traversed together, one level per step, for every input row. This avoids
+the per-call Python and joblib overhead of RandomForestClassifier.predict,
+which dominates single-row latency, while producing identical results.
+"""
+
+import numpy as np
+
+
+class FlatForest:
+    """
+    Flattened RandomForestClassifier usable as a drop-in replacement for
+    predict and predict_proba.
+
+    Attributes:
+        feature (np.ndarray): Split feature of every node (0 for leaves)
+        threshold (np.ndarray): Split threshold of every node
+        left (np.ndarray): Global index of the left child (leaves point to themselves)
+        right (np.ndarray): Global index of the right child (leaves point to themselves)
+        value (np.ndarray): Normalized class probabilities of every node
+        roots (np.ndarray): Global index of the root node of every tree
+        depth (int): Maximum depth over all trees
+        classes_ (np.ndarray): Class labels of the original model
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, depth, classes, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.depth = depth
+        self.classes_ = classes
+        self.n_classes_ = len(classes)
+        self.n_features_in_ = n_features
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """
+        Export a fitted RandomForestClassifier into flat arrays.
+
+        Args:
+            model: Fitted single-output RandomForestClassifier
+
+        Returns:
+            FlatForest: Evaluator producing the same predictions as model
+        """
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        depth = 0
+
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(offset, offset + n_nodes)
+            is_leaf = tree.children_left == -1
+
+            # Leaves loop back to themselves so that a fixed number of
+            # traversal steps leaves every row parked on its leaf
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+
+            # Same normalization as DecisionTreeClassifier.predict_proba
+            proba = tree.value[:, 0, :estimator.n_classes_].copy()
+            normalizer = proba.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            proba /= normalizer
+            values.append(proba)
+
+            roots.append(offset)
+            depth = max(depth, tree.max_depth)
+            offset += n_nodes
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp),
+            right=np.ascontiguousarray(np.concatenate(rights), dtype=np.intp),
+            value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.intp),
+            depth=int(depth),
+            classes=np.asarray(model.classes_),
+            n_features=model.n_features_in_
+        )
+
+    def apply(self, X):
+        """
+        Return the global leaf index reached by every row in every tree.
+
+        Args:
+            X (array-like): (n_samples, n_features) input matrix
+
+        Returns:
+            np.ndarray: (n_trees, n_samples) leaf indices
+        """
+        # Trees compare float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+
+        # Index the raveled matrix directly: row offset + split feature
+        flat_X = np.ascontiguousarray(X).ravel()
+        row_offsets = np.arange(X.shape[0]) * X.shape[1]
+        nodes = np.repeat(self.roots[:, np.newaxis], X.shape[0], axis=1)
+        for _ in range(self.depth):
+            go_left = flat_X.take(row_offsets + self.feature.take(nodes)) <= self.threshold.take(nodes)
+            nodes = np.where(go_left, self.left.take(nodes), self.right.take(nodes))
+        return nodes
+
+    def predict_proba(self, X):
+        """Average the leaf probabilities over all trees, in tree order as scikit-learn does."""
+        leaves = self.apply(X)
+        # Reducing over the outer (tree) axis adds the trees one by one,
+        # matching the accumulation order of RandomForestClassifier
+        proba = np.add.reduce(self.value.take(leaves, axis=0), axis=0)
+        proba /= len(self.roots)
+        return proba
+
+    def predict(self, X):
+        """Return the most probable class label of every row."""
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
@@ -0,0 +1,410 @@
+"""
+Content-addressed storage for uploaded plant images.
+
+Every upload is stored once under the SHA-256 of its bytes, in sharded
+subdirectories (ab/cd/abcd...jpg) instead of one flat folder, so the same
+photo submitted twice is stored once and directories stay small. A small
+display thumbnail (ab/cd/abcd....thumb.webp) is written next to it.
+
+Size and last access of every stored original are kept in a SQLite index, so
+the quota check and eviction of the sweeper are indexed queries and never
+list the directory; only reindex walks the tree, once.
+
+Usage:
+    python upload_store.py migrate [static/uploads]   # move flat files into the store, dropping duplicates
+    python upload_store.py reindex [static/uploads]   # rebuild the index from the files on disk
+    python upload_store.py sweep [static/uploads] --max-mb 1024 [--max-age-days 90]
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from disease_service import is_image_name
+
+# Number of two-hex-digit directory levels above each file
+SHARD_DEPTH = 2
+HASH_CHUNK_SIZE = 1024 * 1024
+
+THUMBNAIL_SUFFIX = '.thumb.webp'
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'upload_index.sqlite3')
+# Eviction stops once the store is below this fraction of the quota
+LOW_WATERMARK = 0.9
+# Uploads deleted per index query while evicting
+EVICTION_CHUNK = 1000
+DEFAULT_SWEEP_INTERVAL = 60
+
+
+def content_hash(data):
+    """SHA-256 hex digest of bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path):
+    """SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_name(digest, extension):
+    """
+    Relative path of a stored file, e.g. 'ab/cd/abcd...ef.jpg'.
+
+    Args:
+        digest (str): SHA-256 hex digest of the content
+        extension (str): File extension including the dot
+    """
+    shards = [digest[2 * i:2 * i + 2] for i in range(SHARD_DEPTH)]
+    return '/'.join(shards + [digest + extension.lower()])
+
+
+def thumbnail_name(digest):
+    """Relative path of the display thumbnail of a stored file."""
+    return content_name(digest, THUMBNAIL_SUFFIX)
+
+
+def name_digest(name):
+    """Digest of a stored file or thumbnail from its relative path."""
+    return os.path.basename(name).split('.', 1)[0]
+
+
+def migrate(directory):
+    """
+    Move the flat files of an upload directory into the content-addressed
+    layout, deleting files whose content is already stored.
+
+    Returns:
+        dict: Counts of moved and removed duplicate files and bytes freed
+    """
+    stats = {'moved': 0, 'duplicates': 0, 'bytes_freed': 0}
+    for entry in os.scandir(directory):
+        if not entry.is_file() or not is_image_name(entry.name):
+            continue
+        name = content_name(file_hash(entry.path), os.path.splitext(entry.name)[1])
+        target = os.path.join(directory, name)
+        if os.path.exists(target):
+            stats['duplicates'] += 1
+            stats['bytes_freed'] += entry.stat().st_size
+            os.remove(entry.path)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(entry.path, target)
+            stats['moved'] += 1
+    return stats
+
+
+class UploadIndex:
+    """
+    SQLite index of the stored uploads: one row per original with its
+    thumbnail, their combined size and the last time either was written or
+    served. The same content saved under two extensions is two originals
+    sharing one thumbnail. Safe to share between threads and processes.
+
+    Args:
+        path (str): Index database file, outside the served directory
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            columns = [row[1] for row in connection.execute('PRAGMA table_info(upload)')]
+            if columns and columns[0] == 'digest':
+                # Indexes created before rows were keyed on the original
+                connection.execute('ALTER TABLE upload RENAME TO upload_by_digest')
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS upload (
+                    original TEXT PRIMARY KEY,
+                    digest TEXT NOT NULL,
+                    thumbnail TEXT,
+                    bytes INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            if columns and columns[0] == 'digest':
+                connection.execute('INSERT INTO upload SELECT original, digest, thumbnail, bytes, last_access '
+                                   'FROM upload_by_digest')
+                connection.execute('DROP TABLE upload_by_digest')
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_upload_last_access ON upload (last_access)')
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_upload_digest ON upload (digest)')
+
+    @contextmanager
+    def _connection(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def add(self, original, thumbnail, nbytes, accessed=None):
+        """Record a stored upload, or refresh its size and access time."""
+        self.add_many([(original, thumbnail, nbytes, accessed or time.time())])
+
+    def add_many(self, rows):
+        """Record (original, thumbnail, bytes, last_access) rows."""
+        with self._connection() as connection:
+            connection.executemany("""
+                INSERT INTO upload (original, digest, thumbnail, bytes, last_access) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (original) DO UPDATE SET
+                    thumbnail = excluded.thumbnail, bytes = excluded.bytes, last_access = excluded.last_access
+            """, [(original, name_digest(original), thumbnail, nbytes, accessed)
+                  for original, thumbnail, nbytes, accessed in rows])
+
+    def touch(self, name, accessed=None):
+        """Mark the uploads of a stored file or thumbnail (every original with its content) as used now."""
+        with self._connection() as connection:
+            connection.execute('UPDATE upload SET last_access = ? WHERE digest = ?',
+                               (accessed or time.time(), name_digest(name)))
+
+    def totals(self):
+        """Number of stored uploads and their total size in bytes."""
+        with self._connection() as connection:
+            count, nbytes = connection.execute('SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM upload').fetchone()
+        return count, nbytes
+
+    def least_recent(self, limit, before=None):
+        """(original, thumbnail, bytes, last_access) of the least recently used uploads, optionally only older than before."""
+        with self._connection() as connection:
+            return connection.execute(
+                'SELECT original, thumbnail, bytes, last_access FROM upload WHERE last_access < ? '
+                'ORDER BY last_access LIMIT ?', (before if before is not None else float('inf'), limit)).fetchall()
+
+    def evict(self, rows, delete):
+        """
+        Drop uploads listed by least_recent and delete their files.
+
+        Rows written or used since they were listed are kept. The files are
+        deleted with delete(name) inside the same write transaction, so a
+        writer recording an upload either does so first (and the upload is
+        kept) or waits until its files are gone (and writes them again). A
+        thumbnail is deleted with the last original of its content.
+
+        Returns:
+            list: The rows evicted
+        """
+        with self._connection() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            evicted = [row for row in rows if connection.execute(
+                'DELETE FROM upload WHERE original = ? AND last_access = ?', (row[0], row[3])).rowcount]
+            digests = list({name_digest(row[0]) for row in evicted})
+            shared = {digest for digest, in connection.execute(
+                f"SELECT DISTINCT digest FROM upload WHERE digest IN ({','.join('?' * len(digests))})",
+                digests)} if digests else set()
+            for original, thumbnail, _, _ in evicted:
+                delete(original)
+                if thumbnail and name_digest(thumbnail) not in shared:
+                    delete(thumbnail)
+        return evicted
+
+    def clear(self):
+        with self._connection() as connection:
+            connection.execute('DELETE FROM upload')
+
+
+def scan(directory):
+    """
+    Walk the sharded store once.
+
+    Yields:
+        tuple: (original, thumbnail or None, bytes of both, mtime) per stored upload
+    """
+    def walk(path, depth):
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if depth < SHARD_DEPTH:
+                    if entry.is_dir(follow_symlinks=False) and len(entry.name) == 2:
+                        yield from walk(entry.path, depth + 1)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry
+
+    originals, thumbnails = [], {}
+    for entry in walk(directory, 0):
+        stat = entry.stat()
+        relative = os.path.relpath(entry.path, directory).replace(os.sep, '/')
+        if entry.name.endswith(THUMBNAIL_SUFFIX):
+            thumbnails[name_digest(entry.name)] = (relative, stat.st_size)
+        elif is_image_name(entry.name):
+            originals.append((relative, stat.st_size, stat.st_mtime))
+    for original, nbytes, mtime in originals:
+        thumbnail, thumbnail_bytes = thumbnails.get(name_digest(original), (None, 0))
+        yield original, thumbnail, nbytes + thumbnail_bytes, mtime
+
+
+def reindex(directory, index, chunk_size=10000):
+    """
+    Rebuild the index from the files on disk, with their modification time
+    as last access.
+
+    Returns:
+        int: Number of uploads indexed
+    """
+    index.clear()
+    rows, count = [], 0
+    for row in scan(directory):
+        rows.append(row)
+        if len(rows) == chunk_size:
+            index.add_many(rows)
+            count += len(rows)
+            rows = []
+    index.add_many(rows)
+    return count + len(rows)
+
+
+def _remove_file(directory, name):
+    try:
+        os.remove(os.path.join(directory, name))
+    except FileNotFoundError:
+        pass
+
+
+def _evict(directory, index, rows):
+    """Evict rows of least_recent; returns the number of uploads evicted and the bytes freed."""
+    evicted = index.evict(rows, lambda name: _remove_file(directory, name))
+    return len(evicted), sum(row[2] for row in evicted)
+
+
+def sweep(directory, index, max_bytes=0, max_age=0):
+    """
+    Evict uploads unused for more than max_age seconds, then the least
+    recently used ones until the store is below LOW_WATERMARK of max_bytes.
+
+    Args:
+        max_bytes (int): Quota of originals plus thumbnails, 0 for none
+        max_age (float): Seconds since last access, 0 for no limit
+
+    Returns:
+        dict: Evicted uploads, bytes freed and the uploads and bytes left
+    """
+    stats = {'evicted': 0, 'bytes_freed': 0}
+    if max_age:
+        cutoff = time.time() - max_age
+        while True:
+            rows = index.least_recent(EVICTION_CHUNK, before=cutoff)
+            if not rows:
+                break
+            evicted, freed = _evict(directory, index, rows)
+            stats['evicted'] += evicted
+            stats['bytes_freed'] += freed
+
+    count, nbytes = index.totals()
+    if max_bytes and nbytes > max_bytes:
+        target = max_bytes * LOW_WATERMARK
+        while nbytes > target:
+            rows = index.least_recent(EVICTION_CHUNK)
+            if not rows:
+                break
+            # Only as many of the oldest as needed to reach the target
+            excess, needed = nbytes - target, 0
+            for needed, row in enumerate(rows, 1):
+                excess -= row[2]
+                if excess <= 0:
+                    break
+            evicted, freed = _evict(directory, index, rows[:needed])
+            stats['evicted'] += evicted
+            stats['bytes_freed'] += freed
+            count, nbytes = count - evicted, nbytes - freed
+    stats.update(files=count, bytes=nbytes)
+    return stats
+
+
+class UploadSweeper:
+    """
+    Enforce the upload quota and maximum age on a background thread.
+
+    Args:
+        directory (str): Upload directory
+        index (UploadIndex): Index of the directory
+        max_bytes (int): Quota, 0 for none
+        max_age (float): Maximum seconds since last access, 0 for none
+        interval (float): Seconds between sweeps
+    """
+
+    def __init__(self, directory, index, max_bytes=0, max_age=0, interval=DEFAULT_SWEEP_INTERVAL):
+        self.directory = directory
+        self.index = index
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.sweeps = 0
+        self.evicted = 0
+        self.bytes_freed = 0
+        self.last = None
+
+    def ensure_started(self):
+        """Start the sweeper thread, again in a forked worker where it is gone."""
+        if (not self.max_bytes and not self.max_age) or (self._thread is not None and self._pid == os.getpid()):
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='upload-sweeper', daemon=True)
+                self._thread.start()
+
+    def sweep(self):
+        """Run one sweep now and return its stats."""
+        started = time.perf_counter()
+        stats = sweep(self.directory, self.index, self.max_bytes, self.max_age)
+        stats['seconds'] = round(time.perf_counter() - started, 3)
+        with self._lock:
+            self.sweeps += 1
+            self.evicted += stats['evicted']
+            self.bytes_freed += stats['bytes_freed']
+            self.last = stats
+        return stats
+
+    def stats(self):
+        """Return the sweeper counters and the last sweep as a JSON-serializable dict."""
+        with self._lock:
+            return {'max_bytes': self.max_bytes, 'max_age': self.max_age, 'sweeps': self.sweeps,
+                    'evicted': self.evicted, 'bytes_freed': self.bytes_freed, 'last': self.last}
+
+    def _run(self):
+        while True:
+            try:
+                stats = self.sweep()
+                if stats['evicted']:
+                    print(f"Upload sweeper evicted {stats['evicted']} uploads "
+                          f"({stats['bytes_freed'] / 2 ** 20:.1f} MiB)")
+            except (OSError, sqlite3.Error) as e:
+                print(f"Error sweeping uploads: {e}")
+            time.sleep(self.interval)
+
+
+def main():
+    root = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('command', choices=['migrate', 'reindex', 'sweep'])
+    parser.add_argument('directory', nargs='?', default=os.path.join(root, 'static', 'uploads'))
+    parser.add_argument('--index', default=DEFAULT_INDEX_PATH, help='upload index database')
+    parser.add_argument('--max-mb', type=float, default=0, help='quota for sweep, 0 for none')
+    parser.add_argument('--max-age-days', type=float, default=0, help='maximum age for sweep, 0 for none')
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        stats = migrate(args.directory)
+        print(f"Moved {stats['moved']} files, removed {stats['duplicates']} duplicates "
+              f"({stats['bytes_freed'] / 1024:.0f} KiB freed)")
+    elif args.command == 'reindex':
+        started = time.perf_counter()
+        count = reindex(args.directory, UploadIndex(args.index))
+        print(f"Indexed {count} uploads in {time.perf_counter() - started:.1f}s")
+    else:
+        stats = sweep(args.directory, UploadIndex(args.index), int(args.max_mb * 2 ** 20), args.max_age_days * 86400)
+        print(f"Evicted {stats['evicted']} uploads ({stats['bytes_freed'] / 2 ** 20:.1f} MiB freed), "
+              f"{stats['files']} uploads ({stats['bytes'] / 2 ** 20:.1f} MiB) left")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""
+Native XGBoost evaluator for the pickled fertilizer pipeline.
+
+sklearn's Pipeline.predict validates its input, converts it step by step and
+then goes through the XGBClassifier wrapper before the booster is reached.
+NativeXGBPipeline extracts the fitted scaler parameters and the booster once
+and replays the same arithmetic as in-place NumPy operations, then calls
+Booster.inplace_predict on a float32 buffer. XGBoost converts its input to
+float32 itself, so the result is identical to the pipeline's.
+"""
+
+import json
+
+import numpy as np
+from sklearn.preprocessing import MaxAbsScaler, MinMaxScaler, RobustScaler, StandardScaler
+
+
+def _compile_step(step):
+    """
+    Translate a fitted transformer into the in-place operations its transform
+    applies, in the same order and in float64.
+
+    Raises:
+        ValueError: If the transformer is not supported
+    """
+    if step is None or step == 'passthrough':
+        return []
+    if type(step) is StandardScaler:
+        ops = []
+        if step.with_mean:
+            ops.append(('sub', step.mean_))
+        if step.with_std:
+            ops.append(('div', step.scale_))
+        return ops
+    if type(step) is MinMaxScaler:
+        ops = [('mul', step.scale_), ('add', step.min_)]
+        if step.clip:
+            ops.append(('clip', step.feature_range))
+        return ops
+    if type(step) is RobustScaler:
+        ops = []
+        if step.with_centering:
+            ops.append(('sub', step.center_))
+        if step.with_scaling:
+            ops.append(('div', step.scale_))
+        return ops
+    if type(step) is MaxAbsScaler:
+        return [('div', step.scale_)]
+    raise ValueError(f"Unsupported pipeline step for the native engine: {type(step).__name__}")
+
+
+class NativeXGBPipeline:
+    """
+    Pipeline-free evaluator: precomputed preprocessing plus the raw booster.
+
+    Args:
+        ops (list): (operation, parameter) pairs applied in place to the input
+        booster (xgboost.Booster): Fitted booster
+        n_classes (int): Number of classes of the classifier
+        objective (str): Training objective of the classifier
+        iteration_range (tuple): Trees used for prediction, see XGBoost
+        missing (float): Value treated as missing by the booster
+    """
+
+    def __init__(self, ops, booster, n_classes, objective, iteration_range=(0, 0), missing=np.nan):
+        self.ops = ops
+        self.booster = booster
+        self.n_classes_ = n_classes
+        self.classes_ = np.arange(n_classes)
+        self.objective = objective
+        self.iteration_range = iteration_range
+        self.missing = missing
+        self._n_jobs = None
+
+    @classmethod
+    def from_pipeline(cls, model):
+        """
+        Build the evaluator from a fitted Pipeline ending in an XGBClassifier,
+        or from a bare XGBClassifier.
+
+        Raises:
+            ValueError: If a preprocessing step cannot be compiled
+        """
+        steps = [step for _, step in getattr(model, 'steps', [(None, model)])]
+        classifier = steps[-1]
+        ops = [op for step in steps[:-1] for op in _compile_step(step)]
+
+        booster = classifier.get_booster()
+        # Same tree range XGBClassifier.predict uses after early stopping
+        try:
+            iteration_range = (0, classifier.best_iteration + 1)
+        except AttributeError:
+            iteration_range = (0, 0)
+        if classifier.booster == 'gblinear':
+            iteration_range = (0, 0)
+        return cls(ops, booster, classifier.n_classes_, classifier.objective,
+                   iteration_range, classifier.missing)
+
+    @property
+    def n_jobs(self):
+        return self._n_jobs
+
+    @n_jobs.setter
+    def n_jobs(self, n_threads):
+        # Lets inference_pool.pin_model_threads cap the booster's threads
+        self._n_jobs = n_threads
+        self.booster.set_param({'nthread': n_threads})
+
+    def transform(self, X):
+        """Apply the preprocessing and return a C-contiguous float32 matrix."""
+        X = np.array(X, dtype=np.float64, ndmin=2)
+        for op, param in self.ops:
+            if op == 'sub':
+                X -= param
+            elif op == 'div':
+                X /= param
+            elif op == 'mul':
+                X *= param
+            elif op == 'add':
+                X += param
+            elif op == 'clip':
+                np.clip(X, param[0], param[1], out=X)
+        return np.ascontiguousarray(X, dtype=np.float32)
+
+    def _predict_value(self, X):
+        return self.predict_value_transformed(self.transform(X))
+
+    def predict_value_transformed(self, X):
+        """Raw booster output for rows already passed through transform."""
+        return self.booster.inplace_predict(X, iteration_range=self.iteration_range,
+                                            predict_type='value', missing=self.missing)
+
+    def split_thresholds(self):
+        """
+        Split thresholds of the trees per input feature.
+
+        A row goes left at a split when its transformed value is below the
+        threshold, so the model is constant while no transformed feature
+        crosses one of these values.
+
+        Returns:
+            list: Sorted unique float32 thresholds of every feature, in
+            transformed units
+
+        Raises:
+            ValueError: If the booster has no trees (gblinear)
+        """
+        learner = json.loads(self.booster.save_raw('json'))['learner']
+        # dart keeps its trees in a nested gbtree
+        booster = learner['gradient_booster'].get('gbtree', learner['gradient_booster'])
+        if 'model' not in booster:
+            raise ValueError(f"The {learner['gradient_booster'].get('name')} booster has no trees")
+        thresholds = [[] for _ in range(int(learner['learner_model_param']['num_feature']))]
+        for tree in booster['model']['trees']:
+            for feature, condition, left in zip(tree['split_indices'], tree['split_conditions'],
+                                                tree['left_children']):
+                if left != -1:
+                    thresholds[feature].append(condition)
+        return [np.unique(np.array(values, dtype=np.float32)) for values in thresholds]
+
+    def predict_proba(self, X):
+        """Class probabilities, as XGBClassifier.predict_proba returns them."""
+        proba = self._predict_value(X)
+        if proba.ndim == 1:
+            # Binary objectives return the positive-class probability only
+            return np.vstack([1 - proba, proba]).T
+        return proba
+
+    def predict(self, X):
+        """Class indices, as XGBClassifier.predict returns them."""
+        return self.predict_transformed(self.transform(X))
+
+    def predict_transformed(self, X):
+        """Class indices for rows already passed through transform."""
+        values = self.predict_value_transformed(X)
+        if values.ndim > 1 and self.n_classes_ != 2:
+            return np.argmax(values, axis=1)
+        if self.objective == 'multi:softmax':
+            return values.astype(np.int32)
+        labels = np.zeros(values.shape[0], dtype=np.int64)
+        labels[values > 0.5] = 1
+        return labels